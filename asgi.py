@@ -0,0 +1,332 @@
+"""
+ASGI entry point: the board's read-only JSON endpoints served on the event loop, everything else by
+the Flask app.
+
+    gunicorn -w 4 -k uvicorn.workers.UvicornWorker asgi:application
+
+/gantt_data, /api/get_gantt_jobs, /get_component_jobs and /get_parts/<customer_id> run the same
+queries and build the same payloads as their Flask views (see azureapp.py), through an async driver
+(aioodbc for Azure SQL, aiosqlite locally), so a worker waiting on the database for one viewer keeps
+serving the others. All other requests go to Flask on FLASK_THREADS threads per worker (one, as
+with the sync workers, by default).
+"""
+import os
+import sys
+import time
+import asyncio
+from datetime import timezone
+from tempfile import SpooledTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.engine import make_url
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, quote_etag
+from azureapp import (app as flask_app, component_job_summary, component_jobs_query, gantt_data_payload,
+                      gantt_data_query, gantt_job_summary, gantt_jobs_query)
+from models import db, logger, Part, TableRevision
+from part_catalogue import PART_CATALOGUE, CustomerCatalogue
+from compression import COMPRESS_MIN_BYTES, compress_bytes, negotiate_encoding
+from metrics import REQUESTS_IN_FLIGHT, observe_request
+
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError:  # Needs greenlet (SQLAlchemy[asyncio]); without it every request goes to Flask
+    create_async_engine = None
+
+# 0 sends every request to Flask, without redeploying with a different entry point
+ASYNC_READS = os.getenv('ASYNC_READS', '1') != '0'
+
+# Threads each worker runs Flask requests on. Flask-SQLAlchemy sessions are per thread, so more
+# than one is safe; one keeps a worker's Flask requests as serial as a sync worker's.
+FLASK_THREADS = int(os.getenv('FLASK_THREADS', 1))
+
+# Connections each worker's async tier keeps open, on top of the Flask app's own pool
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 10))
+
+# Async driver for each sync driver the app is deployed with
+ASYNC_DRIVERS = {
+    'mssql+pyodbc': 'mssql+aioodbc',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    """The app's database `url` with the async driver (ASYNC_DATABASE_URL overrides it), or None if there is none."""
+    override = os.getenv('ASYNC_DATABASE_URL')
+    if override:
+        return make_url(override)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else None
+
+
+def request_headers(scope):
+    headers = {}
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin1'), value.decode('latin1')
+        headers[name] = f"{headers[name]},{value}" if name in headers else value
+    return headers
+
+
+def wsgi_environ(scope, body):
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+        'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': FLASK_THREADS > 1,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in request_headers(scope).items():
+        key = name.upper().replace('-', '_')
+        environ[key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{key}'] = value
+    return environ
+
+
+class WsgiBridge:
+    """
+    Serves ASGI requests with a WSGI app (Flask) on a pool of `threads` threads. Each body chunk is
+    sent before the next one is produced, so streamed responses (travellers) are not buffered, and
+    the response is closed afterwards, which is where Werkzeug cleans up after streaming.
+    """
+
+    def __init__(self, wsgi_app, threads=FLASK_THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='flask')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"Flask cannot serve ASGI {scope['type']} connections")
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.run, wsgi_environ(scope, body), send, loop)
+
+    def run(self, environ, send, loop):
+        def send_and_wait(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+            }
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if not response.get('started'):
+                    response['started'] = True
+                    send_and_wait(response['start'])
+                send_and_wait({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not response.get('started'):
+                send_and_wait(response['start'])
+            send_and_wait({'type': 'http.response.body'})
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+
+def not_modified(headers, etag, last_modified):
+    """The conditional_on test (azureapp.py): the client's copy is current."""
+    if headers.get('if-none-match'):
+        return parse_etags(headers['if-none-match']).contains_weak(etag)
+    # Last-Modified only has one-second resolution, so the ETag wins whenever it is sent
+    since = parse_date(headers.get('if-modified-since'))
+    return (
+        last_modified is not None and since is not None
+        and last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    )
+
+
+class AsyncReads:
+    """
+    ASGI app serving the read-only endpoints in ROUTES with an async engine and handing every other
+    request to `fallback`. Views wrapped in conditional_on get the same ETag/304 handling here.
+    """
+
+    ROUTES = {
+        '/gantt_data': 'get_gantt_data',
+        '/api/get_gantt_jobs': 'get_gantt_jobs',
+        '/get_component_jobs': 'get_component_jobs',
+    }
+    PREFIX_ROUTES = {
+        '/get_parts/': 'get_parts',
+    }
+
+    def __init__(self, fallback, database_url):
+        self.fallback = fallback
+        self.database_url = database_url
+        self.engine = None
+        self.sessions = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        route = self.match(scope) if scope['type'] == 'http' else None
+        if route is None:
+            return await self.fallback(scope, receive, send)
+        await self.serve(scope, send, *route)
+
+    def match(self, scope):
+        """(endpoint, path argument or None) if the request is one of ours, else None."""
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+        path = scope['path']
+        if path in self.ROUTES:
+            return self.ROUTES[path], None
+        for prefix, endpoint in self.PREFIX_ROUTES.items():
+            argument = path[len(prefix):]
+            if path.startswith(prefix) and argument and '/' not in argument:
+                return endpoint, argument
+        return None
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def session(self):
+        if self.engine is None:  # Created in the worker, never inherited across a fork
+            self.engine = create_async_engine(self.database_url, pool_size=ASYNC_DB_POOL_SIZE)
+            self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self.sessions()
+
+    async def serve(self, scope, send, endpoint, argument):
+        start = time.perf_counter()
+        method = scope['method']
+        headers = request_headers(scope)
+        tables = getattr(flask_app.view_functions[endpoint], 'conditional_tables', None)
+        REQUESTS_IN_FLIGHT.labels(endpoint).inc()
+        try:
+            async with self.session() as session:
+                validators, revisions = None, {}
+                if tables:
+                    rows = (await session.execute(TableRevision.validators_query(tables))).all()
+                    validators = TableRevision.validators_from(tables, rows)
+                    revisions = {name: revision for name, revision, _ in rows}
+
+                if validators and not_modified(headers, *validators):
+                    status, body = 304, None
+                else:
+                    status, body = await getattr(self, endpoint)(session, revisions, argument)
+        except Exception as e:
+            logger.error(f"❌ Async read {endpoint} failed: {str(e)}", exc_info=True,
+                         extra={'method': method, 'path': scope['path']})
+            status, body, validators = 500, {"error": "Internal Server Error"}, None
+
+        try:
+            await self.respond(send, method, headers, status, body, validators if status in (200, 304) else None)
+        finally:
+            observe_request(endpoint, method, status, time.perf_counter() - start)
+            REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+
+    async def respond(self, send, method, headers, status, payload, validators):
+        response_headers = [(b'vary', b'Accept-Encoding')]
+        body = b''
+        encoding = None
+        if status != 304:
+            # Encoded as jsonify does, so both tiers send byte-identical bodies
+            body = (flask_app.json.dumps(payload, separators=(",", ":")) + "\n").encode()
+            response_headers.append((b'content-type', b'application/json'))
+            if len(body) >= COMPRESS_MIN_BYTES:
+                encoding = negotiate_encoding(parse_accept_header(headers.get('accept-encoding')))
+            if encoding:
+                body = compress_bytes(body, encoding)
+                response_headers.append((b'content-encoding', encoding.encode()))
+            response_headers.append((b'content-length', str(len(body)).encode()))
+
+        if validators:
+            etag, last_modified = validators
+            response_headers.append((b'etag', quote_etag(etag, weak=bool(encoding)).encode()))
+            if last_modified is not None:
+                response_headers.append((b'last-modified', http_date(last_modified.replace(tzinfo=timezone.utc)).encode()))
+            response_headers.append((b'cache-control', b'private, no-cache'))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': b'' if method == 'HEAD' else body})
+
+    # The handlers mirror the Flask views of the same name, error responses included
+
+    async def get_gantt_data(self, session, revisions, argument):
+        try:
+            gantt_jobs = (await session.execute(gantt_data_query())).scalars().all()
+            return 200, gantt_data_payload(gantt_jobs)
+        except Exception as e:
+            logger.error(f"❌ Error fetching Gantt data: {str(e)}", exc_info=True)
+            return 500, {"error": f"Failed to fetch Gantt data: {str(e)}"}
+
+    async def get_gantt_jobs(self, session, revisions, argument):
+        try:
+            gantt_jobs = (await session.execute(gantt_jobs_query())).all()
+            return 200, [gantt_job_summary(job) for job in gantt_jobs]
+        except Exception as e:
+            logger.error(f"❌ Error fetching Gantt Jobs: {str(e)}")
+            return 500, {"error": "Failed to load Gantt Jobs"}
+
+    async def get_component_jobs(self, session, revisions, argument):
+        try:
+            jobs = await session.execute(component_jobs_query())
+            return 200, [component_job_summary(job) for job in jobs]
+        except Exception as e:
+            return 500, {"error": f"Failed to load component jobs: {str(e)}"}
+
+    async def get_parts(self, session, revisions, customer_id):
+        try:
+            if not customer_id.isdigit():
+                return 200, []
+            # The worker's part catalogue, shared with the Flask views and reloaded the same way
+            revision = revisions.get('parts') or 0
+            catalogue = PART_CATALOGUE.cached(int(customer_id), revision)
+            if catalogue is None:
+                parts = await session.execute(
+                    db.select(Part.part_number, Part.part_description).where(Part.customer_id == int(customer_id))
+                )
+                catalogue = PART_CATALOGUE.store(int(customer_id), CustomerCatalogue(revision, [tuple(part) for part in parts]))
+            return 200, catalogue.as_dicts()
+        except Exception as e:
+            logger.error(f"Error fetching parts for customer {customer_id}: {str(e)}")
+            return 500, {"error": "Failed to load parts"}
+
+
+def create_application():
+    flask_asgi = WsgiBridge(flask_app)
+    if not ASYNC_READS:
+        return flask_asgi
+    with flask_app.app_context():
+        database_url = async_database_url(db.engine.url)
+    if create_async_engine is None or database_url is None:
+        logger.warning("Async reads are off (no async driver for this database); Flask serves every request")
+        return flask_asgi
+    return AsyncReads(flask_asgi, database_url)
+
+
+application = create_application()
@@ -1,4 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory, make_response
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory, make_response,
+                   Response, stream_with_context)
+from functools import wraps
+import click
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate # type: ignore
 from sqlalchemy.exc import SQLAlchemyError
@@ -6,7 +9,7 @@ import pandas as pd
 from math import ceil
 import io
 import base64
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 import queue
 import atexit
@@ -15,6 +18,7 @@ from azure.storage.blob import BlobServiceClient # type: ignore
 from jinja2 import TemplateNotFound
 import json
 import os
+import uuid
 from itertools import chain
 from tenacity import retry, stop_after_attempt, wait_exponential # type: ignore
 from contextlib import contextmanager
@@ -24,20 +28,41 @@ from urllib.parse import quote_plus
 from azure.core.exceptions import AzureError # type: ignore
 from sqlalchemy import create_engine, text, event
 from sqlalchemy.orm import joinedload
-from sqlalchemy import or_
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import or_, and_, func
 from sqlalchemy.engine import URL
 from sqlalchemy.inspection import inspect
-import pyodbc # type: ignore
 from werkzeug.utils import secure_filename
 from werkzeug.security import check_password_hash
 from models import (db, logger, Order, Customer,  # type: ignore
-                        OrderLine, Part,ComponentJob, Jig, User, GanttJob)
+                        OrderLine, Part,ComponentJob, Jig, User, GanttJob, PartSearchGram, TableRevision, search_parts,
+                        DraftOrder, IdempotencyKey, decode_operations)
+from sql_instrumentation import SQL_STATS, start_request_stats, finish_request_stats
+from metrics import start_request_metrics, finish_request_metrics, render_metrics
+from profiling import PROFILE_DIR, should_profile, start_profiling, finish_profiling, list_profiles
+from part_catalogue import PART_CATALOGUE, TYPEAHEAD_DEFAULT_LIMIT, TYPEAHEAD_MAX_LIMIT
+from compression import compress_response
+from structured_logging import LOG_QUEUE_SIZE, start_logging
+import idempotency
+from rollups import production_report, refresh_rollups
+from quoting import parse_quote_request, quote_lines
+from conflicts import find_conflicts, parse_conflict_window
+from travellers import (TRAVELLER_BATCH_MAX, get_traveller, load_component_job, merge_available, parse_schedule_range,
+                        pdf_available, prepare_travellers, scheduled_component_jobs, stream_merged_travellers,
+                        stream_traveller_zip, traveller_context)
+from shared_cache import SHARED_CACHE, cached_customers, cached_jigs
 
 # Define the database URI construction function
 def get_sqlalchemy_database_uri():
     """
     Constructs the SQLAlchemy database URI for Azure SQL Database using SQL Authentication.
+    DATABASE_URL overrides it, e.g. sqlite:///bench.db for local benchmarks and load tests.
     """
+    override = os.getenv('DATABASE_URL')
+    if override:
+        return override
+
     SQL_SERVER = os.getenv('AZURE_SQL_SERVER')
     SQL_DATABASE = os.getenv('AZURE_SQL_DATABASE')
     SQL_PORT = os.getenv('AZURE_SQL_PORT')
@@ -57,6 +82,12 @@ def get_sqlalchemy_database_uri():
 
     return f"mssql+pyodbc:///?odbc_connect={quote_plus(connection_string)}"
 
+# Records go through a queue to a writer thread, so requests never wait on the log stream.
+# Whatever is still queued is written out when the worker exits.
+LOG_QUEUE = queue.Queue(LOG_QUEUE_SIZE)
+LOG_LISTENER = start_logging(LOG_QUEUE)
+atexit.register(LOG_LISTENER.stop)
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='Static/Data', template_folder='templates')
 
@@ -116,6 +147,176 @@ except ValueError as e:
     logger.error(str(e))
     BLOB_SERVICE_CLIENT = None
 
+# Admin access: usernames listed in ADMIN_USERNAMES (comma separated) or requests carrying ADMIN_TOKEN
+ADMIN_USERNAMES = {name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()}
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+def is_admin_request():
+    """Checks whether the current request comes from an admin user or carries the admin token."""
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    bearer_token = credentials.strip() if scheme.lower() == 'bearer' else None  # Never Basic or other schemes
+    if ADMIN_TOKEN and ADMIN_TOKEN in (request.headers.get('X-Admin-Token'), bearer_token):
+        return True
+    return session.get('username') in ADMIN_USERNAMES
+
+def admin_required(view):
+    """Restricts a route to admins, returning 403 JSON otherwise."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
+def conditional_on(*table_names):
+    """
+    HTTP conditional GET for a read-only view whose output depends only on `table_names`.
+    ETag and Last-Modified come from the tables' revision counters (one tiny query), so a client
+    holding a current copy gets a 304 before the view runs at all.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:  # A flash would be lost in a 304
+                return view(*args, **kwargs)
+
+            etag, last_modified = TableRevision.validators(table_names)
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)  # Compressed bodies carry W/ tags
+            else:
+                # Last-Modified only has one-second resolution, so the ETag wins whenever it is sent
+                not_modified = (
+                    last_modified is not None and request.if_modified_since is not None
+                    and last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+                )
+
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            response.headers['Cache-Control'] = 'private, no-cache'  # Always revalidate, cheaply
+            return response
+        wrapped.conditional_tables = table_names  # asgi.py validates its async copies of these views the same way
+        return wrapped
+    return decorator
+
+
+def idempotent(view):
+    """
+    A POST sent with an Idempotency-Key header (or idempotency_key form field) runs once. Retries
+    with the same key get the first run's stored response, and the messages it flashed, without
+    running again; a retry arriving while the first run is still going is told to wait. Runs that
+    fail (5xx, an exception or a 'danger' flash) are forgotten, so a retry runs them again.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        try:
+            key = idempotency.request_key(request)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if key is None:
+            return view(*args, **kwargs)
+
+        scope = f"{request.endpoint}:{session.get('username', '')}"
+        state, stored = idempotency.begin(scope, key, idempotency.request_fingerprint(request))
+        if state == idempotency.REPLAY:
+            logger.info(f"Replaying the stored response to {request.path} for idempotency key {key}")
+            for category, message in stored.flashes or []:
+                flash(message, category)
+            response = app.response_class(stored.body, status=stored.status_code, content_type=stored.content_type)
+            if stored.location:
+                response.headers['Location'] = stored.location
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if state != idempotency.RUN:
+            pending = state == idempotency.PENDING
+            message = ("This request is still being processed. Wait a moment and check before sending it again."
+                       if pending else "This idempotency key was already used for a different request.")
+            if not request.is_json:
+                flash(message, 'warning' if pending else 'danger')
+                return redirect(request.path)
+            response = jsonify({"error": message})
+            response.status_code = 409 if pending else 422
+            if pending:
+                response.headers['Retry-After'] = '2'
+            return response
+
+        flashes_before = len(session.get('_flashes', []))
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency.release(scope, key)
+            raise
+        flashes = session.get('_flashes', [])[flashes_before:]
+        if response.status_code >= 500 or response.is_streamed or any(category == 'danger' for category, _ in flashes):
+            idempotency.release(scope, key)
+        else:
+            idempotency.complete(scope, key, response, flashes)
+        return response
+    return wrapped
+
+# Per-request SQL instrumentation (query count, DB time, repeated statements)
+@app.before_request
+def start_sql_instrumentation():
+    start_request_stats()
+
+@app.after_request
+def finish_sql_instrumentation(response):
+    finish_request_stats(request.endpoint)
+    return response
+
+@app.teardown_request
+def abandon_sql_instrumentation(error=None):
+    # Only records anything if after_request never ran (e.g. an error escaped the error handlers)
+    finish_request_stats(request.endpoint)
+
+# Per-endpoint latency histograms, request/error counts and in-flight gauges (see /metrics)
+@app.before_request
+def start_metrics():
+    start_request_metrics()
+
+@app.after_request
+def finish_metrics(response):
+    finish_request_metrics(response.status_code)
+    return response
+
+@app.teardown_request
+def abandon_metrics(error=None):
+    # Only records anything if after_request never ran (e.g. an error escaped the error handlers)
+    finish_request_metrics(500)
+
+# On-demand (admin + X-Profile: 1 or ?_profile=1) and sampled (PROFILE_SAMPLE_RATE) cProfile runs
+@app.before_request
+def start_request_profiler():
+    reason = should_profile(is_admin_request)
+    if reason:
+        start_profiling(reason)
+
+@app.after_request
+def finish_request_profiler(response):
+    profile_file, reason = finish_profiling()
+    if reason == 'on_demand':
+        response.headers['X-Profile-File'] = profile_file
+    return response
+
+@app.teardown_request
+def abandon_request_profiler(error=None):
+    finish_profiling()
+
+# Negotiated gzip/brotli compression. Registered last so it runs first among the after_request
+# hooks: the request metrics and profiles above include the time spent compressing.
+@app.after_request
+def compress(response):
+    return compress_response(response)
+
 COLUMN_MAPPING = {
     "Packing": ["packing_start", "packing_end"],
     "Unjigging": ["unjigging_start", "unjigging_end"],
@@ -216,17 +417,35 @@ def upload_image_to_blob(image_file, part_number, blob_service_client, blob_cont
 
 
 @app.route('/get_parts/<customer_id>')
+@conditional_on('parts')
 def get_parts(customer_id):
     try:
-        # Fetch parts associated with the selected customer
-        parts = Part.query.filter_by(customer_id=customer_id).all()
-        parts_data = [{"part_number": part.part_number, "part_description": part.part_description} for part in parts]
-        return jsonify(parts_data), 200
+        # Served from this worker's cached catalogue, reloaded only after a Part has been written
+        if not customer_id.isdigit():
+            return jsonify([]), 200
+        catalogue = PART_CATALOGUE.get(int(customer_id))
+        return jsonify(catalogue.as_dicts()), 200
     except Exception as e:
         logger.error(f"Error fetching parts for customer {customer_id}: {str(e)}")
         return jsonify({"error": "Failed to load parts"}), 500
-    
+
+@app.route('/api/part_typeahead/<int:customer_id>')
+@conditional_on('parts')
+def part_typeahead(customer_id):
+    """Parts of a customer whose number (then description) starts with ?q=, at most ?limit= of them."""
+    try:
+        prefix = request.args.get('q', '')
+        limit = request.args.get('limit', TYPEAHEAD_DEFAULT_LIMIT, type=int) or TYPEAHEAD_DEFAULT_LIMIT
+        limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+
+        catalogue = PART_CATALOGUE.get(customer_id)
+        return jsonify(catalogue.typeahead(prefix, limit)), 200
+    except Exception as e:
+        logger.error(f"Error in part typeahead for customer {customer_id}: {str(e)}")
+        return jsonify({"error": "Failed to load parts"}), 500
+
 @app.route('/get_part_details/<part_number>', methods=['GET', 'POST'])
+@conditional_on('parts')
 def get_part_details(part_number):
     try:
         # Fetch the part from the database
@@ -261,8 +480,7 @@ def get_part_details(part_number):
             "strip_etch": part.strip_etch,
         }
 
-        # Log part details for debugging
-        logger.info(f"Fetched part details: {part_details}")
+        logger.debug(f"Fetched part details for {part_number}")
 
         return jsonify(part_details), 200
     except Exception as e:
@@ -373,7 +591,7 @@ def logout():
     return redirect(url_for('index'))
     
 def log_field_details(field_name, field_value):
-    logger.info(f"Field: {field_name}, Value: {field_value}, Type: {type(field_value).__name__}")
+    logger.debug(f"Field: {field_name}, Value: {field_value}, Type: {type(field_value).__name__}")
 
 def process_new_part(index, form_data, customer_id):
     """
@@ -537,7 +755,7 @@ def process_new_part(index, form_data, customer_id):
             strip_etch = 2.5
             strip_etch_selection_status = 1
 
-        logger.info(f"Anodising selection processed: {anodising_required}, Duration: {anodising_duration}, Voltage: {voltage}")
+        logger.debug(f"Anodising selection processed: {anodising_required}, Duration: {anodising_duration}, Voltage: {voltage}")
 
         # Handle optional fields
         etch_value = float(form_data.getlist('etch[]')[index])
@@ -558,7 +776,7 @@ def process_new_part(index, form_data, customer_id):
         blasting = form_data.getlist('blasting[]')[index]
         blasting_selection_status = 1 if blasting != "No" else 0
 
-        logger.info(f"Optional fields processed: Etch={etch_value}, Sealing={sealing}, Dye={dye}, Brightening={brightening}, Blasting={blasting}")
+        logger.debug(f"Optional fields processed: Etch={etch_value}, Sealing={sealing}, Dye={dye}, Brightening={brightening}, Blasting={blasting}")
 
         # Handle polishing steps (if applicable)
         polishing = form_data.getlist('polishing[]')[index]
@@ -582,7 +800,7 @@ def process_new_part(index, form_data, customer_id):
                     })
 
         # Log polishing data for debugging
-        logger.info(f"Processed polishing data for part: {polishing_data}")
+        logger.debug(f"Processed polishing data for part: {polishing_data}")
 
         # Convert polishing data to JSON if polishing is enabled, else keep it as None
         polishing_json = json.dumps(polishing_data) if polishing_selection_status else None
@@ -592,7 +810,7 @@ def process_new_part(index, form_data, customer_id):
         custom_jpl = int(form_data.getlist('custom_jpl[]')[index]) if form_data.getlist('custom_jpl[]')[index] else None
         custom_mpj = int(form_data.getlist('custom_mpj[]')[index]) if form_data.getlist('custom_mpj[]')[index] else None
 
-        logger.info(f"Custom jig details processed: UPJ={custom_upj}, JPL={custom_jpl}, MPJ={custom_mpj}")
+        logger.debug(f"Custom jig details processed: UPJ={custom_upj}, JPL={custom_jpl}, MPJ={custom_mpj}")
 
         # Create and save the new part
         new_part = Part(
@@ -651,7 +869,7 @@ def process_new_part(index, form_data, customer_id):
         }
 
     except Exception as e:
-        logger.info(f"Index: {index}, part_number_new[]: {form_data.getlist('part_number_new[]')}")
+        logger.debug(f"Index: {index}, part_number_new[]: {form_data.getlist('part_number_new[]')}")
         logger.error(f"Error creating new part at index {index}: {e}")
         db.session.rollback()
         raise ValueError(f"An error occurred while processing new part: {e}")
@@ -726,39 +944,79 @@ def process_existing_part(index, form_data):
         raise ValueError(str(e))
 
     
-@app.route('/save_draft_line', methods=['POST'])
-def save_draft_line():
+# Draft orders live in the draft_orders / draft_order_lines tables; the session only holds the id
+DRAFT_SESSION_KEY = 'draft_order_id'
+
+def current_draft(create=False):
     """
-    Save a draft line and customer/order details into the session.
+    The draft order being built in this session, or the signed-in user's latest draft (e.g. one
+    started on another device). Creates one when `create` is set; otherwise may return None.
     """
-    # Get the new line data from the request
-    new_line = request.json.get('line')
+    user_id = session.get('user_id')
+    draft = None
+
+    draft_id = session.get(DRAFT_SESSION_KEY)
+    if draft_id:
+        draft = db.session.get(DraftOrder, draft_id)
+        if draft is not None and draft.user_id != user_id:
+            draft = None  # Left behind by a different user on this browser
+    if draft is None and user_id:
+        draft = DraftOrder.query.filter_by(user_id=user_id).order_by(DraftOrder.updated_at.desc()).first()
+
+    # Drafts saved in the cookie before they moved server-side
+    legacy_lines = session.pop('order_lines', None)
+    legacy_details = session.pop('customer_and_order_details', None)
+    if draft is None and (create or legacy_lines or legacy_details):
+        draft = DraftOrder(draft_id=uuid.uuid4().hex, user_id=user_id)
+        db.session.add(draft)
+    if legacy_lines or legacy_details:
+        for line in legacy_lines or []:
+            draft.append_line(line)
+        draft.customer_and_order_details = draft.customer_and_order_details or legacy_details
+        db.session.commit()
 
-    # Get customer and order details from the request (optional)
-    customer_and_order_details = request.json.get('customer_and_order_details')
+    if draft is not None and session.get(DRAFT_SESSION_KEY) != draft.draft_id:
+        session[DRAFT_SESSION_KEY] = draft.draft_id
+    return draft
 
-    # Ensure the session has a place to store order lines
-    if 'order_lines' not in session:
-        session['order_lines'] = []
+def discard_current_draft():
+    draft = current_draft()
+    if draft is not None:
+        draft.discard()
+    session.pop(DRAFT_SESSION_KEY, None)
 
-    # Add the new line to the session
-    session['order_lines'].append(new_line)
+@app.route('/save_draft_line', methods=['POST'])
+def save_draft_line():
+    """
+    Append a draft line (and the latest customer/order details) to this session's draft order.
+    """
+    try:
+        # Get the new line data from the request
+        new_line = request.json.get('line')
 
-    # Save customer and order details to the session,  if provided
-    if customer_and_order_details:
-        session['customer_and_order_details'] = customer_and_order_details
+        # Get customer and order details from the request (optional)
+        customer_and_order_details = request.json.get('customer_and_order_details')
 
-    # Mark the session as modified
-    session.modified = True
+        draft = current_draft(create=True)
+        draft.append_line(new_line)
+        if customer_and_order_details:
+            draft.customer_and_order_details = customer_and_order_details
+        db.session.commit()
 
-    return jsonify({
-        'status': 'success',
-        'message': 'Line saved!',
-        'lines': session['order_lines'],
-        'customer_and_order_details': session.get('customer_and_order_details', {})
-    }), 200
+        return jsonify({
+            'status': 'success',
+            'message': 'Line saved!',
+            'draft_id': draft.draft_id,
+            'line_count': draft.line_count(),
+            'customer_and_order_details': draft.customer_and_order_details or {}
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving draft line: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Failed to save draft line'}), 500
 
 @app.route('/orders', methods=['GET', 'POST'])
+@idempotent
 def orders():
     logger.info("Accessed /orders route")
 
@@ -796,15 +1054,16 @@ def orders():
                 flash(error_message, "danger")
                 return redirect(url_for('orders'))
 
-            # **Save customer and order details to the session**
-            session['customer_and_order_details'] = {
+            # **Save customer and order details to the draft, so the form is prefilled if saving fails**
+            draft = current_draft(create=True)
+            draft.customer_and_order_details = {
                 "customer_id": customer_id,
                 "purchase_order_number": purchase_order_number,
                 "date_of_arrival": date_of_arrival,
                 "collection_method": collection_method,
             }
-            session.modified = True  # Mark session as modified
-            logger.info("Customer and order details saved to session.")
+            db.session.commit()
+            logger.info("Customer and order details saved to draft order.")
 
             # Fetch customer object
             customer = Customer.query.filter_by(customer_id=customer_id).first()
@@ -846,7 +1105,7 @@ def orders():
                 part_description = part_descriptions[i].strip()
                 use_existing = request.form.getlist('use_existing_part[]')[i]
 
-                logger.info(f"Processing part {i + 1}: {part_description}, use_existing={use_existing}")
+                logger.debug(f"Processing part {i + 1}: {part_description}, use_existing={use_existing}")
 
                 # Check if the part is existing or new
                 if use_existing and use_existing != "No":  # Non-empty and not "No" means existing
@@ -881,7 +1140,7 @@ def orders():
                 vat = round(net_price * 0.2, 2)  # 20% VAT
                 total_price = net_price + vat  # Gross price including VAT
 
-                logger.info(f"Pricing for part {part_number} at index {i}: Quantity={quantity}, Unit Price={unit_price}, Lot Price={lot_price}, Net Price={net_price}, Total Price (Gross)={total_price}, VAT={vat}")
+                logger.debug(f"Pricing for part {part_number} at index {i}: Quantity={quantity}, Unit Price={unit_price}, Lot Price={lot_price}, Net Price={net_price}, Total Price (Gross)={total_price}, VAT={vat}")
 
                 # Create OrderLine
                 order_line = OrderLine(
@@ -894,16 +1153,15 @@ def orders():
                     vat=vat,
                 )
                 db.session.add(order_line)
-                logger.info(f"OrderLine created for part {part_number} at index {i}.")
+                logger.debug(f"OrderLine created for part {part_number} at index {i}.")
+
+            # The draft has become a real order: remove it in the same commit
+            discard_current_draft()
 
             # Commit changes after processing all parts
             db.session.commit()
             logger.info("Order and associated parts saved successfully.")
 
-                    # Clear session data for drafts after successful save
-            session.pop('order_lines', None)
-            session.pop('customer_and_order_details', None)
-
             # Generate component jobs
             ComponentJob.generate_component_jobs(order)
             logger.info("Component jobs generated successfully.")
@@ -922,6 +1180,9 @@ def orders():
             else:
                 flash('🎉 Order saved successfully! 😃', 'success')
 
+            # Redirect so a refresh reloads the form instead of posting the order again
+            return redirect(url_for('orders'))
+
         except Exception as e:
             db.session.rollback()
             logger.exception(f"Error processing order: {e}")
@@ -930,14 +1191,13 @@ def orders():
 
     # Handle GET requests
     try:
-        customers = [dict(customer_id=str(c.customer_id), customer_name=c.customer_name) for c in Customer.query.all()]
-        jigs = Jig.query.all()
+        customers = [dict(customer_id=str(c['customer_id']), customer_name=c['customer_name']) for c in cached_customers()]
+        jigs = cached_jigs()
 
-        # **Inject Prepopulated Customer/Order Details into Template Context**
-        customer_and_order_details = session.get('customer_and_order_details', {})
-        
-        # Fetch existing draft lines from the session
-        existing_lines = session.get('order_lines', [])
+        # **Inject Prepopulated Customer/Order Details and draft lines into Template Context**
+        draft = current_draft()
+        customer_and_order_details = (draft.customer_and_order_details if draft else None) or {}
+        existing_lines = [draft_line.line for draft_line in draft.lines] if draft else []
 
         return render_template(
             'orders.html',
@@ -945,7 +1205,8 @@ def orders():
             jigs=jigs,
             orders=orders,
             existing_lines=existing_lines,
-            customer_and_order_details=customer_and_order_details  # Pass prepopulated details to the template
+            customer_and_order_details=customer_and_order_details,  # Pass prepopulated details to the template
+            idempotency_key=uuid.uuid4().hex,  # One per rendered form: resubmitting it cannot create a second order
         )
     except Exception as e:
         logger.exception("Error loading order form data")
@@ -979,9 +1240,46 @@ def update_orderline(order_line_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+# Keyset sort options for /component_jobs: sort_by -> (sort key expression, descending?, cursor value type).
+# Nullable keys are coalesced so NULLs sort first ascending (as SQL Server does) and remain comparable.
+COMPONENT_JOB_SORTS = {
+    None: (ComponentJob.component_job_id, False, 'int'),
+    'date_asc': (Order.date_of_arrival, False, 'date'),
+    'date_desc': (Order.date_of_arrival, True, 'date'),
+    'anodising_duration_asc': (func.coalesce(Part.anodising_duration, -1), False, 'int'),
+    'anodising_duration_desc': (func.coalesce(Part.anodising_duration, -1), True, 'int'),
+    'loads_required_asc': (ComponentJob.loads_required, False, 'int'),
+    'loads_required_desc': (ComponentJob.loads_required, True, 'int'),
+}
+COMPONENT_JOBS_PER_PAGE = 100
+COMPONENT_JOBS_MAX_PER_PAGE = 500
+
+def encode_page_cursor(sort_value, component_job_id):
+    """Opaque keyset cursor: the last row's sort key and id, as URL-safe base64 JSON."""
+    if hasattr(sort_value, 'isoformat'):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, component_job_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_page_cursor(cursor, value_type):
+    """Inverse of encode_page_cursor. Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, component_job_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if value_type == 'date':
+            sort_value = datetime.strptime(sort_value[:10], "%Y-%m-%d").date()
+        else:
+            sort_value = int(sort_value)
+        return sort_value, int(component_job_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid page cursor: {e}")
+
 @app.route('/component_jobs', methods=['GET'])
 def component_jobs():
-    """View component jobs with filtering and inline editing (uses update_orderline helper)."""
+    """
+    View component jobs with filtering and inline editing (uses update_orderline helper).
+    Pages are keyset paginated on (sort key, component_job_id), so deep pages cost the same as the first.
+    """
     try:
         # 🔎 Get filter parameters from request
         customer_id = request.args.get('customer_id')
@@ -989,10 +1287,31 @@ def component_jobs():
         dye_type = request.args.get('dye_type')  # New filter
         dye_colour = request.args.get('dye_colour')  # New filter
         sort_by = request.args.get('sort_by')  # New sorting parameter
+        cursor = request.args.get('cursor')
+        per_page = request.args.get('per_page', COMPONENT_JOBS_PER_PAGE, type=int) or COMPONENT_JOBS_PER_PAGE
+        per_page = max(1, min(per_page, COMPONENT_JOBS_MAX_PER_PAGE))
 
-        # 🟢 Start Query
+        sort_key, descending, value_type = COMPONENT_JOB_SORTS.get(sort_by, COMPONENT_JOB_SORTS[None])
+
+        # 🟢 Start Query: only the columns the table shows
         query = (
-            db.session.query(ComponentJob, OrderLine, Order, Customer, Part)
+            db.session.query(
+                ComponentJob.component_job_id,
+                ComponentJob.jigging_duration_per_load,
+                ComponentJob.loads_required,
+                OrderLine.OrderLine_id,
+                OrderLine.part_number,
+                OrderLine.quantity,
+                OrderLine.unit_price,
+                Order.purchase_order_number,
+                Customer.customer_name,
+                Part.part_description,
+                Part.jig_type,
+                Part.dye,
+                Part.dye_selection_status,
+                Part.anodising_duration,
+                sort_key.label('sort_key'),
+            )
             .join(OrderLine, ComponentJob.order_line_id == OrderLine.OrderLine_id)
             .join(Order, Order.order_id == OrderLine.order_id)
             .join(Customer, Customer.customer_id == Order.customer_id)
@@ -1010,57 +1329,77 @@ def component_jobs():
         if dye_colour:
             query = query.filter(Part.dye == dye_colour)
 
-        # 🟢 Apply sorting
-        if sort_by:
-            if sort_by == 'date_asc':
-                query = query.order_by(Order.date_of_arrival.asc())
-            elif sort_by == 'date_desc':
-                query = query.order_by(Order.date_of_arrival.desc())
-            elif sort_by == 'anodising_duration_asc':
-                query = query.order_by(Part.anodising_duration.asc())
-            elif sort_by == 'anodising_duration_desc':
-                query = query.order_by(Part.anodising_duration.desc())
-            elif sort_by == 'loads_required_asc':
-                query = query.order_by(ComponentJob.loads_required.asc())
-            elif sort_by == 'loads_required_desc':
-                query = query.order_by(ComponentJob.loads_required.desc())
-
-        # 🟢 Fetch results
-        results = query.all()
+        # 🟢 Seek past the previous page instead of OFFSET
+        if cursor:
+            last_value, last_id = decode_page_cursor(cursor, value_type)
+            if descending:
+                query = query.filter(or_(sort_key < last_value,
+                                         and_(sort_key == last_value, ComponentJob.component_job_id < last_id)))
+            else:
+                query = query.filter(or_(sort_key > last_value,
+                                         and_(sort_key == last_value, ComponentJob.component_job_id > last_id)))
+
+        # 🟢 Apply sorting (component_job_id breaks ties so the order is total)
+        if descending:
+            query = query.order_by(sort_key.desc(), ComponentJob.component_job_id.desc())
+        else:
+            query = query.order_by(sort_key.asc(), ComponentJob.component_job_id.asc())
+
+        # 🟢 Fetch one page (plus one row to know whether there is a next page)
+        rows = query.limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = encode_page_cursor(rows[-1].sort_key, rows[-1].component_job_id) if has_next else None
 
         # 🟢 Group jobs by customer and purchase order number
         grouped_jobs = {}
-        for job, order_line, order, customer, part in results:
-            key = (customer.customer_name, order.purchase_order_number)
+        for row in rows:
+            key = (row.customer_name, row.purchase_order_number)
             if key not in grouped_jobs:
                 grouped_jobs[key] = []
 
             grouped_jobs[key].append({
-                'component_job_id': job.component_job_id,
-                'part_number': order_line.part_number,
-                'part_description': part.part_description,
-                'quantity': order_line.quantity,
-                'unit_price': str(order_line.unit_price),
-                'jig_type': part.jig_type or "N/A",
-                'dye_type': "In-line" if part.dye_selection_status == 1 else "Off-line",
-                'dye_colour': part.dye or "N/A",
-                'anodising_duration': part.anodising_duration or "N/A",
-                'jigging_duration_per_load': job.jigging_duration_per_load,
-                'loads_required': job.loads_required,
-                'order_line_id': order_line.OrderLine_id
+                'component_job_id': row.component_job_id,
+                'part_number': row.part_number,
+                'part_description': row.part_description,
+                'quantity': row.quantity,
+                'unit_price': str(row.unit_price),
+                'jig_type': row.jig_type or "N/A",
+                'dye_type': "In-line" if row.dye_selection_status == 1 else "Off-line",
+                'dye_colour': row.dye or "N/A",
+                'anodising_duration': row.anodising_duration or "N/A",
+                'jigging_duration_per_load': row.jigging_duration_per_load,
+                'loads_required': row.loads_required,
+                'order_line_id': row.OrderLine_id
             })
 
         # 🟢 Fetch unique dropdown values for filters
-        customers = Customer.query.with_entities(Customer.customer_id, Customer.customer_name).all()
+        customers = cached_customers()
         jigs = db.session.query(Part.jig_type).distinct().all()
 
+        # 🟢 Pagination links keep the current filters and sort
+        page_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+        next_page_url = url_for('component_jobs', cursor=next_cursor, **page_args) if next_cursor else None
+        first_page_url = url_for('component_jobs', **page_args) if cursor else None
+
         return render_template(
             'component_jobs.html',
             grouped_jobs=grouped_jobs,
             customers=customers,
             jigs=[j[0] for j in jigs],  # Extract jig types from tuples
+            next_page_url=next_page_url,
+            first_page_url=first_page_url,
+            page_size=len(rows),
         )
 
+    except ValueError as e:
+        if not request.args.get('cursor'):
+            logger.error(f"Error fetching component jobs: {str(e)}")
+            flash("An error occurred while loading component jobs. Please try again.", "danger")
+            return render_template('error.html')
+        logger.warning(f"Bad component jobs page cursor: {e}")
+        flash("That page link is no longer valid. Showing the first page instead.", "warning")
+        return redirect(url_for('component_jobs', **{k: v for k, v in request.args.items() if k != 'cursor'}))
     except Exception as e:
         logger.error(f"Error fetching component jobs: {str(e)}")
         flash("An error occurred while loading component jobs. Please try again.", "danger")
@@ -1069,90 +1408,79 @@ def component_jobs():
 @app.route('/component_job_details/<int:component_job_id>', methods=['GET'])
 def component_job_details(component_job_id):  # Accept component_job_id as a parameter
     try:
-        # Query the specific component job by ID
-        component_job = db.session.query(ComponentJob).filter_by(component_job_id=component_job_id).first()
-
-        if component_job:
-            part = component_job.part  # Get the associated part
-            order_line = component_job.order_line  # Get the associated order line
-            jig = part.jig  # Get the associated jig (always included)
-
-            # Decode polishing JSON
-            try:
-                polishing_details = json.loads(part.polishing) if part.polishing else []
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding polishing JSON for part {part.part_number}: {e}")
-                polishing_details = []
-
-            # Fetch the related order through order_line
-            order = db.session.query(Order).filter_by(order_id=order_line.order_id).first()
-
-            # Include jig-specific information (required fields for jig are always present)
-            upj = part.custom_upj or (jig.maxUPJ if jig else 5)
-            jpl = part.custom_jpl or (jig.maxJPL if jig else 10)
-            mpj = part.custom_mpj or (jig.MPJ if jig else 2)
-            jig_type = jig.jig_type if jig else "No Jig"
-
-            # Load-independent operations (polishing and blasting)
-            load_independent_operations = []
-            if part.polishing_selection_status == 1:
-                for step in polishing_details:
-                    load_independent_operations.append({
-                        "operation": f"Polishing; Step {step['step_number']}, Equipment: {step['equipment']}, Grit: {step['grit']}, Compound: {step['compound']}",
-                        "duration": 4 * component_job.loads_required,  # Replace with actual logic if needed
-                        "notes": f"DD/MM & Initial(s) & Quantity: {order_line.quantity}"
-                    })
-
-            if part.blasting_selection_status == 1:
-                blasting_equipment = part.blasting
-                load_independent_operations.append({
-                    "operation": f"Blasting ({blasting_equipment})",
-                    "duration": 2 * component_job.loads_required,  # Replace with actual logic if needed
-                    "notes": f"DD/MM & Initial(s) & Quantity: {order_line.quantity}"
-                })
-
-            # Prepare the JSON response with all necessary details     
-            data = {
-                "component_job_id": component_job.component_job_id,
-                "customer_name": component_job.customer_name,
-                "purchase_order_number": order.purchase_order_number,
-                "part_number": part.part_number,
-                "part_description": part.part_description,
-                "quantity": order_line.quantity,
-                "required_jigs": component_job.required_jigs,
-                "units_per_load": component_job.units_per_load,
-                "quantity_of_final_load": component_job.quantity_of_final_load,
-                "jig_type": jig_type,
-                "upj": upj,
-                "jpl": jpl,
-                "loads_required": component_job.loads_required,
-                "buzzbars_required": component_job.buzzbars_required,
-                "load_independent_operations": component_job.load_independent_operations,
-                "operations": component_job.operations,
-                "voltage": part.voltage,
-                "etch": part.etch,  
-                "anodising_duration": part.anodising_duration,  
-                "strip_etch": part.strip_etch,  
-                "blasting": part.blasting,  
-                "brightening": part.brightening, 
-                "polishing": polishing_details,  
-                "part_image_url": part.image,
-                "jig_image_url": jig.image,
-            }
-
-            # Log detailed response data for debugging
-            logger.info(f"Component job details fetched successfully: {data}")
-
-            return jsonify(data), 200
-        else:
+        component_job = load_component_job(component_job_id)
+        if not component_job:
             error_message = f"Component job with ID {component_job_id} not found."
             logger.warning(error_message)
             return jsonify({'error': error_message}), 404
+
+        data = traveller_context(component_job)
+        logger.info(f"Component job details fetched for job {component_job_id}")
+        return jsonify(data), 200
     except Exception as e:
         # Log the error with stack trace for debugging
         logger.error(f"Error fetching component job details for ID {component_job_id}: {str(e)}", exc_info=True)
         return jsonify({'error': 'An unexpected error occurred. Please try again later.'}), 500
 
+@app.route('/travellers/<int:component_job_id>', methods=['GET'])
+@app.route('/travellers/<int:component_job_id>.<any(html, pdf):format>', methods=['GET'])
+def job_traveller(component_job_id, format='html'):
+    """A component job's printable traveller, served from the cache unless its part or order line has changed."""
+    try:
+        if format == 'pdf' and not pdf_available():
+            return jsonify({"error": "PDF travellers need the xhtml2pdf package; use the HTML traveller"}), 501
+
+        traveller = get_traveller(component_job_id, pdf=(format == 'pdf'))
+        if traveller is None:
+            return jsonify({"error": f"Component job {component_job_id} not found"}), 404
+
+        if format == 'pdf':
+            response = make_response(traveller.pdf)
+            response.headers['Content-Type'] = 'application/pdf'
+            response.headers['Content-Disposition'] = f'inline; filename="traveller-{component_job_id}.pdf"'
+        else:
+            response = make_response(traveller.html)
+        response.set_etag(f"traveller-{component_job_id}-{traveller.part_revision}-{traveller.rendered_at.timestamp():.0f}")
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rendering traveller for component job {component_job_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to render traveller"}), 500
+
+@app.route('/travellers/batch.<any(pdf, zip):format>', methods=['GET'])
+def batch_travellers(format):
+    """
+    Travellers for every job with a load jigged between ?start= and ?end= (YYYY-MM-DD, default today),
+    in schedule order: merged into one PDF, or one PDF per job in a zip that streams as it is rendered.
+    """
+    if not pdf_available() or (format == 'pdf' and not merge_available()):
+        return jsonify({"error": "Batch printing needs the xhtml2pdf package (and pypdf for a merged PDF)"}), 501
+    try:
+        start, end = parse_schedule_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        component_job_ids = scheduled_component_jobs(start, end)
+        if not component_job_ids:
+            return jsonify({"error": f"No loads are scheduled from {start} to {end}"}), 404
+        if len(component_job_ids) > TRAVELLER_BATCH_MAX:
+            return jsonify({"error": f"{len(component_job_ids)} jobs are scheduled; print at most {TRAVELLER_BATCH_MAX} at once"}), 400
+        travellers = prepare_travellers(component_job_ids)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error preparing travellers for {start} to {end}: {str(e)}", exc_info=True)
+        return jsonify({"error": "Failed to prepare travellers"}), 500
+
+    logger.info(f"Printing {len(travellers)} travellers for {start} to {end} as {format}")
+    stream = stream_merged_travellers if format == 'pdf' else stream_traveller_zip
+    return Response(
+        stream_with_context(stream(travellers)),
+        mimetype='application/pdf' if format == 'pdf' else 'application/zip',
+        headers={"Content-Disposition": f'attachment; filename="travellers-{start}-to-{end}.{format}"'},
+    )
+
 @app.route('/manage_customers', methods=['GET', 'POST'])
 def manage_customers():
     logger.info("Accessed manage customers route")
@@ -1172,7 +1500,7 @@ def manage_customers():
 
     try:
         # ✅ Fetch all customers normally for rendering the page
-        customers = [dict(customer_id=str(c.customer_id), customer_name=c.customer_name) for c in Customer.query.all()]
+        customers = [dict(customer_id=str(c['customer_id']), customer_name=c['customer_name']) for c in cached_customers()]
         return render_template('manage_customers.html', customers=customers)
 
     except Exception as e:
@@ -1214,30 +1542,28 @@ def manage_parts():
     logger.info("Accessed manage parts route")
     try:
         # Fetch all customers for the dropdown
-        customers = Customer.query.all()
+        customers = cached_customers()
 
         # Get search parameters from the query string
         selected_customer_id = request.args.get('customer_id')
         search_query = request.args.get('search', '').lower()
 
-        # Initialize parts query
-        query = Part.query
-
-        # Filter by selected customer, if applicable
-        if selected_customer_id:
-            query = query.filter_by(customer_id=selected_customer_id)
-
-        # Filter by search query (part number or description)
         if search_query:
-            query = query.filter(
-                or_(
-                    Part.part_number.ilike(f"%{search_query}%"),
-                    Part.part_description.ilike(f"%{search_query}%")
-                )
-            )
+            # Trigram index lookup: exact, prefix and substring matches first, then close (fuzzy) matches
+            ranked = [part_number for part_number, _, _ in search_parts(search_query, customer_id=selected_customer_id)]
+            found = {}
+            for i in range(0, len(ranked), 1000):  # Stay under SQL Server's 2100 parameter limit
+                for part in Part.query.filter(Part.part_number.in_(ranked[i:i + 1000])).all():
+                    found[part.part_number] = part
+            parts = [found[part_number] for part_number in ranked if part_number in found]
+        else:
+            query = Part.query
+
+            # Filter by selected customer, if applicable
+            if selected_customer_id:
+                query = query.filter_by(customer_id=selected_customer_id)
 
-        # Fetch the filtered parts
-        parts = query.order_by(Part.part_number.desc()).all()
+            parts = query.order_by(Part.part_number.desc()).all()
 
         # Handle POST requests for actions (upload or delete)
         if request.method == 'POST':
@@ -1280,28 +1606,15 @@ def manage_parts():
                     return redirect(url_for('manage_parts'))
 
             elif action == 'delete_part':
-                part = Part.query.filter_by(part_number=part_number).first()
-                if not part:
+                if not db.session.query(Part.part_number).filter_by(part_number=part_number).first():
                     flash(f"No part found with part number {part_number}.", "danger")
                     return redirect(url_for('manage_parts'))
 
-                # 🚀 Step 1: Delete Component Jobs related to this part
-                component_jobs = ComponentJob.query.filter_by(part_id=part.part_number).all()
-                for job in component_jobs:
-                    db.session.delete(job)
-                logger.info(f"Deleted {len(component_jobs)} component jobs for part {part.part_number}.")
-
-                # 🚀 Step 2: Delete Order Lines related to this part
-                order_lines = OrderLine.query.filter_by(part_number=part.part_number).all()
-                for line in order_lines:
-                    db.session.delete(line)
-                logger.info(f"Deleted {len(order_lines)} order lines for part {part.part_number}.")
-
-                # 🚀 Step 3: Delete the part
-                db.session.delete(part)
-                db.session.commit()
-                
-                flash(f"Part {part_number} and all related records deleted successfully!", "success")
+                # Gantt jobs, component jobs and order lines go first, in one transaction with the part
+                counts = Part.purge(part_number)
+
+                flash(f"Part {part_number} deleted with {counts['OrderLine']} order lines, "
+                      f"{counts['component_jobs']} component jobs and {counts['gantt_jobs']} Gantt jobs.", "success")
                 return redirect(url_for('manage_parts'))
 
         # Render the template with parts and customers
@@ -1319,11 +1632,11 @@ def manage_parts():
         return render_template('error.html')
 
 @app.route('/jigs')
+@conditional_on('jigs_inventory')
 def jigs():
     logger.info("Accessed jigs route")
     try:
-        # Load all jigs from the database using SQLAlchemy
-        jigs = Jig.query.all()
+        jigs = cached_jigs()
         return render_template('jigs.html', jigs=jigs)
     except Exception as e:
         logger.exception("Error loading jigs")
@@ -1340,34 +1653,79 @@ def gantt_chart():
     return render_template('gantt_chart.html', gantt_jobs=gantt_jobs)
 
 
+def component_jobs_query():
+    """The columns /get_component_jobs lists (asgi.py serves the same query from its async tier)."""
+    return db.select(ComponentJob.component_job_id, ComponentJob.customer_name, ComponentJob.part_id,
+                     ComponentJob.loads_required, ComponentJob.operation_codes, ComponentJob.row_version)
+
+
+def component_job_summary(job):
+    return {
+        "component_job_id": job.component_job_id,
+        "customer_name": job.customer_name,
+        "part_number": job.part_id,
+        "loads_required": job.loads_required,
+        "row_version": job.row_version,
+        "operations": [{"operation": op.name, "duration": op.duration} for op in decode_operations(job.operation_codes)],
+    }
+
+
 # Route to fetch available component jobs
 @app.route('/get_component_jobs', methods=['GET'])
+@conditional_on('component_jobs', 'OrderLine', 'orders', 'customers')
 def get_component_jobs():
     try:
-        jobs = ComponentJob.query.all()
-        job_list = [
-            {
-                "component_job_id": job.component_job_id,
-                "customer_name": job.customer_name,
-                "part_number": job.part_id,
-                "loads_required": job.loads_required,
-                "operations": job.operations,
-            }
-            for job in jobs
-        ]
+        jobs = db.session.execute(component_jobs_query())
+        job_list = [component_job_summary(job) for job in jobs]
         return jsonify(job_list), 200
     except Exception as e:
         return jsonify({"error": f"Failed to load component jobs: {str(e)}"}), 500
     
 
-# ✅ Safe JSON Parsing Helper
-def parse_json_field(field):
-    """Convert JSON string to Python list if needed"""
-    if isinstance(field, str):  # If stored as a string, parse it
-        return json.loads(field)
-    return field  # If it's already a list, return as is
+# Generic operation names as planned, and the line step each is scheduled on by default
+SCHEDULED_STEP_NAMES = {
+    "Cold Seal 30 min": "Cold Seal A",
+    "Cold Seal 15 min": "Cold Seal A",
+    "Anodising": "Anodising 1A",
+    "Water Rinse (1 or 2)": "Water Rinse 1",
+    "Water Rinse (3 or 4)": "Water Rinse 3",
+    "Water Rinse (5 or 6)": "Water Rinse 5",
+}
+
+def expected_row_version(data=None):
+    """
+    The row_version the client last saw, from the JSON body or ?row_version=. None if it sent none,
+    in which case the edit is unconditional. Raises ValueError if it is not a number.
+    """
+    value = (data or {}).get("row_version", request.args.get("row_version"))
+    return None if value in (None, "") else int(value)
+
+
+def gantt_job_conflict(gantt_job_id):
+    """409 with the load as it is now (null if deleted), so the client can redraw just that load."""
+    gantt_job = db.session.get(GanttJob, gantt_job_id)
+    return jsonify({
+        "error": f"Gantt Job {gantt_job_id} was changed by someone else. Review it and try again.",
+        "current": gantt_job.as_state() if gantt_job else None,
+    }), 409
+
+
+def component_job_conflict(component_job_id):
+    """409 with the component job's current version and the loads already on the board for it."""
+    component_job = db.session.get(ComponentJob, component_job_id)
+    loads = GanttJob.query.filter_by(component_job_id=component_job_id).order_by(GanttJob.load_number).all()
+    return jsonify({
+        "error": f"Component job {component_job_id} was changed or scheduled by someone else. Review it and try again.",
+        "current": {
+            "component_job_id": component_job_id,
+            "row_version": component_job.row_version if component_job else None,
+            "loads": [load.as_state() for load in loads],
+        },
+    }), 409
+
 
 @app.route('/gantt_job', methods=['POST'])
+@idempotent
 def create_gantt_job():
     """
     Creates a Gantt job for a component job while ensuring:
@@ -1380,6 +1738,10 @@ def create_gantt_job():
         data = request.get_json()
         component_job_id = data.get("component_job_id")
         start_time = datetime.strptime(data.get("start_time"), "%Y-%m-%dT%H:%M")
+        try:
+            expected_version = expected_row_version(data)
+        except ValueError:
+            return jsonify({"error": "row_version must be a number"}), 400
 
                 # ✅ Extracting these BEFORE they are used
         rinse_seal_route = data.get("rinse_seal_route", "default")
@@ -1401,29 +1763,20 @@ def create_gantt_job():
         if not customer_id:
             return jsonify({"error": "Customer ID is missing for this job. Cannot proceed."}), 400
 
-        # ✅ Corrected Handling for Operations
-        if isinstance(component_job.operations, str):
-            operations = json.loads(component_job.operations)  # Deserialize if it's a string
-        elif isinstance(component_job.operations, list):
-            operations = component_job.operations  # It's already a list, so we use it directly
-        else:
-            operations = []
-
+        operations = component_job.operations
         if not operations:
             return jsonify({"error": "No valid operations found in the component job."}), 400
 
-        # ✅ Normalization Logic: Standardize Naming for Certain Operations
+        if not component_job.claim(expected_version):
+            db.session.rollback()
+            return component_job_conflict(component_job_id)
+
+        # ✅ Normalization Logic: resolve each operation to its Gantt columns once, not per load
+        steps = []
         for operation in operations:
-            if operation["operation"] in ["Cold Seal 30 min", "Cold Seal 15 min"]:
-                operation["operation"] = "Cold Seal A"
-            elif operation["operation"] == "Anodising":
-                operation["operation"] = "Anodising 1A"  # Default to Anodising 1A
-            elif operation["operation"] == "Water Rinse (1 or 2)":
-                operation["operation"] = "Water Rinse 1"
-            elif operation["operation"] == "Water Rinse (3 or 4)":
-                operation["operation"] = "Water Rinse 3"
-            elif operation["operation"] == "Water Rinse (5 or 6)":
-                operation["operation"] = "Water Rinse 5"
+            column_mapping = COLUMN_MAPPING.get(SCHEDULED_STEP_NAMES.get(operation.name, operation.name))
+            if column_mapping:
+                steps.append((column_mapping[0], column_mapping[1], timedelta(minutes=operation.minutes)))
 
         gantt_jobs = []
         last_load_end_time = start_time  # Tracks the last load's end time
@@ -1440,16 +1793,10 @@ def create_gantt_job():
             )
 
             # ✅ Assign Operations within the same job
-            for operation in operations:
-                operation_name = operation["operation"]
-                duration = float(operation.get("duration", 0))
-
-                column_mapping = COLUMN_MAPPING.get(operation_name)
-                if column_mapping:
-                    start_col, end_col = column_mapping
-                    setattr(gantt_job, start_col, prev_end_time)
-                    prev_end_time += timedelta(minutes=duration)  # Ensuring proper sequencing
-                    setattr(gantt_job, end_col, prev_end_time)
+            for start_col, end_col, duration in steps:
+                setattr(gantt_job, start_col, prev_end_time)
+                prev_end_time += duration  # Ensuring proper sequencing
+                setattr(gantt_job, end_col, prev_end_time)
 
             last_load_end_time = prev_end_time  # Update last load's end time for the next load
             db.session.add(gantt_job)
@@ -1461,34 +1808,48 @@ def create_gantt_job():
 
         adjust_gantt_job_timestamps(component_job_id, rinse_seal_route, anodising_tank)
 
-        return jsonify({"success": True}), 201
+        return jsonify({
+            "success": True,
+            "row_version": db.session.get(ComponentJob, component_job_id).row_version,
+            "loads": [gantt_job.as_state() for gantt_job in GanttJob.query.filter_by(component_job_id=component_job_id)],
+        }), 201
 
+    except (StaleDataError, IntegrityError):  # IntegrityError: already on the board (unique component_job_id)
+        db.session.rollback()
+        return component_job_conflict(component_job_id)
     except Exception as e:
         db.session.rollback()
         logger.error(f"❌ Error creating Gantt Job: {str(e)}")
         return jsonify({"error": str(e)}), 500
     
+def gantt_jobs_query():
+    """The loads /api/get_gantt_jobs lists, with their customer (also served by asgi.py)."""
+    return (
+        db.select(GanttJob.gantt_job_id, GanttJob.component_job_id, Order.customer_id,
+                  Customer.customer_name, GanttJob.load_number, GanttJob.row_version)
+        .join(Order, GanttJob.order_id == Order.order_id)
+        .join(Customer, Order.customer_id == Customer.customer_id)
+    )
+
+
+def gantt_job_summary(job):
+    return {
+        "gantt_job_id": job.gantt_job_id,
+        "component_job_id": job.component_job_id,
+        "customer_name": job.customer_name,
+        "load_number": job.load_number,
+        "row_version": job.row_version
+    }
+
+
 @app.route('/api/get_gantt_jobs', methods=['GET'])
+@conditional_on('gantt_jobs', 'orders', 'customers')
 def get_gantt_jobs():
     """API: Fetch a list of Gantt Jobs for the delete dropdown."""
     try:
-        gantt_jobs = (
-            db.session.query(GanttJob.gantt_job_id, GanttJob.component_job_id, Order.customer_id, 
-                             Customer.customer_name, GanttJob.load_number)
-            .join(Order, GanttJob.order_id == Order.order_id)
-            .join(Customer, Order.customer_id == Customer.customer_id)
-            .all()
-        )
+        gantt_jobs = db.session.execute(gantt_jobs_query()).all()
 
-        job_list = [
-            {
-                "gantt_job_id": job.gantt_job_id,
-                "component_job_id": job.component_job_id,
-                "customer_name": job.customer_name,
-                "load_number": job.load_number
-            }
-            for job in gantt_jobs
-        ]
+        job_list = [gantt_job_summary(job) for job in gantt_jobs]
 
         return jsonify(job_list), 200
 
@@ -1498,7 +1859,12 @@ def get_gantt_jobs():
 
 @app.route('/api/delete_gantt_job/<int:gantt_job_id>', methods=['DELETE'])
 def delete_gantt_job(gantt_job_id):
-    """Deletes a Gantt Job by ID, ensuring related data is fully loaded before deletion."""
+    """Deletes a Gantt Job by ID, if it is still at the ?row_version= (or JSON row_version) the client last saw."""
+    try:
+        expected_version = expected_row_version(request.get_json(silent=True))
+    except ValueError:
+        return jsonify({"error": "row_version must be a number"}), 400
+
     try:
         # ✅ Fetch Gantt Job with all necessary relationships loaded (prevents lazy load issues)
         gantt_job = db.session.query(GanttJob).options(
@@ -1507,13 +1873,18 @@ def delete_gantt_job(gantt_job_id):
 
         if not gantt_job:
             return jsonify({"error": f"Gantt Job {gantt_job_id} not found"}), 404
+        if expected_version is not None and gantt_job.row_version != expected_version:
+            return gantt_job_conflict(gantt_job_id)
 
-        db.session.delete(gantt_job)  # ✅ Delete the job
+        db.session.delete(gantt_job)  # ✅ Delete the job (only if still at the version read above)
         db.session.commit()  # ✅ Commit the deletion
 
         logger.info(f"✅ Gantt Job {gantt_job_id} deleted successfully.")
         return jsonify({"success": True, "message": f"Gantt Job {gantt_job_id} deleted"}), 200
 
+    except StaleDataError:
+        db.session.rollback()
+        return gantt_job_conflict(gantt_job_id)
     except Exception as e:
         db.session.rollback()
         logger.error(f"❌ Error deleting Gantt Job {gantt_job_id}: {str(e)}")
@@ -1521,114 +1892,116 @@ def delete_gantt_job(gantt_job_id):
 
 @app.route('/api/shift_gantt_job/<int:gantt_job_id>', methods=['POST'])
 def shift_gantt_job(gantt_job_id):
-    """Shifts all timestamps for a Gantt Job by X minutes."""
+    """Shifts all timestamps for a Gantt Job by X minutes, if it is still at the row_version the client last saw."""
     try:
-        data = request.get_json()
-        shift_minutes = int(data.get("shift_minutes", 0))  # Get shift value from request
+        data = request.get_json(silent=True) or {}
+        try:
+            shift_minutes = int(data.get("shift_minutes", 0))  # Get shift value from request
+            expected_version = expected_row_version(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": "shift_minutes and row_version must be numbers"}), 400
 
         if shift_minutes == 0:
             return jsonify({"error": "No shift value provided"}), 400
 
-        # ✅ Fetch the job with all timestamps
-        gantt_job = db.session.query(GanttJob).options(
-            joinedload(GanttJob.order)  
-        ).filter_by(gantt_job_id=gantt_job_id).first()
-
+        gantt_job = db.session.get(GanttJob, gantt_job_id)
         if not gantt_job:
             return jsonify({"error": "Gantt Job not found"}), 404
+        if expected_version is not None and gantt_job.row_version != expected_version:
+            return gantt_job_conflict(gantt_job_id)
 
-        shift_delta = timedelta(minutes=shift_minutes)
-
-        # ✅ Iterate over all time-related columns and shift them
-        for field in COLUMN_MAPPING.values():
-            if isinstance(field, list):  # Handles multi-step operations
-                for start_col, end_col in field:
-                    start_time = getattr(gantt_job, start_col)
-                    end_time = getattr(gantt_job, end_col)
-
-                    if start_time and end_time:
-                        setattr(gantt_job, start_col, start_time + shift_delta)
-                        setattr(gantt_job, end_col, end_time + shift_delta)
-
-        db.session.commit()  # ✅ Save the changes
+        gantt_job.shift(timedelta(minutes=shift_minutes))
+        db.session.commit()  # ✅ Save the changes (only if still at the version read above)
 
         logger.info(f"✅ Gantt Job {gantt_job_id} shifted by {shift_minutes} minutes.")
-        return jsonify({"success": True, "message": f"Job shifted by {shift_minutes} minutes"}), 200
+        return jsonify({
+            "success": True,
+            "message": f"Job shifted by {shift_minutes} minutes",
+            "gantt_job": gantt_job.as_state(),
+        }), 200
 
+    except StaleDataError:
+        db.session.rollback()
+        return gantt_job_conflict(gantt_job_id)
     except Exception as e:
         db.session.rollback()
         logger.error(f"❌ Error shifting Gantt Job {gantt_job_id}: {str(e)}")
         return jsonify({"error": f"Failed to shift Gantt Job: {str(e)}"}), 500
 
     
-@app.route('/gantt_data', methods=['GET'])
-def get_gantt_data():
-    try:
-        # ✅ Optimize Query Performance: Use joinedload to fetch related data in a single query
-        gantt_jobs = (
-            GanttJob.query
-            .options(
-                joinedload(GanttJob.order).joinedload(Order.customer)  # Preload Order & Customer
-            )
-            .all()
-        )
+def gantt_data_query():
+    """Every load on the board with its order and customer, in one query (also served by asgi.py)."""
+    # ✅ Optimize Query Performance: Use joinedload to fetch related data in a single query
+    return db.select(GanttJob).options(
+        joinedload(GanttJob.order).joinedload(Order.customer)  # Preload Order & Customer
+    )
 
-        if not gantt_jobs:
-            return jsonify({"message": "No Gantt jobs available."}), 200
 
-        job_data = []
-        process_steps_list = list(COLUMN_MAPPING.keys())  # ✅ Extract clean process steps
+def gantt_job_timeline(job):
+    """One load for /gantt_data: who it is for and the start/end of each step it goes through."""
+    order = job.order  # Preloaded Order
+    customer = order.customer if order else None  # Preloaded Customer
+
+    job_dict = {
+        "gantt_job_id": job.gantt_job_id,
+        "row_version": job.row_version,
+        "component_job_id": job.component_job_id,
+        "customer_id": order.customer_id if order else None,
+        "customer_name": customer.customer_name if customer else "Unknown",
+        "order_id": job.order_id,
+        "load_number": job.load_number,
+        "process_steps": {}
+    }
 
-        for job in gantt_jobs:
-            order = job.order  # Preloaded Order
-            customer = order.customer if order else None  # Preloaded Customer
-
-            job_dict = {
-                "component_job_id": job.component_job_id,
-                "customer_id": order.customer_id if order else None,
-                "customer_name": customer.customer_name if customer else "Unknown",
-                "order_id": job.order_id,
-                "load_number": job.load_number,
-                "process_steps": {}
-            }
+    # ✅ Iterate over COLUMN_MAPPING to extract all timestamps
+    for process_name, columns in COLUMN_MAPPING.items():
+        process_timestamps = []  # Store all valid timestamps
 
-            # ✅ Iterate over COLUMN_MAPPING to extract all timestamps
-            for process_name, columns in COLUMN_MAPPING.items():
-                process_timestamps = []  # Store all valid timestamps
+        if isinstance(columns[0], list):  # Multi-option steps
+            for column_pair in columns:
+                start_column, end_column = column_pair
+                start_time = getattr(job, start_column, None)
+                end_time = getattr(job, end_column, None)
 
-                if isinstance(columns[0], list):  # Multi-option steps
-                    for column_pair in columns:
-                        start_column, end_column = column_pair
-                        start_time = getattr(job, start_column, None)
-                        end_time = getattr(job, end_column, None)
+                if start_time and end_time:
+                    process_timestamps.append({
+                        "start": start_time.isoformat(),
+                        "end": end_time.isoformat()
+                    })
 
-                        if start_time and end_time:
-                            process_timestamps.append({
-                                "start": start_time.isoformat(),
-                                "end": end_time.isoformat()
-                            })
+        else:  # Standard single-step process
+            start_column, end_column = columns
+            start_time = getattr(job, start_column, None)
+            end_time = getattr(job, end_column, None)
 
-                else:  # Standard single-step process
-                    start_column, end_column = columns
-                    start_time = getattr(job, start_column, None)
-                    end_time = getattr(job, end_column, None)
+            if start_time and end_time:
+                process_timestamps.append({
+                    "start": start_time.isoformat(),
+                    "end": end_time.isoformat()
+                })
 
-                    if start_time and end_time:
-                        process_timestamps.append({
-                            "start": start_time.isoformat(),
-                            "end": end_time.isoformat()
-                        })
+        # ✅ Store timestamps if any exist
+        if process_timestamps:
+            job_dict["process_steps"][process_name] = process_timestamps
 
-                # ✅ Store timestamps if any exist
-                if process_timestamps:
-                    job_dict["process_steps"][process_name] = process_timestamps
+    return job_dict
 
-            job_data.append(job_dict)
 
-        return jsonify({
-            "jobs": job_data,
-            "process_steps": process_steps_list
-        }), 200
+def gantt_data_payload(gantt_jobs):
+    if not gantt_jobs:
+        return {"message": "No Gantt jobs available."}
+
+    return {
+        "jobs": [gantt_job_timeline(job) for job in gantt_jobs],
+        "process_steps": list(COLUMN_MAPPING.keys())  # ✅ Extract clean process steps
+    }
+
+
+@app.route('/gantt_data', methods=['GET'])
+def get_gantt_data():
+    try:
+        gantt_jobs = db.session.execute(gantt_data_query()).scalars().all()
+        return jsonify(gantt_data_payload(gantt_jobs)), 200
 
     except Exception as e:
         app.logger.error(f"❌ Error fetching Gantt data: {str(e)}", exc_info=True)
@@ -1651,11 +2024,11 @@ def adjust_gantt_job_timestamps(component_job_id, rinse_seal_route, anodising_ta
         logger.info(f"🔄 Found {len(gantt_jobs)} Gantt Jobs for adjustment.")
 
         for job in gantt_jobs:
-            logger.info(f"🔧 Adjusting Gantt Job ID {job.gantt_job_id}...")
+            logger.debug(f"🔧 Adjusting Gantt Job ID {job.gantt_job_id}...")
 
             # ✅ Adjust Rinse Steps Based on Selection
             if rinse_seal_route == "even_rinse_cold_seal_b":
-                logger.info(f"🔄 Moving rinse steps to even numbers for job {job.gantt_job_id}")
+                logger.debug(f"🔄 Moving rinse steps to even numbers for job {job.gantt_job_id}")
 
                 job.water_rinse_2_start, job.water_rinse_2_end = job.water_rinse_1_start, job.water_rinse_1_end
                 job.water_rinse_1_start, job.water_rinse_1_end = None, None
@@ -1669,7 +2042,7 @@ def adjust_gantt_job_timestamps(component_job_id, rinse_seal_route, anodising_ta
                 job.cold_seal_b_start, job.cold_seal_b_end = job.cold_seal_a_start, job.cold_seal_a_end
                 job.cold_seal_a_start, job.cold_seal_a_end = None, None
 
-                logger.info(f"✅ Rinse steps and Cold Seal moved for job {job.gantt_job_id}")
+                logger.debug(f"✅ Rinse steps and Cold Seal moved for job {job.gantt_job_id}")
 
             # ✅ Adjust Anodising Tanks Based on Selection
             anodising_map = {
@@ -1686,7 +2059,7 @@ def adjust_gantt_job_timestamps(component_job_id, rinse_seal_route, anodising_ta
                 setattr(job, old_start, None)                     # Clear old timestamps
                 setattr(job, old_end, None)
 
-                logger.info(f"✅ Anodising moved from {old_start} to {new_start} for job {job.gantt_job_id}")
+                logger.debug(f"✅ Anodising moved from {old_start} to {new_start} for job {job.gantt_job_id}")
 
         db.session.commit()
         logger.info(f"✅ Adjusted timestamps successfully for {len(gantt_jobs)} Gantt Jobs.")
@@ -1696,6 +2069,178 @@ def adjust_gantt_job_timestamps(component_job_id, rinse_seal_route, anodising_ta
         logger.error(f"❌ Failed to adjust Gantt Job timestamps: {e}", exc_info=True)
 
 
+@app.route('/api/quote', methods=['POST'])
+def quote():
+    """Prices many {part_number, quantity} lines at once from their load plans. Writes nothing."""
+    try:
+        customer_id, lines = parse_quote_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        return jsonify(quote_lines(lines, customer_id)), 200
+    except Exception as e:
+        logger.error(f"Error quoting {len(lines)} lines: {str(e)}")
+        return jsonify({"error": "Failed to build quote"}), 500
+
+
+@app.route('/api/reports/production', methods=['GET'])
+def production_report_api():
+    """Loads per day, tank utilisation (?days=, default 30) and lead time per customer (?weeks=, default 12), from the rollups."""
+    try:
+        days = max(1, min(request.args.get('days', 30, type=int) or 30, 366))
+        weeks = max(1, min(request.args.get('weeks', 12, type=int) or 12, 104))
+        report = production_report(days=days, weeks=weeks)
+
+        customer_names = {customer["customer_id"]: customer["customer_name"] for customer in cached_customers()}
+        for row in report["lead_times"]:
+            row["customer_name"] = customer_names.get(row["customer_id"])
+        return jsonify(report), 200
+    except Exception as e:
+        logger.error(f"Error building production report: {str(e)}")
+        return jsonify({"error": "Failed to build production report"}), 500
+
+
+# Chart row (COLUMN_MAPPING name) of each step, by the prefix of its <step>_start / <step>_end columns
+STEP_NAMES = {columns[0][:-len('_start')]: name for name, columns in COLUMN_MAPPING.items()
+              if not isinstance(columns[0], list)}
+
+@app.route('/api/schedule_conflicts', methods=['GET'])
+@conditional_on('gantt_jobs', 'customers')
+def schedule_conflicts():
+    """
+    Loads booked into the same tank at the same time: on the live board, or among live and archived
+    loads between ?start= and ?end= (YYYY-MM-DD, inclusive). Drives the red flags on the Gantt chart.
+    """
+    try:
+        start, end = parse_conflict_window(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        report = find_conflicts(start, end)
+
+        customer_names = {customer["customer_id"]: customer["customer_name"] for customer in cached_customers()}
+        for conflict in report["conflicts"]:
+            conflict["step"] = STEP_NAMES.get(conflict["tank"], conflict["tank"].replace('_', ' ').title())
+            for load in conflict["loads"]:
+                load["customer_name"] = customer_names.get(load["customer_id"])
+        return jsonify(report), 200
+    except Exception as e:
+        logger.error(f"Error checking the schedule for conflicts: {str(e)}")
+        return jsonify({"error": "Failed to check the schedule for conflicts"}), 500
+
+
+@app.route('/admin/sql_stats', methods=['GET', 'DELETE'])
+@admin_required
+def sql_stats():
+    """Admin: per-endpoint SQL aggregates for this worker. DELETE resets them."""
+    if request.method == 'DELETE':
+        SQL_STATS.reset()
+        return jsonify({"success": True}), 200
+
+    return jsonify({"pid": os.getpid(), "endpoints": SQL_STATS.snapshot()}), 200
+
+@app.route('/admin/profiles', methods=['GET'])
+@admin_required
+def profiles():
+    """Admin: request profiles written by this host, newest first."""
+    return jsonify({"profile_dir": PROFILE_DIR, "profiles": list_profiles()}), 200
+
+@app.route('/admin/profiles/<path:filename>', methods=['GET'])
+@admin_required
+def download_profile(filename):
+    """Admin: download a .prof (pstats) file for snakeviz / flameprof."""
+    return send_from_directory(PROFILE_DIR, filename, as_attachment=True)
+
+@app.route('/metrics', methods=['GET'])
+@admin_required
+def metrics():
+    """Prometheus text exposition of request metrics, aggregated across gunicorn workers."""
+    body, content_type = render_metrics()
+    return body, 200, {'Content-Type': content_type}
+
+
+@app.route('/admin/shared_cache', methods=['GET', 'DELETE'])
+@admin_required
+def shared_cache():
+    """Admin: shared reference-data cache size and this worker's hits/misses. DELETE empties it."""
+    if request.method == 'DELETE':
+        SHARED_CACHE.clear()
+        return jsonify({"success": True}), 200
+
+    return jsonify({"pid": os.getpid(), **SHARED_CACHE.summary()}), 200
+
+
+@app.cli.command('rebuild-part-search-index')
+def rebuild_part_search_index():
+    """Rebuilds the part_search_grams trigram index from the parts table."""
+    indexed = PartSearchGram.rebuild()
+    print(f"Indexed {indexed} parts.")
+
+
+@app.cli.command('purge-draft-orders')
+@click.option('--days', default=30, show_default=True, help="Delete drafts untouched for this many days.")
+def purge_draft_orders(days):
+    """Deletes abandoned draft orders and their lines."""
+    removed = DraftOrder.delete_stale(days)
+    print(f"Deleted {removed} draft orders.")
+
+
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys():
+    """Deletes idempotency keys older than IDEMPOTENCY_WINDOW_SECONDS."""
+    removed = IdempotencyKey.delete_expired(idempotency.IDEMPOTENCY_WINDOW_SECONDS)
+    print(f"Deleted {removed} idempotency keys.")
+
+
+@app.cli.command('archive-gantt-jobs')
+@click.option('--days', default=2, show_default=True, help="Archive loads whose jigging started this many days ago.")
+@click.option('--batch-size', default=500, show_default=True, help="Rows moved per transaction.")
+@click.option('--max-batches', type=int, default=None, help="Stop after this many batches; the next run resumes.")
+@click.option('--pause', default=0.0, show_default=True, help="Seconds to wait between batches.")
+def archive_gantt_jobs(days, batch_size, max_batches, pause):
+    """Moves old Gantt jobs into gantt_jobs_archive in short batches. Safe to schedule and re-run."""
+    report = GanttJob.archive_old_records(older_than_days=days, batch_size=batch_size,
+                                          max_batches=max_batches, pause_seconds=pause)
+    print(f"Moved {report['rows_moved']} Gantt jobs started before {report['threshold']} "
+          f"in {report['batches']} batches ({report['duration_seconds']}s).")
+
+
+@app.cli.command('refresh-rollups')
+@click.option('--rebuild', is_flag=True, help="Recompute the rollups from all live and archived loads.")
+def refresh_production_rollups(rebuild):
+    """Rolls newly finished, moved and deleted loads into the throughput and lead-time rollups. Schedule it every few minutes."""
+    report = refresh_rollups(rebuild=rebuild)
+    print(f"Rolled up {report['loads']} loads finished through {report['finished_through']} "
+          f"({report['duration_seconds']}s).")
+
+@app.cli.command('print-travellers')
+@click.option('--start', default=None, help="First day of the schedule (YYYY-MM-DD). Defaults to today.")
+@click.option('--end', default=None, help="Last day of the schedule (YYYY-MM-DD). Defaults to --start.")
+@click.option('--output', required=True, type=click.Path(dir_okay=False, writable=True),
+              help="A .pdf file for one merged document, or a .zip for one PDF per job.")
+def print_travellers(start, end, output):
+    """Renders the travellers of every job jigged in a date range, in schedule order."""
+    merged = not output.lower().endswith('.zip')
+    if not pdf_available() or (merged and not merge_available()):
+        raise click.ClickException("Needs the xhtml2pdf package (and pypdf for a merged PDF)")
+    try:
+        start, end = parse_schedule_range(start, end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    component_job_ids = scheduled_component_jobs(start, end)
+    if not component_job_ids:
+        raise click.ClickException(f"No loads are scheduled from {start} to {end}")
+    started = datetime.now()
+    travellers = prepare_travellers(component_job_ids)
+    with open(output, 'wb') as file:
+        for chunk in (stream_merged_travellers if merged else stream_traveller_zip)(travellers):
+            file.write(chunk)
+    print(f"Wrote {len(travellers)} travellers for {start} to {end} to {output} "
+          f"({(datetime.now() - started).total_seconds():.1f}s).")
+
 # Error Handlers
 @app.errorhandler(500)
 def internal_error(error):
@@ -0,0 +1,89 @@
+"""
+Byte and latency savings of response compression on the large pages and JSON bodies.
+
+Fetches each route with no Accept-Encoding, then with gzip (and br when the brotli package is
+installed). Reports the body size, server-side latency including compression, and the estimated
+time to deliver the response over a slow link (default 5 Mbit/s, shop-floor Wi-Fi).
+
+    python -m benchmarks.bench_compression --scale 10000
+    python -m benchmarks.bench_compression --scale 100000 --link-mbps 2 --repeat 5
+"""
+import os
+import logging
+import argparse
+
+from benchmarks.common import append_results, database_path, load_app, time_calls
+from benchmarks.generate_data import LOADTEST_USERNAME
+
+SUITE = 'compression'
+
+
+def routes(customer_id):
+    return [
+        ("orders page", '/orders'),
+        ("gantt_chart page", '/gantt_chart'),
+        ("gantt_data json", '/gantt_data'),
+        ("get_component_jobs json", '/get_component_jobs'),
+        ("get_parts json", f'/get_parts/{customer_id}'),
+    ]
+
+
+def measure(client, url, encoding, repeat, link_mbps):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(url, headers=headers)
+    size = len(response.data)
+    stats = time_calls(lambda: client.get(url, headers=headers), repeat)
+    transfer_ms = size * 8 / (link_mbps * 1_000_000) * 1000
+    return {
+        "bytes": size,
+        "content_encoding": response.headers.get('Content-Encoding', 'identity'),
+        "median_ms": stats["median_ms"],
+        "p95_ms": stats["p95_ms"],
+        "delivered_ms": round(stats["median_ms"] + transfer_ms, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response sizes and latency with and without compression.")
+    parser.add_argument('--scale', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--link-mbps', type=float, default=5.0, help="Link speed for the delivered-time estimate.")
+    parser.add_argument('--no-save', action='store_true', help="Do not append to benchmarks/results.json.")
+    args = parser.parse_args()
+
+    db_path = database_path(args.scale)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} not found. Run: python -m benchmarks.generate_data --scale {args.scale}")
+
+    app, db = load_app(db_path, log_level=logging.WARNING)
+    from compression import available_encodings
+    from models import Customer
+
+    with app.app_context():
+        customer_id = db.session.query(Customer.customer_id).order_by(Customer.customer_id).first()[0]
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = LOADTEST_USERNAME
+
+    encodings = [None] + list(reversed(available_encodings()))
+    results = {}
+    print(f"Compression at scale {args.scale}, delivered over {args.link_mbps:g} Mbit/s:")
+    print(f"  {'route':<26} {'encoding':<9} {'bytes':>11} {'saved':>7} {'server p50':>11} {'delivered':>11}")
+    for name, url in routes(customer_id):
+        results[name] = {}
+        baseline = None
+        for encoding in encodings:
+            stats = measure(client, url, encoding, args.repeat, args.link_mbps)
+            results[name][stats["content_encoding"]] = stats
+            baseline = baseline or stats
+            saved = (1 - stats["bytes"] / baseline["bytes"]) * 100 if baseline["bytes"] else 0
+            print(f"  {name:<26} {stats['content_encoding']:<9} {stats['bytes']:>11,} {saved:>6.1f}% "
+                  f"{stats['median_ms']:>9.1f}ms {stats['delivered_ms']:>9.1f}ms")
+
+    if not args.no_save:
+        append_results(SUITE, args.scale, {"link_mbps": args.link_mbps, "routes": results})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmarks for the core paths, run against datasets from benchmarks.generate_data.
+
+    python -m benchmarks.bench_core                      # 1k, 10k and 100k rows
+    python -m benchmarks.bench_core --scale 10000 --repeat 50
+
+Each run is appended to benchmarks/results.json and compared with the previous run at the same
+scale, so regressions show up as a percentage change.
+"""
+import os
+import time
+import random
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import (DEFAULT_SCALES, QueryCounter, append_results, database_path, load_app,
+                               print_comparison, summarise, time_calls)
+
+SUITE = 'core'
+
+
+def bench(name, results, engine, func, repeat):
+    with QueryCounter(engine) as counter:
+        stats = time_calls(func, repeat)
+    stats["queries_per_call"] = round(counter.count / repeat, 1)
+    results[name] = stats
+
+
+def bench_generate_component_jobs(app, db, results, rng, repeat):
+    """Times ComponentJob.generate_component_jobs on existing orders, removing the extra jobs afterwards."""
+    from models import ComponentJob, Order
+
+    with app.app_context():
+        order_ids = [row[0] for row in db.session.query(Order.order_id).all()]
+        samples = []
+        with QueryCounter(db.engine) as counter:
+            for order_id in rng.sample(order_ids, min(repeat, len(order_ids))):
+                order = db.session.get(Order, order_id)
+                start = time.perf_counter()
+                jobs = ComponentJob.generate_component_jobs(order)
+                samples.append((time.perf_counter() - start) * 1000)
+                for job in jobs:
+                    db.session.delete(job)
+                db.session.commit()
+        stats = summarise(samples)
+        stats["queries_per_call"] = round(counter.count / len(samples), 1)
+        results["generate_component_jobs"] = stats
+
+
+def bench_create_gantt_job(app, db, engine, client, results, rng, repeat):
+    """Times POST /gantt_job for unscheduled single-load jobs, deleting the created loads afterwards."""
+    from models import ComponentJob, GanttJob
+
+    with app.app_context():
+        candidates = [
+            row[0] for row in db.session.query(ComponentJob.component_job_id)
+            .outerjoin(GanttJob, GanttJob.component_job_id == ComponentJob.component_job_id)
+            .filter(GanttJob.gantt_job_id.is_(None), ComponentJob.loads_required == 1)
+            .limit(repeat * 10).all()
+        ]
+    chosen = rng.sample(candidates, min(repeat, len(candidates)))
+    start_time = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M")
+
+    samples = []
+    with QueryCounter(engine) as counter:
+        for component_job_id in chosen:
+            start = time.perf_counter()
+            client.post('/gantt_job', json={"component_job_id": component_job_id, "start_time": start_time})
+            samples.append((time.perf_counter() - start) * 1000)
+
+    with app.app_context():
+        GanttJob.query.filter(GanttJob.component_job_id.in_(chosen)).delete(synchronize_session=False)
+        db.session.commit()
+
+    stats = summarise(samples)
+    stats["queries_per_call"] = round(counter.count / max(len(samples), 1), 1)
+    results["create_gantt_job"] = stats
+
+
+def run_scale(scale, repeat, seed):
+    db_path = database_path(scale)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} not found. Run: python -m benchmarks.generate_data --scale {scale}")
+
+    app, db = load_app(db_path, log_level=logging.WARNING)
+    client = app.test_client()
+    rng = random.Random(seed)
+
+    with app.app_context():
+        from models import Customer
+        customer_id = db.session.query(Customer.customer_id).order_by(Customer.customer_id).first()[0]
+        engine = db.engine
+
+    results = {}
+    bench_generate_component_jobs(app, db, results, rng, repeat)
+    bench_create_gantt_job(app, db, engine, client, results, rng, repeat)
+    bench("get_gantt_data", results, engine, lambda: client.get('/gantt_data'), repeat)
+    bench("component_jobs", results, engine, lambda: client.get('/component_jobs'), repeat)
+    bench("component_jobs_filtered", results, engine,
+          lambda: client.get(f'/component_jobs?customer_id={customer_id}&sort_by=date_desc'), repeat)
+    bench("manage_parts_search_description", results, engine,
+          lambda: client.get('/manage_parts?search=bracket'), repeat)
+    bench("manage_parts_search_part_number", results, engine,
+          lambda: client.get(f'/manage_parts?search=P{customer_id:04d}-0001'), repeat)
+    bench("schedule_conflicts_board", results, engine, lambda: client.get('/api/schedule_conflicts'), repeat)
+    month_ago = datetime.now().date() - timedelta(days=30)
+    bench("schedule_conflicts_month", results, engine,
+          lambda: client.get(f'/api/schedule_conflicts?start={month_ago}&end={month_ago + timedelta(days=30)}'), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the core anodising.net code paths.")
+    parser.add_argument('--scale', type=int, action='append',
+                        help="Dataset scale to run (repeatable). Defaults to 1000, 10000 and 100000.")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed calls per benchmark.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-save', action='store_true', help="Do not append to benchmarks/results.json.")
+    args = parser.parse_args()
+
+    scales = args.scale or list(DEFAULT_SCALES)
+    if len(scales) > 1:
+        # load_app binds the app to one database per process, so run each scale in a fresh interpreter
+        import subprocess
+        import sys
+        for scale in scales:
+            command = [sys.executable, '-m', 'benchmarks.bench_core', '--scale', str(scale),
+                       '--repeat', str(args.repeat), '--seed', str(args.seed)]
+            if args.no_save:
+                command.append('--no-save')
+            subprocess.run(command, check=True)
+        return
+
+    scale = scales[0]
+    results = run_scale(scale, args.repeat, args.seed)
+    previous = None if args.no_save else append_results(SUITE, scale, results)
+    print(f"Core benchmarks at scale {scale} (median latency):")
+    print_comparison(results, previous)
+
+
+if __name__ == '__main__':
+    main()
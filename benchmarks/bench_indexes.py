@@ -0,0 +1,120 @@
+"""
+Before/after benchmark for the secondary indexes migration (a1c4e7d2b9f0).
+
+Copies a generated dataset, drops the migration's indexes, records the SQLite query plan and
+timing of each hot query, creates the indexes and records them again.
+
+    python -m benchmarks.bench_indexes --scale 100000
+"""
+import os
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import importlib.util
+from datetime import datetime, timedelta
+
+from benchmarks.common import REPO_ROOT, append_results, database_path, print_comparison, time_calls
+
+SUITE = 'indexes'
+MIGRATION = os.path.join(REPO_ROOT, 'migrations', 'versions', 'a1c4e7d2b9f0_add_secondary_indexes.py')
+
+
+def load_migration_indexes():
+    spec = importlib.util.spec_from_file_location('add_secondary_indexes', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.INDEXES
+
+
+def hot_queries(connection):
+    """(name, sql, params) for the lookups the app runs constantly, with realistic parameter values."""
+    customer_id, part_number = connection.execute(
+        "SELECT customer_id, part_number FROM parts ORDER BY part_number LIMIT 1 OFFSET 7").fetchone()
+    order_id, = connection.execute("SELECT order_id FROM orders ORDER BY order_id DESC LIMIT 1").fetchone()
+    order_line_id, = connection.execute('SELECT max("OrderLine_id") FROM "OrderLine"').fetchone()
+    jig_type, dye = connection.execute("SELECT jig_type, dye FROM parts WHERE dye != 'Default' LIMIT 1").fetchone()
+    threshold = (datetime.utcnow() - timedelta(days=2)).strftime('%Y-%m-%d %H:%M:%S')
+
+    return [
+        ("get_parts by customer",
+         "SELECT part_number, part_description FROM parts WHERE customer_id = ?", (customer_id,)),
+        ("duplicate purchase order check",
+         "SELECT order_id FROM orders WHERE purchase_order_number = ? LIMIT 1", ("PO-NEW-ORDER",)),
+        ("order lines of an order",
+         'SELECT * FROM "OrderLine" WHERE order_id = ?', (order_id,)),
+        ("order lines of a part (delete_part)",
+         'SELECT "OrderLine_id" FROM "OrderLine" WHERE part_number = ?', (part_number,)),
+        ("component jobs of a part (delete_part)",
+         "SELECT component_job_id FROM component_jobs WHERE part_id = ?", (part_number,)),
+        ("component jobs of an order line",
+         "SELECT component_job_id FROM component_jobs WHERE order_line_id = ?", (order_line_id,)),
+        ("parts by jig type and dye",
+         "SELECT part_number FROM parts WHERE jig_type = ? AND dye = ?", (jig_type, dye)),
+        ("gantt jobs older than 2 days",
+         "SELECT count(*) FROM gantt_jobs WHERE jigging_start < ?", (threshold,)),
+        ("component_jobs page for a customer by date",
+         'SELECT c.component_job_id, o.date_of_arrival FROM component_jobs c '
+         'JOIN "OrderLine" l ON c.order_line_id = l."OrderLine_id" '
+         'JOIN orders o ON o.order_id = l.order_id '
+         'JOIN parts p ON p.part_number = l.part_number '
+         'WHERE o.customer_id = ? ORDER BY o.date_of_arrival DESC, c.component_job_id DESC LIMIT 101',
+         (customer_id,)),
+    ]
+
+
+def measure(connection, queries, repeat):
+    results = {}
+    for name, sql, params in queries:
+        plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        stats = time_calls(lambda: connection.execute(sql, params).fetchall(), repeat)
+        stats["plan"] = plan
+        results[name] = stats
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and timings before/after the index migration.")
+    parser.add_argument('--scale', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--no-save', action='store_true', help="Do not append to benchmarks/results.json.")
+    args = parser.parse_args()
+
+    source = database_path(args.scale)
+    if not os.path.exists(source):
+        raise SystemExit(f"{source} not found. Run: python -m benchmarks.generate_data --scale {args.scale}")
+
+    indexes = load_migration_indexes()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        shutil.copyfile(source, db_path)
+        connection = sqlite3.connect(db_path)
+        try:
+            for name, _, _ in indexes:
+                connection.execute(f'DROP INDEX IF EXISTS "{name}"')
+            connection.execute("ANALYZE")
+            queries = hot_queries(connection)
+            before = measure(connection, queries, args.repeat)
+
+            for name, table, columns in indexes:
+                column_list = ", ".join(f'"{column}"' for column in columns)
+                connection.execute(f'CREATE INDEX "{name}" ON "{table}" ({column_list})')
+            connection.execute("ANALYZE")
+            after = measure(connection, queries, args.repeat)
+        finally:
+            connection.close()
+
+    for name in before:
+        print(f"\n{name}")
+        print(f"  before {before[name]['median_ms']:>9.3f} ms  {' / '.join(before[name]['plan'])}")
+        print(f"  after  {after[name]['median_ms']:>9.3f} ms  {' / '.join(after[name]['plan'])}")
+
+    if not args.no_save:
+        previous = append_results(SUITE, args.scale, {"before": before, "after": after})
+        if previous:
+            print("\nAfter-index medians compared with the previous run:")
+            print_comparison(after, {**previous, "results": previous["results"]["after"]})
+
+
+if __name__ == '__main__':
+    main()
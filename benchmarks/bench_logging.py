@@ -0,0 +1,116 @@
+"""
+Request latency with logging on: synchronous writes versus the queued writer thread.
+
+Each route is timed with INFO logging off, with records formatted and written on the request
+thread (the old setup), and through the QueueHandler/QueueListener from structured_logging.
+The log stream is a sink whose writes take --sink-latency-ms each, standing in for a stdout pipe
+that App Service's log collector is slow to drain.
+
+    python -m benchmarks.bench_logging --scale 10000
+    python -m benchmarks.bench_logging --scale 10000 --sink-latency-ms 5 --repeat 50
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import argparse
+import threading
+
+from benchmarks.common import append_results, database_path, load_app, time_calls
+from benchmarks.generate_data import LOADTEST_USERNAME
+
+SUITE = 'logging'
+
+
+class SlowSink:
+    """A text stream whose every write blocks for `latency` seconds, and which counts its lines."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        time.sleep(self.latency)
+        with self._lock:
+            self.lines += text.count('\n')
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def routes(component_job_id):
+    return [
+        ("orders page", '/orders'),
+        ("gantt_chart page", '/gantt_chart'),
+        ("component_job_details json", f'/component_job_details/{component_job_id}'),
+    ]
+
+
+def configure(mode, sink):
+    """Sets up the root logger for `mode`; returns the listener to stop afterwards, if any."""
+    from structured_logging import output_handler, start_logging
+
+    logging.getLogger("azureapp").setLevel(logging.NOTSET)  # load_app quietens it
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    if mode == 'off':
+        root.addHandler(output_handler(sink))
+        root.setLevel(logging.WARNING)
+        return None
+    if mode == 'sync':
+        root.addHandler(output_handler(sink))
+        root.setLevel(logging.INFO)
+        return None
+    return start_logging(queue.Queue(10000), stream=sink, level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency with synchronous and queued logging.")
+    parser.add_argument('--scale', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--sink-latency-ms', type=float, default=2.0, help="Time each write to the log stream takes.")
+    parser.add_argument('--no-save', action='store_true', help="Do not append to benchmarks/results.json.")
+    args = parser.parse_args()
+
+    db_path = database_path(args.scale)
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} not found. Run: python -m benchmarks.generate_data --scale {args.scale}")
+
+    app, db = load_app(db_path, log_level=logging.WARNING)
+    import azureapp
+    from models import ComponentJob
+
+    azureapp.LOG_LISTENER.stop()
+    atexit.unregister(azureapp.LOG_LISTENER.stop)
+    with app.app_context():
+        component_job_id = db.session.query(ComponentJob.component_job_id).order_by(ComponentJob.component_job_id).first()[0]
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = LOADTEST_USERNAME
+
+    results = {}
+    print(f"Logging at scale {args.scale}, log writes taking {args.sink_latency_ms:g}ms:")
+    print(f"  {'route':<28} {'mode':<7} {'p50':>9} {'p95':>9} {'lines':>7}")
+    for name, url in routes(component_job_id):
+        results[name] = {}
+        for mode in ('off', 'sync', 'queued'):
+            sink = SlowSink(args.sink_latency_ms / 1000)
+            listener = configure(mode, sink)
+            client.get(url)
+            stats = time_calls(lambda: client.get(url), args.repeat)
+            if listener is not None:
+                listener.stop()  # Drains the queue, so the line count below is complete
+            results[name][mode] = {"median_ms": stats["median_ms"], "p95_ms": stats["p95_ms"], "lines": sink.lines}
+            print(f"  {name:<28} {mode:<7} {stats['median_ms']:>7.2f}ms {stats['p95_ms']:>7.2f}ms {sink.lines:>7}")
+
+    if not args.no_save:
+        append_results(SUITE, args.scale, {"sink_latency_ms": args.sink_latency_ms, "routes": results})
+
+
+if __name__ == '__main__':
+    main()
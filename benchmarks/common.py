@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.json')
+
+# Row counts the suite runs at by default (number of order lines / component jobs)
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+
+def database_path(scale):
+    return os.path.join(DATA_DIR, f"bench_{scale}.db")
+
+
+def load_app(db_path, log_level=logging.WARNING):
+    """
+    Imports the Flask app pointed at a local SQLite database. Must run before anything else
+    imports azureapp, because the database URI is read at import time.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    import azureapp  # noqa: E402  (import depends on DATABASE_URL)
+
+    logging.getLogger("azureapp").setLevel(log_level)
+    logging.getLogger().setLevel(log_level)
+    return azureapp.app, azureapp.db
+
+
+def time_calls(func, repeat):
+    """Runs `func` `repeat` times and returns latency statistics in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return summarise(samples)
+
+
+def summarise(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(samples[-1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_samples) + 0.5)) - 1, 0)
+    return sorted_samples[min(rank, len(sorted_samples) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_results(suite, scale, results, path=RESULTS_FILE):
+    """Appends one run to the results file so runs can be compared over time. Returns the previous run."""
+    runs = load_results(path)
+    previous = next((run for run in reversed(runs) if run["suite"] == suite and run["scale"] == scale), None)
+    runs.append({
+        "suite": suite,
+        "scale": scale,
+        "timestamp": datetime.utcnow().isoformat(timespec='seconds'),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "results": results,
+    })
+    with open(path, 'w') as f:
+        json.dump(runs, f, indent=2)
+    return previous
+
+
+def print_comparison(results, previous, metric="median_ms"):
+    """Prints each benchmark with its change against the previous run of the same suite and scale."""
+    for name, stats in results.items():
+        line = f"  {name:<40} {stats[metric]:>10.2f} ms"
+        before = (previous or {}).get("results", {}).get(name)
+        if before and before.get(metric):
+            change = (stats[metric] - before[metric]) / before[metric] * 100
+            line += f"  ({change:+.1f}% vs {previous['git_revision'] or previous['timestamp']})"
+        print(line)
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active (context manager)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "after_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "after_cursor_execute", self._on_execute)
+        return False
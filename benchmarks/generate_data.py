@@ -0,0 +1,253 @@
+"""
+Seeded synthetic data generator.
+
+Fills a local SQLite database with realistic Customers, Jigs, Parts (varied dye / seal / etch
+recipes), Orders, OrderLines, ComponentJobs and GanttJobs. `--scale` is the number of order lines;
+every other table is sized in proportion to it.
+
+    python -m benchmarks.generate_data --scale 10000
+    python -m benchmarks.generate_data --scale 1000 --db /tmp/anodising.db --seed 7
+"""
+import os
+import json
+import random
+import logging
+import argparse
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import database_path, load_app
+
+# Login used by the load-test harness
+LOADTEST_USERNAME = 'loadtest'
+LOADTEST_PASSWORD = 'loadtest'
+
+JIG_FAMILIES = ['Spring Clip', 'Titanium Rack', 'Aluminium Wire', 'Bolt Jig', 'Panel Frame']
+
+# Recipe options mirror the dropdowns on the orders form (see process_new_part)
+ANODISING_OPTIONS = [
+    ("Anodising is required", 80),
+    ("No anodic treatment required", 8),
+    ("Strip Only (for AA10)", 6),
+    ("Strip Only (for AA25)", 6),
+]
+ETCH_OPTIONS = [0.0, 0.0, 0.0, 2.5, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 12.0, 15.0]
+SEALING_OPTIONS = ["Cold Seal 30 min", "Cold Seal 15 min", "Hot Seal", "Boiling Water Seal", "No sealing"]
+DYE_OPTIONS = [
+    ("Default", 45), ("Black", 20), ("Gold", 8), ("Premium Black", 5), ("Blue", 5), ("Turquoise", 3),
+    ("Stainless", 2), ("Green", 3), ("Bronze", 3), ("Red", 3), ("Orange", 3),
+]
+BLASTING_OPTIONS = [("No", 85), ("7 Grit", 8), ("13 Grit", 7)]
+BRIGHTENING_OPTIONS = [0.0] * 8 + [0.5, 1.0, 2.0, 3.5, 5.0]
+POLISHING_EQUIPMENT = ['Mop', 'Belt', 'Bob', 'Sisal']
+POLISHING_COMPOUNDS = ['Tripoli', 'White Rouge', 'Green Chrome', 'Blue Finishing']
+
+PART_NOUNS = ['Bracket', 'Housing', 'Bezel', 'Heatsink', 'Panel', 'Spacer', 'Lever', 'Handle',
+              'Knob', 'Cover', 'Flange', 'Clamp', 'Rail', 'Hinge', 'Cap', 'Manifold']
+PART_ADJECTIVES = ['Front', 'Rear', 'Upper', 'Lower', 'Left', 'Right', 'Main', 'Mounting', 'Side', 'Inner']
+CUSTOMER_WORDS = ['Precision', 'Engineering', 'Aero', 'Marine', 'Motorsport', 'Optics', 'Cycles',
+                  'Fabrications', 'Dynamics', 'Components', 'Technologies', 'Instruments']
+
+
+def weighted(rng, options):
+    values, weights = zip(*options)
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def make_jigs(rng, Jig):
+    jigs = []
+    for family in JIG_FAMILIES:
+        for size in range(1, 6):
+            jigs.append(Jig(
+                jig_type=f"{family} {size}",
+                gross_stock=rng.randint(5, 60),
+                maxUPJ=rng.choice([1, 2, 4, 6, 10, 20, 40]),
+                maxJPL=rng.choice([4, 6, 8, 10, 12]),
+                MPJ=rng.choice([1, 2, 3, 5]),
+            ))
+    return jigs
+
+
+def make_customers(rng, Customer, count):
+    customers = []
+    for i in range(count):
+        name = f"{rng.choice(CUSTOMER_WORDS)} {rng.choice(CUSTOMER_WORDS)} Ltd {i + 1}"
+        customers.append(Customer(customer_name=name, contact_info=f"orders{i + 1}@example.com"))
+    return customers
+
+
+def make_part(rng, Part, customer_id, jig_type, index):
+    anodising_required = weighted(rng, ANODISING_OPTIONS)
+    anodising = anodising_required == "Anodising is required"
+    strip_etch = {"Strip Only (for AA10)": 1.0, "Strip Only (for AA25)": 2.5}.get(anodising_required)
+
+    etch = rng.choice(ETCH_OPTIONS)
+    sealing = rng.choice(SEALING_OPTIONS)
+    dye = weighted(rng, DYE_OPTIONS)
+    double_and_etch = "Yes" if rng.random() < 0.05 else "No"
+    blasting = weighted(rng, BLASTING_OPTIONS)
+    brightening = rng.choice(BRIGHTENING_OPTIONS)
+
+    polishing_steps = []
+    if rng.random() < 0.1:
+        for step_number in range(1, rng.randint(1, 3) + 1):
+            polishing_steps.append({
+                "step_number": step_number,
+                "equipment": rng.choice(POLISHING_EQUIPMENT),
+                "grit": str(rng.choice([120, 240, 400, 800])),
+                "compound": rng.choice(POLISHING_COMPOUNDS),
+            })
+
+    custom = rng.random() < 0.1
+    return Part(
+        part_number=f"P{customer_id:04d}-{index:06d}",
+        part_description=f"{rng.choice(PART_ADJECTIVES)} {rng.choice(PART_NOUNS)} Rev {rng.choice('ABCDE')}",
+        customer_id=customer_id,
+        jig_type=jig_type,
+        anodising_duration=rng.choice([10, 15, 20, 25, 30, 40, 45, 60]) if anodising else None,
+        voltage=rng.choice([12.5, 14.0, 15.0, 16.0, 18.0]) if anodising else None,
+        anodising_selection_status=1 if anodising else 0,
+        voltage_selection_status=1 if anodising else 0,
+        strip_etch=strip_etch,
+        strip_etch_selection_status=1 if strip_etch else 0,
+        etch=etch,
+        etch_selection_status=1 if etch > 0 else 0,
+        sealing=sealing,
+        sealing_selection_status=1 if sealing != "No sealing" else 0,
+        dye=dye,
+        dye_selection_status=1 if dye != "Default" else 0,
+        double_and_etch=double_and_etch,
+        double_and_etch_selection_status=1 if double_and_etch == "Yes" else 0,
+        polishing=json.dumps(polishing_steps) if polishing_steps else None,
+        polishing_selection_status=1 if polishing_steps else 0,
+        blasting=blasting,
+        blasting_selection_status=1 if blasting != "No" else 0,
+        brightening=brightening,
+        brightening_selection_status=1 if brightening > 0 else 0,
+        custom_upj=rng.randint(1, 20) if custom else None,
+        custom_jpl=rng.randint(2, 12) if custom else None,
+        custom_mpj=rng.randint(1, 5) if custom else None,
+    )
+
+
+def generate(app, db, scale, seed=42, scheduled_fraction=0.05, batch_size=500):
+    """Drops and recreates the schema, then fills it. Returns the row counts per table."""
+    from werkzeug.security import generate_password_hash
+    from models import Customer, Jig, Part, Order, OrderLine, ComponentJob, User
+
+    rng = random.Random(seed)
+    today = date.today()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(db.text("PRAGMA journal_mode=WAL"))
+        db.session.execute(db.text("PRAGMA synchronous=OFF"))
+
+        db.session.add(User(username=LOADTEST_USERNAME, password_hash=generate_password_hash(LOADTEST_PASSWORD)))
+
+        jigs = make_jigs(rng, Jig)
+        db.session.add_all(jigs)
+        customers = make_customers(rng, Customer, max(5, scale // 200))
+        db.session.add_all(customers)
+        db.session.commit()
+
+        customer_ids = [c.customer_id for c in customers]
+        jig_types = [j.jig_type for j in jigs]
+
+        parts_by_customer = {customer_id: [] for customer_id in customer_ids}
+        part_count = max(20, scale // 10)
+        for index in range(part_count):
+            customer_id = customer_ids[index % len(customer_ids)]
+            part = make_part(rng, Part, customer_id, rng.choice(jig_types), index)
+            parts_by_customer[customer_id].append(part.part_number)
+            db.session.add(part)
+            if index % batch_size == 0:
+                db.session.flush()
+        db.session.commit()
+
+        # Orders with 1-7 lines each, arriving over the last two years
+        lines_created = 0
+        order_count = 0
+        while lines_created < scale:
+            customer_id = rng.choice(customer_ids)
+            arrival = today - timedelta(days=int(rng.triangular(0, 730, 0)))
+            order = Order(
+                customer_id=customer_id,
+                purchase_order_number=f"PO-{order_count + 1:07d}",
+                date_of_arrival=arrival,
+                collection_method=rng.choice(["Collection", "Delivery", "Courier"]),
+                status='In Progress' if (today - arrival).days < 14 else 'Complete',
+            )
+            db.session.add(order)
+            db.session.flush()
+
+            for _ in range(min(rng.randint(1, 7), scale - lines_created)):
+                quantity = rng.choice([1, 5, 10, 25, 50, 100, 250, 500, 1000, 2000])
+                unit_price = round(rng.uniform(0.2, 25.0), 2)
+                lot_price = round(unit_price * quantity, 2)
+                vat = round(lot_price * 0.2, 2)
+                db.session.add(OrderLine(
+                    order_id=order.order_id,
+                    part_number=rng.choice(parts_by_customer[customer_id]),
+                    quantity=quantity,
+                    unit_price=unit_price,
+                    lot_price=lot_price,
+                    vat=vat,
+                    total_price=lot_price + vat,
+                ))
+                lines_created += 1
+
+            db.session.flush()
+            ComponentJob.generate_component_jobs(order)  # Commits
+            order_count += 1
+
+        # Schedule a slice of the component jobs on the Gantt board, as planners do. Only single-load
+        # jobs: gantt_jobs.component_job_id is unique, so /gantt_job rejects multi-load jobs today.
+        component_job_ids = [
+            row[0] for row in
+            db.session.query(ComponentJob.component_job_id).filter(ComponentJob.loads_required == 1).all()
+        ]
+        scheduled = rng.sample(component_job_ids, int(len(component_job_ids) * scheduled_fraction))
+
+    client = app.test_client()
+    board_start = datetime.now().replace(hour=7, minute=0, second=0, microsecond=0) - timedelta(days=3)
+    for component_job_id in scheduled:
+        start_time = board_start + timedelta(minutes=15 * rng.randint(0, 10 * 24 * 4))
+        client.post('/gantt_job', json={
+            "component_job_id": component_job_id,
+            "start_time": start_time.strftime("%Y-%m-%dT%H:%M"),
+            "rinse_seal_route": rng.choice(["default", "even_rinse_cold_seal_b"]),
+            "anodising_tank": rng.choice(["Anodising 1A", "Anodising 1B", "Anodising 2A", "Anodising 2B"]),
+        })
+
+    return table_counts(app, db)
+
+
+def table_counts(app, db):
+    with app.app_context():
+        return {
+            table.name: db.session.execute(db.select(db.func.count()).select_from(table)).scalar()
+            for table in db.metadata.sorted_tables
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic anodising.net SQLite database.")
+    parser.add_argument('--scale', type=int, default=1000, help="Number of order lines / component jobs.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help="SQLite file to (re)create. Defaults to benchmarks/data/bench_<scale>.db")
+    parser.add_argument('--scheduled-fraction', type=float, default=0.05,
+                        help="Fraction of component jobs placed on the Gantt board.")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db or database_path(args.scale))
+    app, db = load_app(db_path, log_level=logging.WARNING)
+    counts = generate(app, db, args.scale, seed=args.seed, scheduled_fraction=args.scheduled_fraction)
+
+    print(f"Generated {db_path}")
+    for table, count in counts.items():
+        print(f"  {table:<20} {count:>8}")
+
+
+if __name__ == '__main__':
+    main()
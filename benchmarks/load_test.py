@@ -0,0 +1,260 @@
+"""
+Load-test harness that replays planner and order-clerk traffic against a running app.
+
+Planners log in, open the Gantt chart, poll /gantt_data, schedule a component job, then shift and
+delete the load. Clerks log in, open the orders form, look up parts and submit /orders with N lines.
+Concurrency is stepped up and throughput plus latency percentiles are reported per route, so you
+can see where /gantt_data starts to degrade.
+
+    python -m benchmarks.generate_data --scale 10000
+    python -m benchmarks.load_test --scale 10000 --start-server --concurrency 1,4,8,16,32
+    python -m benchmarks.load_test --scale 10000 --start-server --asgi --concurrency 1,4,8,16,32
+
+Without --start-server, point --base-url at an app already running on the same database.
+"""
+import os
+import sys
+import time
+import uuid
+import queue
+import random
+import sqlite3
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import REPO_ROOT, append_results, database_path, summarise
+from benchmarks.generate_data import LOADTEST_PASSWORD, LOADTEST_USERNAME
+
+SUITE = 'load'
+
+
+class Recorder:
+    """Thread-safe collection of (route, latency, ok) samples for one concurrency step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, session, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+        return response
+
+    def report(self, duration):
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            stats = summarise(samples)
+            stats["throughput_rps"] = round(len(samples) / duration, 2)
+            stats["errors"] = self.errors[route]
+            routes[route] = stats
+        return routes
+
+
+class Fixtures:
+    """Ids read straight from the SQLite file the server is using."""
+
+    def __init__(self, db_path):
+        connection = sqlite3.connect(db_path)
+        try:
+            self.parts_by_customer = defaultdict(list)
+            for customer_id, part_number, description in connection.execute(
+                    "SELECT customer_id, part_number, part_description FROM parts"):
+                self.parts_by_customer[customer_id].append((part_number, description))
+            self.customer_ids = list(self.parts_by_customer)
+
+            # Single-load jobs that are not on the board yet (gantt_jobs.component_job_id is unique)
+            self.schedulable = queue.Queue()
+            for (component_job_id,) in connection.execute(
+                    "SELECT c.component_job_id FROM component_jobs c "
+                    "LEFT JOIN gantt_jobs g ON g.component_job_id = c.component_job_id "
+                    "WHERE g.gantt_job_id IS NULL AND c.loads_required = 1 LIMIT 5000"):
+                self.schedulable.put(component_job_id)
+        finally:
+            connection.close()
+
+
+def login(recorder, session, base_url):
+    recorder.call(session, "POST /", "POST", f"{base_url}/",
+                  data={"username": LOADTEST_USERNAME, "password": LOADTEST_PASSWORD})
+
+
+def planner_flow(recorder, session, base_url, fixtures, rng):
+    recorder.call(session, "GET /gantt_chart", "GET", f"{base_url}/gantt_chart")
+    recorder.call(session, "GET /gantt_data", "GET", f"{base_url}/gantt_data")
+    recorder.call(session, "GET /get_component_jobs", "GET", f"{base_url}/get_component_jobs")
+
+    try:
+        component_job_id = fixtures.schedulable.get_nowait()
+    except queue.Empty:
+        return
+
+    try:
+        start_time = datetime.now() + timedelta(days=rng.randint(1, 14), minutes=15 * rng.randint(0, 40))
+        recorder.call(session, "POST /gantt_job", "POST", f"{base_url}/gantt_job", json={
+            "component_job_id": component_job_id,
+            "start_time": start_time.strftime("%Y-%m-%dT%H:%M"),
+            "rinse_seal_route": rng.choice(["default", "even_rinse_cold_seal_b"]),
+            "anodising_tank": rng.choice(["Anodising 1A", "Anodising 1B", "Anodising 2A", "Anodising 2B"]),
+        })
+        recorder.call(session, "GET /gantt_data", "GET", f"{base_url}/gantt_data")
+
+        response = recorder.call(session, "GET /api/get_gantt_jobs", "GET", f"{base_url}/api/get_gantt_jobs")
+        jobs = response.json() if response is not None and response.ok else []
+        gantt_job_ids = [job["gantt_job_id"] for job in jobs if job["component_job_id"] == component_job_id]
+
+        for gantt_job_id in gantt_job_ids:
+            recorder.call(session, "POST /api/shift_gantt_job", "POST",
+                          f"{base_url}/api/shift_gantt_job/{gantt_job_id}",
+                          json={"shift_minutes": rng.choice([-30, -15, 15, 30, 60])})
+            recorder.call(session, "DELETE /api/delete_gantt_job", "DELETE",
+                          f"{base_url}/api/delete_gantt_job/{gantt_job_id}")
+    finally:
+        fixtures.schedulable.put(component_job_id)  # Back in the pool once its loads are deleted
+
+
+def clerk_flow(recorder, session, base_url, fixtures, rng, lines_per_order):
+    recorder.call(session, "GET /orders", "GET", f"{base_url}/orders")
+
+    customer_id = rng.choice(fixtures.customer_ids)
+    recorder.call(session, "GET /get_parts", "GET", f"{base_url}/get_parts/{customer_id}")
+
+    lines = [rng.choice(fixtures.parts_by_customer[customer_id]) for _ in range(lines_per_order)]
+    for part_number, _ in lines:
+        recorder.call(session, "GET /get_part_details", "GET", f"{base_url}/get_part_details/{part_number}")
+
+    form = {
+        "customer_id": str(customer_id),
+        "purchase_order_number": f"LT-{uuid.uuid4().hex[:12]}",
+        "date_of_arrival": datetime.now().strftime("%Y-%m-%d"),
+        "collection_method": "Delivery",
+        "part_description[]": [description for _, description in lines],
+        "use_existing_part[]": [part_number for part_number, _ in lines],
+        "quantity[]": [str(rng.choice([10, 50, 100, 500])) for _ in lines],
+        "unit_price[]": [f"{rng.uniform(0.5, 20):.2f}" for _ in lines],
+        "lot_price[]": ["" for _ in lines],
+    }
+    recorder.call(session, "POST /orders", "POST", f"{base_url}/orders", data=form, allow_redirects=False)
+
+
+def run_step(base_url, fixtures, concurrency, duration, clerk_ratio, lines_per_order, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)
+        is_clerk = index < round(concurrency * clerk_ratio)
+        with requests.Session() as session:
+            login(recorder, session, base_url)
+            while time.monotonic() < deadline:
+                if is_clerk:
+                    clerk_flow(recorder, session, base_url, fixtures, rng, lines_per_order)
+                else:
+                    planner_flow(recorder, session, base_url, fixtures, rng)
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.monotonic() - started)
+
+
+def start_server(db_path, port, workers, use_asgi=False):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    # --asgi: the read endpoints on the event loop of uvicorn workers (asgi.py), the rest in Flask
+    app_args = ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application'] if use_asgi else ['azureapp:app']
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', *app_args],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(f"{base_url}/favicon.ico", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("gunicorn did not start; run it by hand to see the error.")
+
+
+def print_step(concurrency, routes, focus_route):
+    total = sum(stats["throughput_rps"] for stats in routes.values())
+    print(f"\nConcurrency {concurrency}: {total:.1f} req/s")
+    print(f"  {'route':<32} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+    for route, stats in routes.items():
+        marker = " <" if route == focus_route else ""
+        print(f"  {route:<32} {stats['throughput_rps']:>8.2f} {stats['median_ms']:>8.1f}ms "
+              f"{stats['p95_ms']:>8.1f}ms {stats['p99_ms']:>8.1f}ms {stats['errors']:>7}{marker}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay planner and order-entry traffic at increasing concurrency.")
+    parser.add_argument('--scale', type=int, default=10000, help="Dataset generated by benchmarks.generate_data.")
+    parser.add_argument('--db', help="SQLite file the server uses. Defaults to benchmarks/data/bench_<scale>.db")
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--start-server', action='store_true', help="Start gunicorn against the database.")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn workers when using --start-server.")
+    parser.add_argument('--asgi', action='store_true', help="With --start-server, serve asgi:application on uvicorn workers.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help="Comma separated concurrency steps.")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds per concurrency step.")
+    parser.add_argument('--clerk-ratio', type=float, default=0.3, help="Share of virtual users entering orders.")
+    parser.add_argument('--lines-per-order', type=int, default=5)
+    parser.add_argument('--slo-ms', type=float, default=500, help="p95 target for /gantt_data.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-save', action='store_true', help="Do not append to benchmarks/results.json.")
+    args = parser.parse_args()
+
+    db_path = os.path.abspath(args.db or database_path(args.scale))
+    if not os.path.exists(db_path):
+        raise SystemExit(f"{db_path} not found. Run: python -m benchmarks.generate_data --scale {args.scale}")
+
+    server, base_url = (start_server(db_path, args.port, args.workers, args.asgi) if args.start_server
+                        else (None, args.base_url.rstrip('/')))
+    fixtures = Fixtures(db_path)
+    focus_route = "GET /gantt_data"
+
+    results = {}
+    degraded_at = None
+    try:
+        for concurrency in [int(step) for step in args.concurrency.split(',')]:
+            routes = run_step(base_url, fixtures, concurrency, args.duration, args.clerk_ratio,
+                              args.lines_per_order, args.seed)
+            results[str(concurrency)] = routes
+            print_step(concurrency, routes, focus_route)
+            if degraded_at is None and routes.get(focus_route, {}).get("p95_ms", 0) > args.slo_ms:
+                degraded_at = concurrency
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    if degraded_at is None:
+        print(f"\n{focus_route} p95 stayed under {args.slo_ms:.0f} ms at every step.")
+    else:
+        print(f"\n{focus_route} p95 exceeded {args.slo_ms:.0f} ms at concurrency {degraded_at}.")
+
+    if not args.no_save:
+        append_results(SUITE, args.scale, {"base_url": base_url, "workers": args.workers, "asgi": args.asgi,
+                                           "degraded_at": degraded_at, "steps": results})
+
+
+if __name__ == '__main__':
+    main()
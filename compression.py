@@ -0,0 +1,107 @@
+import os
+import gzip
+import zlib
+from flask import request
+from models import logger
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+# gzip 1-9, brotli 0-11. Mid-range levels keep the CPU cost per request low on the sync workers.
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+
+def available_encodings():
+    """Encodings this worker can produce, in order of preference when the client rates them equally."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate_encoding(accept_encodings):
+    """Picks the content-coding to use from the request's Accept-Encoding, or None for identity."""
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept_encodings[encoding]  # Honours q-values, '*' and q=0 refusals
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compresses a streamed body chunk by chunk. Each chunk is flushed so the client keeps receiving
+    data as it is produced, instead of waiting for the whole response.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def compress_response(response):
+    """
+    after_request hook: compresses HTML/JSON/text bodies with the best encoding the client accepts.
+    Buffered bodies under COMPRESS_MIN_BYTES are left alone; streamed bodies are compressed as they stream.
+    """
+    response.vary.add('Accept-Encoding')
+
+    if (
+        request.method == 'HEAD'
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or response.direct_passthrough  # send_file: images, downloads
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream((chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+                                             for chunk in response.response), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        try:
+            response.set_data(compress_bytes(data, encoding))
+        except Exception as e:  # Never fail a request because compression did
+            logger.error(f"Failed to {encoding}-compress response: {e}")
+            return response
+
+    response.headers['Content-Encoding'] = encoding
+
+    # The compressed body is a different representation: a strong ETag must not claim byte equality
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
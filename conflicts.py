@@ -0,0 +1,135 @@
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from models import db, GanttJob, GanttJobArchive
+
+# Steps done in a tank that holds one load at a time, as the prefix of their <step>_start / <step>_end
+# columns. Jigging, loading, unloading, drying, unjigging and packing are benches, not tanks.
+TANK_STEPS = [
+    'brightening', 'degrease', 'etch', 'desmut',
+    'anodising_1a', 'anodising_1b', 'anodising_2a', 'anodising_2b',
+    'off_line_rinse', 'water_rinse_1', 'water_rinse_2', 'water_rinse_3', 'water_rinse_4',
+    'water_rinse_5', 'water_rinse_6', 'water_rinse_7', 'water_rinse_8',
+    'gold_dye', 'black_dye', 'dye_offline',
+    'sealing', 'cold_seal_a', 'cold_seal_b', 'boiling_water_seal', 'hot_seal',
+]
+
+# Longest window (in days) checked at once, live and archived loads together
+CONFLICT_MAX_DAYS = int(os.getenv('CONFLICT_MAX_DAYS', 92))
+
+
+def parse_conflict_window(start, end):
+    """
+    (start, end) datetimes from optional YYYY-MM-DD strings, `end` inclusive and defaulting to
+    `start`; (None, None) if neither is given, meaning the live board. Raises ValueError.
+    """
+    if not start and not end:
+        return None, None
+    try:
+        first = datetime.strptime(start or end, '%Y-%m-%d')
+        last = datetime.strptime(end, '%Y-%m-%d') if end else first
+    except ValueError:
+        raise ValueError("Dates must be given as YYYY-MM-DD")
+    if last < first:
+        raise ValueError("The end date is before the start date")
+    if (last - first).days >= CONFLICT_MAX_DAYS:
+        raise ValueError(f"Check at most {CONFLICT_MAX_DAYS} days at once")
+    return first, last + timedelta(days=1)
+
+
+def scheduled_loads(start=None, end=None):
+    """
+    The tank steps of every load on the live board or, given a window, of the live and archived
+    loads on the line during [start, end). Live rows win if a load is in both.
+    """
+    loads = {}
+    tables = (GanttJob.__table__,) if start is None else (GanttJobArchive.__table__, GanttJob.__table__)
+    for table in tables:
+        columns = [table.c.gantt_job_id, table.c.component_job_id, table.c.load_number, table.c.customer_id] + [
+            table.c[f'{step}_{edge}'] for step in TANK_STEPS for edge in ('start', 'end')
+        ]
+        query = db.select(*columns)
+        if start is not None:
+            query = query.where(table.c.jigging_start < end, table.c.packing_end > start)
+        for row in db.session.execute(query.execution_options(yield_per=2000)).mappings():
+            loads[row['gantt_job_id']] = row
+    return list(loads.values())
+
+
+def tank_intervals(loads):
+    """{tank: [(start, end, gantt_job_id), ...]} for every tank step the loads are scheduled on."""
+    tanks = defaultdict(list)
+    for load in loads:
+        for step in TANK_STEPS:
+            start, end = load[f'{step}_start'], load[f'{step}_end']
+            if start is not None and end is not None and start < end:
+                tanks[step].append((start, end, load['gantt_job_id']))
+    return tanks
+
+
+def overlaps(intervals):
+    """
+    Sweeps one tank's (start, end, load) intervals and yields every stretch of time during which
+    more than one load is in it, as (start, end, loads, peak): the loads in the tank at any point of
+    the stretch and the most at once. A load leaving as the next arrives is not an overlap.
+    Sorting the 2n start and end events dominates: O(n log n).
+    """
+    events = sorted(
+        [(start, 1, load) for start, _, load in intervals] + [(end, 0, load) for _, end, load in intervals]
+    )  # At the same instant, loads leave (0) before others arrive (1)
+    in_tank = {}  # Loads in the tank now, in arrival order
+    stretch = None  # [start, loads, peak] of the overlap being swept
+    for at, arriving, load in events:
+        if arriving:
+            in_tank[load] = None
+            if stretch is not None:
+                stretch[1][load] = None
+                stretch[2] = max(stretch[2], len(in_tank))
+            elif len(in_tank) > 1:
+                stretch = [at, dict(in_tank), len(in_tank)]
+        else:
+            del in_tank[load]
+            if stretch is not None and len(in_tank) < 2:
+                yield stretch[0], at, list(stretch[1]), stretch[2]
+                stretch = None
+
+
+def find_conflicts(start=None, end=None):
+    """
+    Every overlap of two or more loads in one tank, on the live board or, given a window, among
+    the live and archived loads on the line during it. Returns {"window", "loads_checked",
+    "intervals_checked", "conflicts", "duration_seconds"}, conflicts ordered by start time.
+    """
+    started = time.perf_counter()
+    loads = scheduled_loads(start, end)
+    by_id = {load['gantt_job_id']: load for load in loads}
+    tanks = tank_intervals(loads)
+
+    conflicts = []
+    for tank, intervals in tanks.items():
+        for overlap_start, overlap_end, load_ids, peak in overlaps(intervals):
+            conflicts.append({
+                "tank": tank,
+                "start": overlap_start.isoformat(),
+                "end": overlap_end.isoformat(),
+                "peak_loads": peak,
+                "loads": [
+                    {
+                        "gantt_job_id": load_id,
+                        "component_job_id": by_id[load_id]['component_job_id'],
+                        "load_number": by_id[load_id]['load_number'],
+                        "customer_id": by_id[load_id]['customer_id'],
+                    }
+                    for load_id in load_ids
+                ],
+            })
+    conflicts.sort(key=lambda conflict: (conflict["start"], conflict["tank"]))
+
+    return {
+        "window": {"start": start.isoformat(), "end": end.isoformat()} if start is not None else None,
+        "loads_checked": len(loads),
+        "intervals_checked": sum(len(intervals) for intervals in tanks.values()),
+        "conflicts": conflicts,
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+# Shared directory where each worker's prometheus_client samples are written (must be set before import)
+prometheus_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "anodising_metrics")
+)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def on_starting(server):
+    """Start every deployment with an empty metrics directory."""
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Drop the in-flight gauge samples of workers that have exited."""
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,109 @@
+import os
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from models import db, logger, IdempotencyKey
+
+# How long a key's response is replayed; a retry after that runs the request again
+IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv('IDEMPOTENCY_WINDOW_SECONDS', 24 * 3600))
+
+# A key still marked running after this long belongs to a worker that died (gunicorn kills
+# requests long before), so the next retry takes it over and runs the request
+IDEMPOTENCY_PENDING_SECONDS = float(os.getenv('IDEMPOTENCY_PENDING_SECONDS', 120))
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_FORM_FIELD = 'idempotency_key'  # HTML forms cannot set headers
+MAX_KEY_LENGTH = 128
+
+RUN, REPLAY, PENDING, MISMATCH = 'run', 'replay', 'pending', 'mismatch'
+
+
+def request_key(request):
+    """The key the client sent (header, or hidden form field), or None."""
+    key = request.headers.get(IDEMPOTENCY_HEADER) or request.form.get(IDEMPOTENCY_FORM_FIELD)
+    key = (key or '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")
+    return key or None
+
+
+def request_fingerprint(request):
+    """A hash of what was sent, so a key reused for a different request is refused rather than replayed."""
+    digest = hashlib.sha256(request.path.encode())
+    if request.is_json:
+        digest.update(request.get_data())
+    else:
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"\0{name}={value}".encode())
+        for name, upload in sorted(request.files.items(multi=True)):
+            digest.update(f"\0{name}:{upload.filename}:{upload.content_length}".encode())
+    return digest.hexdigest()
+
+
+def begin(scope, key, fingerprint):
+    """
+    Registers the key as running, unless it is already known. Returns (RUN, None) if the caller
+    should run the request, (REPLAY, row) if it has finished, (PENDING, row) if it is still
+    running elsewhere, or (MISMATCH, row) if the key was used for a different request.
+
+    Uses its own short transactions, independent of the request's session, so the marker is
+    visible to a concurrent retry before the request does any work.
+    """
+    table = IdempotencyKey.__table__
+    where = (table.c.scope == scope) & (table.c.key == key)
+    now = datetime.utcnow()
+
+    with db.engine.begin() as connection:
+        row = connection.execute(db.select(table).where(where)).first()
+        if row is not None and row.created_at < now - timedelta(seconds=IDEMPOTENCY_WINDOW_SECONDS):
+            connection.execute(table.delete().where(where, table.c.created_at == row.created_at))
+            row = None
+
+    if row is None:
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.insert().values(scope=scope, key=key, fingerprint=fingerprint, created_at=now))
+            return RUN, None
+        except IntegrityError:
+            # A retry raced us to it; report on the request that won
+            with db.engine.connect() as connection:
+                row = connection.execute(db.select(table).where(where)).first()
+            if row is None:
+                return begin(scope, key, fingerprint)
+
+    if row.fingerprint != fingerprint:
+        return MISMATCH, row
+    if row.status_code is not None:
+        return REPLAY, row
+    if row.created_at < now - timedelta(seconds=IDEMPOTENCY_PENDING_SECONDS):
+        with db.engine.begin() as connection:
+            taken = connection.execute(
+                table.update().where(where, table.c.status_code.is_(None), table.c.created_at == row.created_at)
+                .values(created_at=now)
+            ).rowcount
+        if taken:
+            logger.warning(f"Taking over abandoned idempotency key {key} for {scope}")
+            return RUN, None
+    return PENDING, row
+
+
+def complete(scope, key, response, flashes):
+    """Stores the finished request's response (and the messages it flashed) for retries to replay."""
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        connection.execute(
+            table.update().where(table.c.scope == scope, table.c.key == key).values(
+                status_code=response.status_code,
+                content_type=response.headers.get('Content-Type'),
+                location=response.headers.get('Location'),
+                body=response.get_data(),
+                flashes=[list(flash) for flash in flashes],
+            )
+        )
+
+
+def release(scope, key):
+    """Forgets the key, so a retry runs the request again (used when it failed)."""
+    table = IdempotencyKey.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.delete().where(table.c.scope == scope, table.c.key == key))
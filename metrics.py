@@ -0,0 +1,86 @@
+import os
+import time
+from flask import g, request
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+
+# When running under gunicorn, gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR so that every worker
+# writes its samples to a shared directory and /metrics aggregates across all workers.
+MULTIPROCESS_MODE = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+# Buckets tuned for a Flask app talking to Azure SQL: sub-10ms up to slow 30s requests
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by endpoint and method',
+    ['endpoint', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Requests by endpoint, method and status code',
+    ['endpoint', 'method', 'status'],
+)
+REQUEST_ERRORS = Counter(
+    'http_request_errors_total',
+    'Requests that ended with a 5xx status, by endpoint and method',
+    ['endpoint', 'method'],
+)
+SHARED_CACHE_REQUESTS = Counter(
+    'shared_cache_requests_total',
+    'Shared reference-data cache lookups by cache and result (hit, miss, error)',
+    ['cache', 'result'],
+)
+LOG_RECORDS_DROPPED = Counter(
+    'log_records_dropped_total',
+    'Log records not written, by reason (rate_limited, queue_full)',
+    ['reason'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'Requests currently being handled, by endpoint',
+    ['endpoint'],
+    multiprocess_mode='livesum',
+)
+
+
+def _endpoint_label():
+    # Use the Flask endpoint name rather than the raw path to keep label cardinality bounded
+    return request.endpoint or 'unmatched'
+
+
+def start_request_metrics():
+    """Marks the start of a request and bumps the in-flight gauge."""
+    g.metrics_start = time.perf_counter()
+    g.metrics_endpoint = _endpoint_label()
+    REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+
+def finish_request_metrics(status_code):
+    """Records latency, count and errors for the request. Safe to call more than once."""
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+
+    endpoint = g.pop('metrics_endpoint', _endpoint_label())
+    observe_request(endpoint, request.method, status_code, time.perf_counter() - start)
+    REQUESTS_IN_FLIGHT.labels(endpoint).dec()
+
+
+def observe_request(endpoint, method, status_code, seconds):
+    """Latency, count and errors for one request, outside Flask too (the async read tier in asgi.py)."""
+    REQUEST_LATENCY.labels(endpoint, method).observe(seconds)
+    REQUEST_COUNT.labels(endpoint, method, str(status_code)).inc()
+    if status_code >= 500:
+        REQUEST_ERRORS.labels(endpoint, method).inc()
+
+
+def render_metrics():
+    """Returns (body, content type) in the Prometheus text format, aggregated across workers if possible."""
+    if MULTIPROCESS_MODE:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
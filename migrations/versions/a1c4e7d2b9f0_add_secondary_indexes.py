@@ -0,0 +1,42 @@
+"""Add secondary indexes on hot filter and join columns
+
+Revision ID: a1c4e7d2b9f0
+Revises:
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e7d2b9f0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns). Composite indexes lead with the equality column and also cover
+# the column the query needs next, so the lookup is answered from the index alone:
+#   - get_parts / manage_parts filter parts by customer_id and read part_number
+#   - component_jobs filters orders by customer_id and sorts by date_of_arrival
+#   - component_jobs filters parts by jig_type then dye
+INDEXES = [
+    ('ix_parts_customer_id_part_number', 'parts', ['customer_id', 'part_number']),
+    ('ix_parts_jig_type_dye', 'parts', ['jig_type', 'dye']),
+    ('ix_orders_purchase_order_number', 'orders', ['purchase_order_number']),
+    ('ix_orders_customer_id_date_of_arrival', 'orders', ['customer_id', 'date_of_arrival']),
+    ('ix_orderline_order_id', 'OrderLine', ['order_id']),
+    ('ix_orderline_part_number', 'OrderLine', ['part_number']),
+    ('ix_component_jobs_part_id', 'component_jobs', ['part_id']),
+    ('ix_component_jobs_order_line_id', 'component_jobs', ['order_line_id']),
+    ('ix_gantt_jobs_jigging_start', 'gantt_jobs', ['jigging_start']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,58 @@
+"""Add production rollup tables and packing_end indexes
+
+Revision ID: a8e2c5f1d7b4
+Revises: f3b8d1e6a2c7
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e2c5f1d7b4'
+down_revision = 'f3b8d1e6a2c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_gantt_jobs_packing_end', 'gantt_jobs', ['packing_end'], unique=False)
+    op.create_index('ix_gantt_jobs_archive_packing_end', 'gantt_jobs_archive', ['packing_end'], unique=False)
+
+    op.create_table(
+        'daily_tank_rollups',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('tank', sa.String(length=32), nullable=False),
+        sa.Column('loads', sa.Integer(), nullable=False),
+        sa.Column('busy_minutes', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'tank'),
+    )
+
+    op.create_table(
+        'weekly_lead_time_rollups',
+        sa.Column('customer_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('loads', sa.Integer(), nullable=False),
+        sa.Column('total_lead_minutes', sa.Float(), nullable=False),
+        sa.Column('max_lead_minutes', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('customer_id', 'week_start'),
+    )
+    op.create_index('ix_weekly_lead_time_rollups_week_start', 'weekly_lead_time_rollups', ['week_start'], unique=False)
+
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('finished_through', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_index('ix_weekly_lead_time_rollups_week_start', table_name='weekly_lead_time_rollups')
+    op.drop_table('weekly_lead_time_rollups')
+    op.drop_table('daily_tank_rollups')
+    op.drop_index('ix_gantt_jobs_archive_packing_end', table_name='gantt_jobs_archive')
+    op.drop_index('ix_gantt_jobs_packing_end', table_name='gantt_jobs')
@@ -0,0 +1,32 @@
+"""Add rollup_stale_days
+
+Revision ID: b2e6d9c4a7f3
+Revises: e7b2c6d1f9a8
+Create Date: 2026-10-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e6d9c4a7f3'
+down_revision = 'e7b2c6d1f9a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'rollup_stale_days',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # The watermark was kept in UTC rather than the Gantt chart's local time; dropping it makes the
+    # next refresh-rollups rebuild the rollups from scratch
+    op.execute(sa.table('rollup_watermarks', sa.column('name')).delete())
+
+
+def downgrade():
+    op.drop_table('rollup_stale_days')
@@ -0,0 +1,163 @@
+"""Store component job operations packed instead of as JSON
+
+Revision ID: b4d7f2a9e6c1
+Revises: a8e2c5f1d7b4
+Create Date: 2026-10-20 10:00:00.000000
+
+The operations and load_independent_operations JSON columns are dropped once their contents are
+packed into operation_codes and load_independent_operation_codes. Downgrade rebuilds the JSON
+from the packed form: names, durations and details come back as they were, while descriptions
+and per-load initials are regenerated in the shape generate_component_jobs writes them.
+
+The codec below is a copy of models.encode_operations / decode_operations as of this revision, so
+that later changes to the models cannot change what this migration reads or writes.
+"""
+import json
+from urllib.parse import quote, unquote
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d7f2a9e6c1'
+down_revision = 'a8e2c5f1d7b4'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+OPERATION_NAMES = (
+    "Jigging", "Strip Etch", "Loading", "Degrease", "Water Rinse (1 or 2)", "Caustic Etch", "Flash Anodise",
+    "Water Rinse (3 or 4)", "Water Rinse (2 or 1)", "Desmut", "Anodising", "Water Rinse (5 or 6)",
+    "Unloading", "Off-line rinse", "Hot Seal", "Water Rinse (7)", "Water Rinse (8)", "Cold Seal 30 min",
+    "Cold Seal 15 min", "Boiling Water Seal", "No sealing", "Drying", "Unjigging", "Packing",
+    "Gold", "Black", "Premium black", "Blue", "Turquoise", "Stainless", "Green", "Bronze", "Red", "Orange",
+)
+OPERATION_CODES = {name: str(code) for code, name in enumerate(OPERATION_NAMES)}
+FREE_TEXT_SAFE = " ()-,.:;&/'+#"
+
+
+def load_json(value):
+    # Some rows hold the JSON twice encoded (a JSON string of the list)
+    while isinstance(value, str):
+        value = json.loads(value) if value else None
+    return value or []
+
+
+def operation_from_dict(data):
+    """(name, duration, detail) of an operation in the JSON form (per-load or load-independent)."""
+    name = data["operation"]
+    detail = data.get("notes")
+    if detail is None:
+        description, prefix = data.get("description") or "", f"{name.lower()} ("
+        if description.startswith(prefix) and description.endswith(")"):
+            detail = description[len(prefix):-1]
+    return name, data.get("duration"), detail
+
+
+def pack_duration(duration):
+    try:
+        value = float(duration)
+    except (TypeError, ValueError):
+        return ""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def unpack_duration(text):
+    if not text:
+        return None
+    return float(text) if any(c in text for c in ".eE") else int(text)
+
+
+def encode_operations(operations):
+    entries = []
+    for name, duration, detail in (operation_from_dict(data) for data in operations):
+        step = OPERATION_CODES.get(name) or "=" + quote(name, safe=FREE_TEXT_SAFE)
+        entry = f"{step}*{pack_duration(duration)}"
+        if detail is not None:
+            entry += "*" + quote(str(detail), safe=FREE_TEXT_SAFE)
+        entries.append(entry)
+    return "|".join(entries) or None
+
+
+def decode_operations(packed):
+    operations = []
+    for entry in packed.split("|") if packed else ():
+        step, duration, *detail = entry.split("*")
+        name = unquote(step[1:]) if step.startswith("=") else OPERATION_NAMES[int(step)]
+        operations.append((name, unpack_duration(duration), unquote(detail[0]) if detail else None))
+    return operations
+
+
+def per_load_dict(operation, loads_required):
+    name, duration, detail = operation
+    return {
+        "operation": name,
+        "duration": duration,
+        "description": name.lower() + (f" ({detail})" if detail else ""),
+        "initials": [f"Load {i + 1}" for i in range(loads_required or 0)],
+    }
+
+
+def load_independent_dict(operation):
+    name, duration, detail = operation
+    return {"operation": name, "duration": duration, "notes": detail}
+
+
+def convert(columns, update_sql, transform):
+    """Rewrites component_jobs BATCH_SIZE rows at a time, paging the read by component_job_id."""
+    connection = op.get_bind()
+    component_jobs = sa.table('component_jobs', *[sa.column(name) for name in ['component_job_id'] + columns])
+    last_id = None
+    while True:
+        query = sa.select(*component_jobs.c).order_by(component_jobs.c.component_job_id).limit(BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(component_jobs.c.component_job_id > last_id)
+        rows = connection.execute(query).fetchall()
+        if not rows:
+            break
+        connection.execute(sa.text(update_sql), [transform(row) for row in rows])
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    with op.batch_alter_table('component_jobs') as batch_op:
+        batch_op.add_column(sa.Column('operation_codes', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('load_independent_operation_codes', sa.Text(), nullable=True))
+
+    convert(
+        ['operations', 'load_independent_operations'],
+        "UPDATE component_jobs SET operation_codes = :operations, "
+        "load_independent_operation_codes = :load_independent WHERE component_job_id = :id",
+        lambda row: {
+            "id": row[0],
+            "operations": encode_operations(load_json(row[1])),
+            "load_independent": encode_operations(load_json(row[2])),
+        },
+    )
+
+    with op.batch_alter_table('component_jobs') as batch_op:
+        batch_op.drop_column('operations')
+        batch_op.drop_column('load_independent_operations')
+
+
+def downgrade():
+    with op.batch_alter_table('component_jobs') as batch_op:
+        batch_op.add_column(sa.Column('operations', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('load_independent_operations', sa.JSON(), nullable=True))
+
+    convert(
+        ['loads_required', 'operation_codes', 'load_independent_operation_codes'],
+        "UPDATE component_jobs SET operations = :operations, "
+        "load_independent_operations = :load_independent WHERE component_job_id = :id",
+        lambda row: {
+            "id": row[0],
+            "operations": json.dumps([per_load_dict(operation, row[1]) for operation in decode_operations(row[2])]),
+            "load_independent": json.dumps([load_independent_dict(operation) for operation in decode_operations(row[3])]),
+        },
+    )
+
+    with op.batch_alter_table('component_jobs') as batch_op:
+        batch_op.drop_column('operation_codes')
+        batch_op.drop_column('load_independent_operation_codes')
@@ -0,0 +1,69 @@
+"""Add part_search_grams trigram index for part number / description search
+
+Revision ID: b7d3f1a9c2e4
+Revises: a1c4e7d2b9f0
+Create Date: 2026-10-19 19:00:00.000000
+
+The trigram function is a copy of models.padded_trigrams as of this revision, so that later
+changes to the models cannot change what this migration writes.
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f1a9c2e4'
+down_revision = 'a1c4e7d2b9f0'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+SEARCH_WORD = re.compile(r"[^\W_]+")
+
+
+def padded_trigrams(text):
+    """Trigrams of each lower-cased word, padded pg_trgm style with two leading spaces and one trailing."""
+    grams = set()
+    for word in SEARCH_WORD.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def upgrade():
+    op.create_table(
+        'part_search_grams',
+        sa.Column('gram', sa.String(length=3), nullable=False),
+        sa.Column('part_number', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('gram', 'part_number'),
+    )
+    op.create_index('ix_part_search_grams_part_number', 'part_search_grams', ['part_number'], unique=False)
+
+    # Backfill from the existing parts, BATCH_SIZE at a time; from here on the Part mapper events keep it in step
+    connection = op.get_bind()
+    parts = sa.table('parts', sa.column('part_number'), sa.column('part_description'))
+    grams = sa.table('part_search_grams', sa.column('gram'), sa.column('part_number'))
+    last_part_number = None
+    while True:
+        query = sa.select(parts.c.part_number, parts.c.part_description).order_by(parts.c.part_number).limit(BATCH_SIZE)
+        if last_part_number is not None:
+            query = query.where(parts.c.part_number > last_part_number)
+        batch = connection.execute(query).fetchall()
+        if not batch:
+            break
+        rows = [
+            {"gram": gram, "part_number": part_number}
+            for part_number, part_description in batch
+            for gram in padded_trigrams(part_number) | padded_trigrams(part_description)
+        ]
+        if rows:
+            connection.execute(grams.insert(), rows)
+        last_part_number = batch[-1][0]
+
+
+def downgrade():
+    op.drop_index('ix_part_search_grams_part_number', table_name='part_search_grams')
+    op.drop_table('part_search_grams')
@@ -0,0 +1,32 @@
+"""Add table_revisions counters for cache invalidation
+
+Revision ID: c5e8a2d4f6b1
+Revises: b7d3f1a9c2e4
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a2d4f6b1'
+down_revision = 'b7d3f1a9c2e4'
+branch_labels = None
+depends_on = None
+
+TABLES = ['parts']
+
+
+def upgrade():
+    revisions = op.create_table(
+        'table_revisions',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('revision', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+    op.bulk_insert(revisions, [{"table_name": name, "revision": 0} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('table_revisions')
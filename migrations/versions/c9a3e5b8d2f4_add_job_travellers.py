@@ -0,0 +1,37 @@
+"""Add parts.revision and the job_travellers cache
+
+Revision ID: c9a3e5b8d2f4
+Revises: b4d7f2a9e6c1
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a3e5b8d2f4'
+down_revision = 'b4d7f2a9e6c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parts') as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'job_travellers',
+        sa.Column('component_job_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('part_revision', sa.Integer(), nullable=False),
+        sa.Column('html', sa.Text(), nullable=False),
+        sa.Column('pdf', sa.LargeBinary(), nullable=True),
+        sa.Column('rendered_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('component_job_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('job_travellers')
+    with op.batch_alter_table('parts') as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,32 @@
+"""Track more tables in table_revisions and record when each last changed
+
+Revision ID: d2f9b4c7e1a3
+Revises: c5e8a2d4f6b1
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f9b4c7e1a3'
+down_revision = 'c5e8a2d4f6b1'
+branch_labels = None
+depends_on = None
+
+NEW_TABLES = ['jigs_inventory', 'customers', 'orders', 'OrderLine', 'component_jobs', 'gantt_jobs']
+
+
+def upgrade():
+    with op.batch_alter_table('table_revisions') as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    revisions = sa.table('table_revisions', sa.column('table_name', sa.String), sa.column('revision', sa.Integer))
+    op.bulk_insert(revisions, [{"table_name": name, "revision": 0} for name in NEW_TABLES])
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM table_revisions WHERE table_name <> 'parts'"))
+    with op.batch_alter_table('table_revisions') as batch_op:
+        batch_op.drop_column('updated_at')
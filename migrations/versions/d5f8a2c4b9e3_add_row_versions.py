@@ -0,0 +1,30 @@
+"""Add row_version to gantt_jobs, gantt_jobs_archive and component_jobs
+
+Revision ID: d5f8a2c4b9e3
+Revises: c9a3e5b8d2f4
+Create Date: 2026-10-21 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f8a2c4b9e3'
+down_revision = 'c9a3e5b8d2f4'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('gantt_jobs', 'gantt_jobs_archive', 'component_jobs')
+
+
+def upgrade():
+    for table_name in VERSIONED_TABLES:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('row_version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table_name in reversed(VERSIONED_TABLES):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('row_version')
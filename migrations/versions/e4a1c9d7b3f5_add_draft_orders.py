@@ -0,0 +1,48 @@
+"""Add server-side draft order tables
+
+Revision ID: e4a1c9d7b3f5
+Revises: d2f9b4c7e1a3
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1c9d7b3f5'
+down_revision = 'd2f9b4c7e1a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'draft_orders',
+        sa.Column('draft_id', sa.String(length=32), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('customer_and_order_details', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('draft_id'),
+    )
+    op.create_index('ix_draft_orders_user_id_updated_at', 'draft_orders', ['user_id', 'updated_at'], unique=False)
+
+    op.create_table(
+        'draft_order_lines',
+        sa.Column('draft_line_id', sa.Integer(), nullable=False),
+        sa.Column('draft_id', sa.String(length=32), nullable=False),
+        sa.Column('line', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['draft_id'], ['draft_orders.draft_id']),
+        sa.PrimaryKeyConstraint('draft_line_id'),
+    )
+    op.create_index('ix_draft_order_lines_draft_id', 'draft_order_lines', ['draft_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_draft_order_lines_draft_id', table_name='draft_order_lines')
+    op.drop_table('draft_order_lines')
+    op.drop_index('ix_draft_orders_user_id_updated_at', table_name='draft_orders')
+    op.drop_table('draft_orders')
@@ -0,0 +1,38 @@
+"""Add idempotency_keys
+
+Revision ID: e7b2c6d1f9a8
+Revises: d5f8a2c4b9e3
+Create Date: 2026-10-21 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c6d1f9a8'
+down_revision = 'd5f8a2c4b9e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('scope', sa.String(length=128), nullable=False),
+        sa.Column('key', sa.String(length=128), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('location', sa.String(length=2048), nullable=True),
+        sa.Column('body', sa.LargeBinary(), nullable=True),
+        sa.Column('flashes', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'key'),
+    )
+    op.create_index('ix_idempotency_keys_created_at', 'idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_created_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,47 @@
+"""Add gantt_jobs_archive for loads moved off the live board
+
+Revision ID: f3b8d1e6a2c7
+Revises: e4a1c9d7b3f5
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1e6a2c7'
+down_revision = 'e4a1c9d7b3f5'
+branch_labels = None
+depends_on = None
+
+# Same steps, in the same order, as the gantt_jobs columns
+STEPS = [
+    'polishing', 'blasting', 'brightening', 'off_line_rinse', 'jigging', 'loading', 'degrease',
+    'water_rinse_1', 'water_rinse_2', 'etch', 'water_rinse_3', 'water_rinse_4', 'desmut',
+    'water_rinse_5', 'water_rinse_6', 'anodising_1a', 'anodising_1b', 'anodising_2a', 'anodising_2b',
+    'water_rinse_7', 'water_rinse_8', 'gold_dye', 'black_dye', 'sealing', 'cold_seal_a', 'cold_seal_b',
+    'boiling_water_seal', 'unloading', 'dye_offline', 'hot_seal', 'drying', 'unjigging', 'packing',
+]
+
+
+def upgrade():
+    op.create_table(
+        'gantt_jobs_archive',
+        sa.Column('gantt_job_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('component_job_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('load_number', sa.Integer(), nullable=False),
+        *[sa.Column(f'{step}_{edge}', sa.DateTime(), nullable=True) for step in STEPS for edge in ('start', 'end')],
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('gantt_job_id'),
+    )
+    op.create_index('ix_gantt_jobs_archive_jigging_start', 'gantt_jobs_archive', ['jigging_start'], unique=False)
+    op.create_index('ix_gantt_jobs_archive_customer_id', 'gantt_jobs_archive', ['customer_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_gantt_jobs_archive_customer_id', table_name='gantt_jobs_archive')
+    op.drop_index('ix_gantt_jobs_archive_jigging_start', table_name='gantt_jobs_archive')
+    op.drop_table('gantt_jobs_archive')
@@ -1,16 +1,19 @@
 import os
+import re
 import json
+import time
 import requests
 import logging
 from collections import defaultdict
 import math
 from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
 from azure.storage.blob import BlobServiceClient
 from azure.core.exceptions import AzureError
 from tenacity import retry, stop_after_attempt, wait_exponential
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import CheckConstraint, DECIMAL, Column, Integer, Float, JSON, ForeignKey, String, func
-from sqlalchemy.orm import relationship, aliased, validates
+from sqlalchemy import CheckConstraint, DECIMAL, Column, Integer, Float, JSON, ForeignKey, String, func, event, or_, inspect
+from sqlalchemy.orm import relationship, aliased, validates, Session
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -103,6 +106,7 @@ class Part(db.Model):
     custom_jpl = db.Column(db.Integer, nullable=True)
     custom_mpj = db.Column(db.Integer, nullable=True)
     image = db.Column(db.String(1024), nullable=True)
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped on every edit
 
     order_lines = db.relationship('OrderLine', backref='part', lazy=True)
     customer = db.relationship('Customer', back_populates='parts')
@@ -122,9 +126,323 @@ class Part(db.Model):
         CheckConstraint("polishing_selection_status IN (1, 0)", name='check_polishing_selection_status'),
         CheckConstraint("blasting_selection_status IN (1, 0)", name='check_blasting_selection_status'),
         CheckConstraint("brightening_selection_status IN (1, 0)", name='check_brightening_selection_status'),
-        CheckConstraint("double_and_etch_selection_status IN (1, 0)", name='check_double_and_etch_selection_status')
+        CheckConstraint("double_and_etch_selection_status IN (1, 0)", name='check_double_and_etch_selection_status'),
+        # Secondary indexes (see migrations/versions/a1c4e7d2b9f0_add_secondary_indexes.py)
+        db.Index('ix_parts_customer_id_part_number', 'customer_id', 'part_number'),
+        db.Index('ix_parts_jig_type_dye', 'jig_type', 'dye'),
     )
 
+    @staticmethod
+    def purge(part_number):
+        """
+        Deletes a part and everything that references it, children first, in one transaction: its
+        Gantt jobs, component jobs and order lines, then the part itself. Each is one set-based
+        DELETE, so parts with thousands of historic lines cost four statements. Archived Gantt jobs
+        are kept. Returns the number of rows deleted per table.
+        """
+        order_lines = db.select(OrderLine.OrderLine_id).where(OrderLine.part_number == part_number)
+        component_job_filter = or_(ComponentJob.part_id == part_number, ComponentJob.order_line_id.in_(order_lines))
+        component_jobs = db.select(ComponentJob.component_job_id).where(component_job_filter)
+
+        statements = [
+            ('job_travellers', db.delete(JobTraveller).where(JobTraveller.component_job_id.in_(component_jobs))),
+            ('gantt_jobs', db.delete(GanttJob).where(GanttJob.component_job_id.in_(component_jobs))),
+            ('component_jobs', db.delete(ComponentJob).where(component_job_filter)),
+            ('OrderLine', db.delete(OrderLine).where(OrderLine.part_number == part_number)),
+            ('parts', db.delete(Part).where(Part.part_number == part_number)),
+        ]
+        try:
+            # Bulk deletes skip the flush hooks, so the days their loads were on go stale here
+            stale_days = set()
+            for row in db.session.execute(
+                db.select(*[GanttJob.__table__.c[name] for name in ROLLUP_COLUMNS])
+                .where(GanttJob.component_job_id.in_(component_jobs))
+            ).mappings():
+                stale_days.update(days_on_line(row))
+
+            counts = {}
+            for table, statement in statements:
+                result = db.session.execute(statement, execution_options={"synchronize_session": False})
+                counts[table] = result.rowcount
+
+            # Bulk deletes skip the mapper and flush events, so do their bookkeeping here
+            connection = db.session.connection()
+            PartSearchGram.remove(connection, [part_number])
+            RollupStaleDay.mark(connection, stale_days)
+            changed = {table for table, count in counts.items() if count and table in REVISIONED_TABLES}
+            for table in changed:
+                TableRevision.bump(connection, table)
+            mark_tables_changed(db.session, changed)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.info(f"Purged part {part_number}: " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+        return counts
+
+# Tables whose contents are versioned in table_revisions. Any flush that inserts, updates or deletes
+# one of their rows bumps the counter in the same transaction, so every worker can tell cheaply
+# whether its cached copy (or a client's ETag) is still current.
+REVISIONED_TABLES = {'parts', 'jigs_inventory', 'customers', 'orders', 'OrderLine', 'component_jobs', 'gantt_jobs'}
+
+class TableRevision(db.Model):
+    __tablename__ = 'table_revisions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def bump(connection, table_name):
+        """Call after bulk query.update()/delete() too: those skip the flush hook below."""
+        table = TableRevision.__table__
+        now = datetime.utcnow()
+        result = connection.execute(
+            table.update().where(table.c.table_name == table_name)
+            .values(revision=table.c.revision + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(table_name=table_name, revision=1, updated_at=now))
+
+    @staticmethod
+    def current(table_name):
+        revision = db.session.query(TableRevision.revision).filter_by(table_name=table_name).scalar()
+        return revision or 0
+
+    @staticmethod
+    def validators(table_names):
+        """
+        (etag, last_modified) for data read from `table_names`, in one small query. The ETag changes
+        whenever any of the tables is written; last_modified is None until one of them has been.
+        """
+        rows = db.session.execute(TableRevision.validators_query(table_names))
+        return TableRevision.validators_from(table_names, rows)
+
+    @staticmethod
+    def validators_query(table_names):
+        return (
+            db.select(TableRevision.table_name, TableRevision.revision, TableRevision.updated_at)
+            .where(TableRevision.table_name.in_(table_names))
+        )
+
+    @staticmethod
+    def validators_from(table_names, rows):
+        """validators() from the rows of validators_query(), however they were fetched."""
+        rows = dict((name, (revision, updated_at)) for name, revision, updated_at in rows)
+        etag = ",".join(f"{name}:{rows.get(name, (0, None))[0]}" for name in sorted(table_names))
+        timestamps = [updated_at for _, updated_at in rows.values() if updated_at is not None]
+        return etag, max(timestamps) if timestamps else None
+
+@event.listens_for(TableRevision.__table__, 'after_create')
+def seed_table_revisions(table, connection, **kwargs):
+    # Seed a row per table up front so bumps are plain UPDATEs, never racing INSERTs
+    connection.execute(table.insert(), [{"table_name": name, "revision": 0} for name in sorted(REVISIONED_TABLES)])
+
+@event.listens_for(Session, 'after_flush')
+def bump_table_revisions(session, flush_context):
+    changed = {getattr(obj, '__tablename__', None) for obj in session.new | session.deleted}
+    changed |= {
+        getattr(obj, '__tablename__', None) for obj in session.dirty
+        if session.is_modified(obj, include_collections=False)
+    }
+    changed.discard(None)
+    mark_tables_changed(session, changed)
+    for table_name in sorted(changed & REVISIONED_TABLES):
+        TableRevision.bump(session.connection(), table_name)
+
+def mark_tables_changed(session, table_names):
+    """Records tables written in this transaction; caches drop what they hold from them on commit."""
+    session.info.setdefault('changed_tables', set()).update(table_names)
+
+# Part search: a trigram side table kept in step with parts, so substring and fuzzy searches are
+# index lookups on `gram` instead of '%term%' scans. Grams follow pg_trgm: each word is padded with
+# two leading spaces and one trailing space before being cut into trigrams.
+SEARCH_WORD = re.compile(r"[^\W_]+")
+FUZZY_SIMILARITY_THRESHOLD = 0.6
+FUZZY_CANDIDATE_LIMIT = 500
+SUBSTRING_PREFILTER_GRAMS = 2
+
+def search_words(text):
+    return SEARCH_WORD.findall((text or "").lower())
+
+def padded_trigrams(text):
+    """Trigrams of each word padded pg_trgm style. This is what the index stores and fuzzy search compares."""
+    grams = set()
+    for word in search_words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def interior_trigrams(text):
+    """Unpadded trigrams of each word. Any substring match contains all of these in the index."""
+    grams = set()
+    for word in search_words(text):
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+class PartSearchGram(db.Model):
+    __tablename__ = 'part_search_grams'
+    __table_args__ = (
+        db.Index('ix_part_search_grams_part_number', 'part_number'),
+    )
+
+    gram = db.Column(db.String(3), primary_key=True)
+    part_number = db.Column(db.String(255), primary_key=True)
+
+    @staticmethod
+    def grams_for(part_number, part_description):
+        return padded_trigrams(part_number) | padded_trigrams(part_description)
+
+    @staticmethod
+    def reindex(connection, part_number, part_description, old_part_number=None):
+        """Replaces the grams of one part. Runs on the flush connection so it shares the part's transaction."""
+        table = PartSearchGram.__table__
+        connection.execute(table.delete().where(
+            table.c.part_number.in_({part_number, old_part_number or part_number})
+        ))
+        grams = PartSearchGram.grams_for(part_number, part_description)
+        if grams:
+            connection.execute(table.insert(), [{"gram": gram, "part_number": part_number} for gram in grams])
+
+    @staticmethod
+    def remove(connection, part_numbers):
+        table = PartSearchGram.__table__
+        part_numbers = list(part_numbers)
+        for i in range(0, len(part_numbers), 1000):  # Stay under SQL Server's 2100 parameter limit
+            connection.execute(table.delete().where(table.c.part_number.in_(part_numbers[i:i + 1000])))
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """Rebuilds the whole index from the parts table. Returns the number of parts indexed."""
+        table = PartSearchGram.__table__
+        db.session.execute(table.delete())
+        indexed = 0
+        rows = db.session.query(Part.part_number, Part.part_description).order_by(Part.part_number).all()
+        for i in range(0, len(rows), batch_size):
+            batch = [
+                {"gram": gram, "part_number": part_number}
+                for part_number, part_description in rows[i:i + batch_size]
+                for gram in PartSearchGram.grams_for(part_number, part_description)
+            ]
+            if batch:
+                db.session.execute(table.insert(), batch)
+            indexed += len(rows[i:i + batch_size])
+        db.session.commit()
+        logger.info(f"Rebuilt part search index for {indexed} parts.")
+        return indexed
+
+@event.listens_for(Part, 'before_update')
+def bump_part_revision(mapper, connection, target):
+    if db.session.is_modified(target, include_collections=False):
+        target.revision = (target.revision or 0) + 1
+
+@event.listens_for(Part, 'after_insert')
+def index_inserted_part(mapper, connection, target):
+    PartSearchGram.reindex(connection, target.part_number, target.part_description)
+
+@event.listens_for(Part, 'after_update')
+def index_updated_part(mapper, connection, target):
+    state = db.inspect(target)
+    number_history = state.attrs.part_number.history
+    if not (number_history.has_changes() or state.attrs.part_description.history.has_changes()):
+        return
+    old_part_number = number_history.deleted[0] if number_history.deleted else None
+    PartSearchGram.reindex(connection, target.part_number, target.part_description, old_part_number)
+
+@event.listens_for(Part, 'after_delete')
+def unindex_deleted_part(mapper, connection, target):
+    PartSearchGram.remove(connection, [target.part_number])
+
+def match_tier(term, part_number, part_description):
+    """0 for an exact match, 1 for a prefix match, 2 for a substring match, None if the term is not in the part."""
+    number, description = part_number.lower(), (part_description or "").lower()
+    if term in (number, description):
+        return 0
+    if number.startswith(term) or description.startswith(term):
+        return 1
+    if term in number or term in description:
+        return 2
+    return None
+
+def search_parts(term, customer_id=None, fuzzy=True, fuzzy_limit=50):
+    """
+    Searches part numbers and descriptions through the trigram index.
+
+    Returns a list of (part_number, part_description, match) tuples, best first, where match is one of
+    'exact', 'prefix', 'substring' or 'fuzzy'. Every substring match is returned, like the old ilike
+    search. Only when there are none (usually a typo) are up to `fuzzy_limit` close matches returned,
+    most similar first.
+    """
+    term = (term or "").strip().lower()
+    if not term:
+        return []
+
+    def scoped(query):
+        return query.filter(Part.customer_id == customer_id) if customer_id else query
+
+    substring_grams = interior_trigrams(term)
+    if substring_grams:
+        # Grams like "000" are in almost every part, so only the rarest few are used to narrow the
+        # candidates; every candidate is checked for the real substring below anyway
+        frequencies = dict(
+            db.session.query(PartSearchGram.gram, func.count())
+            .filter(PartSearchGram.gram.in_(substring_grams))
+            .group_by(PartSearchGram.gram)
+            .all()
+        )
+        if len(frequencies) < len(substring_grams):
+            candidates = []  # A gram no part has: nothing can contain the term
+        else:
+            selective = sorted(substring_grams, key=lambda gram: (frequencies[gram], gram))[:SUBSTRING_PREFILTER_GRAMS]
+            matching = (
+                db.session.query(PartSearchGram.part_number)
+                .filter(PartSearchGram.gram.in_(selective))
+                .group_by(PartSearchGram.part_number)
+                .having(func.count() == len(selective))
+            )
+            candidates = scoped(db.session.query(Part.part_number, Part.part_description)
+                                .filter(Part.part_number.in_(matching))).all()
+    else:
+        # Too short for trigrams (e.g. "a7"): fall back to a plain scan
+        pattern = f"%{term}%"
+        candidates = scoped(db.session.query(Part.part_number, Part.part_description).filter(
+            db.or_(Part.part_number.ilike(pattern), Part.part_description.ilike(pattern))
+        )).all()
+
+    hits = []
+    for part_number, part_description in candidates:
+        tier = match_tier(term, part_number, part_description)
+        if tier is not None:
+            hits.append(((tier, 0.0, part_number), part_number, part_description))
+
+    term_grams = padded_trigrams(term)
+    if fuzzy and not hits and term_grams:
+        # A similarity of at least t needs at least t * |term grams| shared grams, so filter on that in SQL
+        min_shared = max(1, math.ceil(FUZZY_SIMILARITY_THRESHOLD * len(term_grams)))
+        shared = (
+            scoped(db.session.query(PartSearchGram.part_number, func.count().label('shared'))
+                   .join(Part, Part.part_number == PartSearchGram.part_number))
+            .filter(PartSearchGram.gram.in_(term_grams))
+            .group_by(PartSearchGram.part_number)
+            .having(func.count() >= min_shared)
+            .order_by(func.count().desc(), PartSearchGram.part_number)
+            .limit(FUZZY_CANDIDATE_LIMIT)
+            .subquery()
+        )
+        fuzzy_candidates = (
+            db.session.query(Part.part_number, Part.part_description, shared.c.shared)
+            .join(shared, shared.c.part_number == Part.part_number)
+            .all()
+        )
+        hits = sorted(
+            ((3, -shared_grams / len(term_grams), part_number), part_number, part_description)
+            for part_number, part_description, shared_grams in fuzzy_candidates
+        )[:fuzzy_limit]
+
+    labels = ('exact', 'prefix', 'substring', 'fuzzy')
+    return [(part_number, part_description, labels[key[0]]) for key, part_number, part_description in sorted(hits)]
+
 class Order(db.Model):
     __tablename__ = 'orders'
     __table_args__ = {'extend_existing': True}
@@ -142,11 +460,17 @@ class Order(db.Model):
 
     __table_args__ = (
         CheckConstraint("status IN ('In Progress', 'Complete')", name='check_order_status'),
+        db.Index('ix_orders_purchase_order_number', 'purchase_order_number'),
+        db.Index('ix_orders_customer_id_date_of_arrival', 'customer_id', 'date_of_arrival'),
     )
 
 class OrderLine(db.Model):
     __tablename__ = 'OrderLine'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_orderline_order_id', 'order_id'),
+        db.Index('ix_orderline_part_number', 'part_number'),
+        {'extend_existing': True}
+    )
 
     OrderLine_id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.order_id'), nullable=False)
@@ -157,6 +481,84 @@ class OrderLine(db.Model):
     vat = db.Column(db.Numeric(18, 2), nullable=False)
     total_price = db.Column(db.Numeric(18, 2), nullable=False)
 
+class DraftOrder(db.Model):
+    """An order being built on the orders form, kept server-side so the session cookie only holds its id."""
+    __tablename__ = 'draft_orders'
+    __table_args__ = (
+        db.Index('ix_draft_orders_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
+    draft_id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    customer_and_order_details = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    lines = db.relationship('DraftOrderLine', order_by='DraftOrderLine.draft_line_id', viewonly=True)
+
+    def append_line(self, line):
+        """Adds one line with a single INSERT; the lines already saved are not loaded or rewritten."""
+        db.session.add(DraftOrderLine(draft_id=self.draft_id, line=line))
+        self.updated_at = datetime.utcnow()
+
+    def line_count(self):
+        return db.session.query(func.count(DraftOrderLine.draft_line_id)).filter_by(draft_id=self.draft_id).scalar()
+
+    def discard(self):
+        db.session.query(DraftOrderLine).filter_by(draft_id=self.draft_id).delete(synchronize_session=False)
+        db.session.delete(self)
+
+    @staticmethod
+    def delete_stale(days=30):
+        """Deletes drafts nobody has touched for `days` days. Returns how many were removed."""
+        threshold = datetime.utcnow() - timedelta(days=days)
+        stale = db.session.query(DraftOrder.draft_id).filter(DraftOrder.updated_at < threshold)
+        db.session.query(DraftOrderLine).filter(DraftOrderLine.draft_id.in_(stale)).delete(synchronize_session=False)
+        removed = db.session.query(DraftOrder).filter(DraftOrder.updated_at < threshold).delete(synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Deleted {removed} draft orders untouched for {days} days.")
+        return removed
+
+class DraftOrderLine(db.Model):
+    __tablename__ = 'draft_order_lines'
+    __table_args__ = (
+        db.Index('ix_draft_order_lines_draft_id', 'draft_id'),
+    )
+
+    draft_line_id = db.Column(db.Integer, primary_key=True)
+    draft_id = db.Column(db.String(32), db.ForeignKey('draft_orders.draft_id'), nullable=False)
+    line = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class IdempotencyKey(db.Model):
+    """
+    A POST sent with an idempotency key, and once it has finished, the response it got. Retries
+    with the same key are answered from here instead of running the request again.
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
+
+    scope = db.Column(db.String(128), primary_key=True)  # Endpoint and user, so keys cannot collide across them
+    key = db.Column(db.String(128), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # Hash of the request, to catch a key reused for another one
+    status_code = db.Column(db.Integer, nullable=True)  # Null while the first request is still running
+    content_type = db.Column(db.String(255), nullable=True)
+    location = db.Column(db.String(2048), nullable=True)
+    body = db.Column(db.LargeBinary, nullable=True)
+    flashes = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def delete_expired(seconds):
+        """Deletes keys older than `seconds`, after which retries run again anyway. Returns how many were removed."""
+        threshold = datetime.utcnow() - timedelta(seconds=seconds)
+        removed = db.session.query(IdempotencyKey).filter(IdempotencyKey.created_at < threshold).delete(synchronize_session=False)
+        db.session.commit()
+        logger.info(f"Deleted {removed} idempotency keys older than {seconds:g}s.")
+        return removed
+
 # PROCESS_CATEGORIES Dictionary  
 PROCESS_CATEGORIES = {
     "jigging": "operation",
@@ -219,6 +621,10 @@ def categorize_dye(dye_name):
 
 class GanttJob(db.Model):
     __tablename__ = 'gantt_jobs'
+    __table_args__ = (
+        db.Index('ix_gantt_jobs_jigging_start', 'jigging_start'),
+        db.Index('ix_gantt_jobs_packing_end', 'packing_end'),
+    )
 
     gantt_job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     component_job_id = db.Column(db.Integer, db.ForeignKey('component_jobs.component_job_id'), nullable=False, unique=True)
@@ -226,6 +632,11 @@ class GanttJob(db.Model):
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.customer_id'), nullable=False)
     load_number = db.Column(db.Integer, nullable=False)
 
+    # Bumped by every ORM update; updates and deletes of a row someone else has changed since it
+    # was read fail with StaleDataError instead of overwriting their change
+    row_version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {"version_id_col": row_version}
+
     # Process Step Start & End Timestamps
     polishing_start = db.Column(db.DateTime, nullable=True)
     polishing_end = db.Column(db.DateTime, nullable=True)
@@ -331,18 +742,304 @@ class GanttJob(db.Model):
     order = db.relationship('Order', backref='gantt_jobs', lazy=True)
     customer = db.relationship('Customer', backref='gantt_jobs', lazy=True)
 
-    # Auto-delete records older than 2 days
+    def schedule(self):
+        """{column: datetime} for every step start and end this load is scheduled on."""
+        return {
+            column.name: getattr(self, column.name)
+            for column in self.__table__.columns
+            if column.name.endswith(('_start', '_end')) and getattr(self, column.name) is not None
+        }
+
+    def shift(self, delta):
+        """Moves every scheduled step of the load by `delta`."""
+        for name, value in self.schedule().items():
+            setattr(self, name, value + delta)
+
+    def as_state(self):
+        """The load as a planner's board shows it, with the row_version to send back when editing it."""
+        return {
+            "gantt_job_id": self.gantt_job_id,
+            "component_job_id": self.component_job_id,
+            "load_number": self.load_number,
+            "row_version": self.row_version,
+            "schedule": {name: value.isoformat() for name, value in self.schedule().items()},
+        }
+
+    # Move finished loads off the live board, keeping their history
     @staticmethod
-    def delete_old_records():
-        """Delete GanttJobs older than 2 days."""
-        threshold_date = datetime.utcnow() - timedelta(days=2)
-        db.session.query(GanttJob).filter(GanttJob.jigging_start < threshold_date).delete()
-        db.session.commit()
-        logger.info("Deleted old Gantt Jobs older than 2 days.")
+    def archive_old_records(older_than_days=2, batch_size=500, max_batches=None, pause_seconds=0.0):
+        """
+        Moves GanttJobs whose jigging started more than `older_than_days` ago into gantt_jobs_archive.
+
+        Works in batches of `batch_size` rows, each copied and deleted in its own short transaction,
+        so planners are never locked out for long. Safe to re-run or interrupt: every committed batch
+        is complete and the next run carries on where the last one stopped. A live load whose id is
+        already in the archive stops the run with its batch untouched rather than being deleted
+        uncopied. Returns {"rows_moved", "batches", "duration_seconds", "threshold"}.
+        """
+        started = time.perf_counter()
+        threshold = datetime.utcnow() - timedelta(days=older_than_days)
+        live, archive = GanttJob.__table__, GanttJobArchive.__table__
+        copied_columns = [column.name for column in live.columns]
+
+        rows_moved = batches = 0
+        while max_batches is None or batches < max_batches:
+            ids = [row[0] for row in db.session.execute(
+                db.select(live.c.gantt_job_id)
+                .where(live.c.jigging_start < threshold)
+                .order_by(live.c.gantt_job_id)
+                .limit(batch_size)
+            )]
+            if not ids:
+                break
+
+            try:
+                # A batch copies and deletes together, so an id already archived is a different load
+                # that reused it; never delete a live load that was not copied
+                already_archived = db.session.execute(
+                    db.select(archive.c.gantt_job_id).where(archive.c.gantt_job_id.in_(ids))
+                ).scalars().all()
+                if already_archived:
+                    raise ValueError(f"Gantt Jobs {already_archived} are already in gantt_jobs_archive; "
+                                     f"resolve them before archiving again.")
+                db.session.execute(archive.insert().from_select(
+                    copied_columns + ['archived_at'],
+                    db.select(*[live.c[name] for name in copied_columns], db.literal(datetime.utcnow()))
+                    .where(live.c.gantt_job_id.in_(ids)),
+                ))
+                db.session.execute(live.delete().where(live.c.gantt_job_id.in_(ids)))
+                TableRevision.bump(db.session.connection(), 'gantt_jobs')
+                mark_tables_changed(db.session, {'gantt_jobs'})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception(f"Archiving Gantt Jobs failed after {rows_moved} rows; re-run to resume.")
+                raise
+
+            rows_moved += len(ids)
+            batches += 1
+            if pause_seconds:
+                time.sleep(pause_seconds)  # Let planners' transactions in between batches
+
+        report = {
+            "rows_moved": rows_moved,
+            "batches": batches,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            "threshold": threshold.isoformat(timespec='seconds'),
+        }
+        logger.info(f"Archived {rows_moved} Gantt Jobs started before {report['threshold']} "
+                    f"in {batches} batches ({report['duration_seconds']}s).")
+        return report
+
+
+class GanttJobArchive(db.Model):
+    """Loads moved off the live board by GanttJob.archive_old_records; kept for lead-time analysis."""
+    __table__ = db.Table(
+        'gantt_jobs_archive',
+        db.metadata,
+        *[db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                    autoincrement=False,
+                    server_default=column.server_default.arg if column.server_default is not None else None)
+          for column in GanttJob.__table__.columns],
+        db.Column('archived_at', db.DateTime, nullable=False),
+        db.Index('ix_gantt_jobs_archive_jigging_start', 'jigging_start'),
+        db.Index('ix_gantt_jobs_archive_customer_id', 'customer_id'),
+        db.Index('ix_gantt_jobs_archive_packing_end', 'packing_end'),
+    )
+
+
+# Production reporting rollups, maintained by rollups.refresh_rollups from loads as they finish
+# (packing done), so reports never have to aggregate raw gantt_jobs / orders history.
+
+class DailyTankRollup(db.Model):
+    """Loads through one process step (tank) on one day, and the minutes it was occupied."""
+    __tablename__ = 'daily_tank_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    tank = db.Column(db.String(32), primary_key=True)  # Step column prefix, e.g. 'anodising_1a'
+    loads = db.Column(db.Integer, nullable=False, default=0)
+    busy_minutes = db.Column(db.Float, nullable=False, default=0)
+
+
+class WeeklyLeadTimeRollup(db.Model):
+    """Arrival-to-packing lead time of one customer's loads finished in one week (weeks start on Monday)."""
+    __tablename__ = 'weekly_lead_time_rollups'
+    __table_args__ = (
+        db.Index('ix_weekly_lead_time_rollups_week_start', 'week_start'),
+    )
+
+    customer_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    week_start = db.Column(db.Date, primary_key=True)
+    loads = db.Column(db.Integer, nullable=False, default=0)
+    total_lead_minutes = db.Column(db.Float, nullable=False, default=0)
+    max_lead_minutes = db.Column(db.Float, nullable=False, default=0)
+
+
+class RollupWatermark(db.Model):
+    """How far each rollup has been brought up to date: loads packed up to `finished_through` (local time) are counted."""
+    __tablename__ = 'rollup_watermarks'
+
+    name = db.Column(db.String(64), primary_key=True)
+    finished_through = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class RollupStaleDay(db.Model):
+    """
+    A day whose rollups are out of date because a load on it was created, moved or deleted. Written
+    in the same transaction as the change; refresh_rollups recomputes the day and removes the row.
+    """
+    __tablename__ = 'rollup_stale_days'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day = db.Column(db.Date, nullable=False)
+
+    @staticmethod
+    def mark(connection, days):
+        days = sorted(set(days))
+        if days:
+            connection.execute(RollupStaleDay.__table__.insert(), [{"day": day} for day in days])
+
+def days_on_line(schedule):
+    """Every calendar day from the first step start to the last step end in `schedule` ({column: datetime})."""
+    starts = [value for name, value in schedule.items() if name.endswith('_start') and value is not None]
+    ends = [value for name, value in schedule.items() if name.endswith('_end') and value is not None]
+    if not starts or not ends:
+        return []
+    first, last = min(starts).date(), max(ends).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+# Columns whose change moves a load's contribution to the rollups
+ROLLUP_COLUMNS = [column.name for column in GanttJob.__table__.columns
+                  if column.name.endswith(('_start', '_end')) or column.name in ('order_id', 'customer_id')]
+
+@event.listens_for(Session, 'after_flush')
+def mark_rollup_days_stale(session, flush_context):
+    days = set()
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, GanttJob):
+            continue
+        # Attribute history holds the values before and after this flush, without loading anything
+        histories = {name: inspect(obj).attrs[name].history for name in ROLLUP_COLUMNS}
+        if obj in session.dirty and not any(history.has_changes() for history in histories.values()):
+            continue
+        if obj not in session.new:
+            days.update(days_on_line({
+                name: (history.deleted or history.unchanged or [None])[0] for name, history in histories.items()
+            }))
+        if obj not in session.deleted:
+            days.update(days_on_line({
+                name: (history.added or history.unchanged or [None])[0] for name, history in histories.items()
+            }))
+    RollupStaleDay.mark(session.connection(), days)
+
+
+# Component job operations are stored packed rather than as JSON: one "<step>*<duration>[*<detail>]"
+# entry per operation, joined by "|". <step> is the operation's position in OPERATION_NAMES, or "="
+# and the quoted name for anything not listed (e.g. a custom sealing). Only ever append names:
+# stored rows refer to them by position.
+OPERATION_NAMES = (
+    "Jigging", "Strip Etch", "Loading", "Degrease", "Water Rinse (1 or 2)", "Caustic Etch", "Flash Anodise",
+    "Water Rinse (3 or 4)", "Water Rinse (2 or 1)", "Desmut", "Anodising", "Water Rinse (5 or 6)",
+    "Unloading", "Off-line rinse", "Hot Seal", "Water Rinse (7)", "Water Rinse (8)", "Cold Seal 30 min",
+    "Cold Seal 15 min", "Boiling Water Seal", "No sealing", "Drying", "Unjigging", "Packing",
+    "Gold", "Black", "Premium black", "Blue", "Turquoise", "Stainless", "Green", "Bronze", "Red", "Orange",
+)
+OPERATION_CODES = {name: str(code) for code, name in enumerate(OPERATION_NAMES)}
+
+# Characters left readable in quoted names and details; the separators "|", "*", "=" and "%" never are
+FREE_TEXT_SAFE = " ()-,.:;&/'+#"
+
+
+class Operation:
+    """One step of a component job: name, duration in minutes and an optional detail (voltage, operator notes)."""
+    __slots__ = ('name', 'duration', 'detail')
+
+    def __init__(self, name, duration, detail=None):
+        self.name = name
+        self.duration = duration
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Operation({self.name!r}, {self.duration!r}, {self.detail!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, Operation) and (self.name, self.duration, self.detail) == (other.name, other.duration, other.detail)
+
+    @property
+    def minutes(self):
+        try:
+            return float(self.duration or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def as_dict(self, loads_required):
+        """A per-load operation in the shape the operation sheets (and the old JSON column) use."""
+        return {
+            "operation": self.name,
+            "duration": self.duration,
+            "description": self.name.lower() + (f" ({self.detail})" if self.detail else ""),
+            "initials": [f"Load {i + 1}" for i in range(loads_required)],
+        }
+
+    def as_load_independent_dict(self):
+        return {"operation": self.name, "duration": self.duration, "notes": self.detail}
+
+    @staticmethod
+    def from_dict(data):
+        """Reads an operation stored in the old JSON form (per-load or load-independent)."""
+        name = data["operation"]
+        detail = data.get("notes")
+        if detail is None:
+            description, prefix = data.get("description") or "", f"{name.lower()} ("
+            if description.startswith(prefix) and description.endswith(")"):
+                detail = description[len(prefix):-1]
+        return Operation(name, data.get("duration"), detail)
+
+
+def pack_duration(duration):
+    try:
+        value = float(duration)
+    except (TypeError, ValueError):
+        return ""
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def unpack_duration(text):
+    if not text:
+        return None
+    return float(text) if any(c in text for c in ".eE") else int(text)
+
+
+def encode_operations(operations):
+    """Packs Operations (or old-style operation dicts) into the stored text form; None for no operations."""
+    entries = []
+    for operation in operations or ():
+        if isinstance(operation, dict):
+            operation = Operation.from_dict(operation)
+        step = OPERATION_CODES.get(operation.name) or "=" + quote(operation.name, safe=FREE_TEXT_SAFE)
+        entry = f"{step}*{pack_duration(operation.duration)}"
+        if operation.detail is not None:
+            entry += "*" + quote(str(operation.detail), safe=FREE_TEXT_SAFE)
+        entries.append(entry)
+    return "|".join(entries) or None
+
+
+def decode_operations(packed):
+    operations = []
+    for entry in packed.split("|") if packed else ():
+        step, duration, *detail = entry.split("*")
+        name = unquote(step[1:]) if step.startswith("=") else OPERATION_NAMES[int(step)]
+        operations.append(Operation(name, unpack_duration(duration), unquote(detail[0]) if detail else None))
+    return operations
 
 
 class ComponentJob(db.Model):
     __tablename__ = 'component_jobs'
+    __table_args__ = (
+        db.Index('ix_component_jobs_part_id', 'part_id'),
+        db.Index('ix_component_jobs_order_line_id', 'order_line_id'),
+    )
 
     component_job_id = db.Column(db.Integer, primary_key=True)
     part_id = db.Column(db.String(255), db.ForeignKey('parts.part_number'), nullable=False)
@@ -352,8 +1049,8 @@ class ComponentJob(db.Model):
     required_jigs = db.Column(db.Integer, nullable=False)
     loads_required = db.Column(db.Integer, nullable=False)
     buzzbars_required = db.Column(db.Float, nullable=False)
-    load_independent_operations = db.Column(JSON, nullable=True) 
-    operations = db.Column(JSON, nullable=True) 
+    load_independent_operation_codes = db.Column(db.Text, nullable=True)  # Packed, see encode_operations
+    operation_codes = db.Column(db.Text, nullable=True)
     jigging_duration_per_load = db.Column(db.Integer, nullable=False, default=0)  
 
 
@@ -361,25 +1058,62 @@ class ComponentJob(db.Model):
     units_per_load = db.Column(db.Integer, nullable=False)
     quantity_of_final_load = db.Column(db.Integer, nullable=False)
 
+    # See GanttJob.row_version; also bumped when the job's loads are put on the board (claim)
+    row_version = db.Column(db.Integer, nullable=False, server_default='1')
+    __mapper_args__ = {"version_id_col": row_version}
+
     # Relationships
     customer = db.relationship('Customer', back_populates='component_jobs')
     part = db.relationship('Part', backref='component_jobs')
     order_line = db.relationship('OrderLine', backref='component_jobs')
 
+    @property
+    def operations(self):
+        """Operations run on every load, decoded from operation_codes (once per stored value)."""
+        return self._decoded('operation_codes')
+
+    @operations.setter
+    def operations(self, operations):
+        self.operation_codes = encode_operations(operations)
+
+    @property
+    def load_independent_operations(self):
+        """Operations run once for the whole job before jigging (polishing, blasting)."""
+        return self._decoded('load_independent_operation_codes')
+
+    @load_independent_operations.setter
+    def load_independent_operations(self, operations):
+        self.load_independent_operation_codes = encode_operations(operations)
+
+    def _decoded(self, column):
+        packed = getattr(self, column)
+        cache = self.__dict__.setdefault('_decoded_operations', {})
+        if column not in cache or cache[column][0] != packed:
+            cache[column] = (packed, decode_operations(packed))
+        return list(cache[column][1])
+
+    def claim(self, expected_version=None):
+        """
+        Bumps row_version in the current transaction if it is still `expected_version` (whatever it
+        is, if None). Returns False if another planner changed or scheduled the job first. Taken
+        before putting the job's loads on the board, so two planners cannot both schedule it.
+        """
+        table = ComponentJob.__table__
+        statement = table.update().where(table.c.component_job_id == self.component_job_id)
+        if expected_version is not None:
+            statement = statement.where(table.c.row_version == expected_version)
+        result = db.session.execute(statement.values(row_version=table.c.row_version + 1))
+        db.session.expire(self, ['row_version'])
+        if result.rowcount != 1:
+            return False
+        TableRevision.bump(db.session.connection(), 'component_jobs')
+        mark_tables_changed(db.session, {'component_jobs'})
+        return True
+
     @staticmethod
-    def add_operation(operation_name, duration, loads_required, additional_info=None):
-        """Adds an operation with the given details."""
-        description = operation_name.lower()
-        if additional_info:
-            description += f" ({additional_info})"
-
-        operation_data = {
-            "operation": operation_name,
-            "duration": duration,
-            "description": description,
-            "initials": [f"Load {i + 1}" for i in range(loads_required)]
-        }
-        return operation_data
+    def add_operation(operation_name, duration, additional_info=None):
+        """An operation run on every load."""
+        return Operation(operation_name, duration, additional_info)
 
 
     @staticmethod
@@ -388,14 +1122,14 @@ class ComponentJob(db.Model):
         if part.jig_type:
             # Strip whitespace from jig_type and log the value
             jig_type = part.jig_type.strip()
-            logger.info(f"Looking up jig for jig_type: '{jig_type}'")
+            logger.debug(f"Looking up jig for jig_type: '{jig_type}'")
 
             # Perform the lookup
             jig = Jig.query.filter_by(jig_type=jig_type).first()
 
             # Check if jig is found
             if jig:
-                logger.info(f"Found jig for jig_type: '{jig_type}' with ID: {jig.jig_id}")
+                logger.debug(f"Found jig for jig_type: '{jig_type}' with ID: {jig.jig_id}")
                 return jig
             else:
                 logger.warning(f"No jig found for jig_type: '{jig_type}'. Check if jig_type exists in database or if there are whitespace issues.")
@@ -413,12 +1147,170 @@ class ComponentJob(db.Model):
         mpj = part.custom_mpj or (jig.MPJ if jig else 2)     # Default  fallback
 
         if jig:
-            logger.info(f"Using jig values for part '{part.part_number}' from jig type '{jig.jig_type}' - UPJ: {upj}, JPL: {jpl}, MPJ: {mpj}")
+            logger.debug(f"Using jig values for part '{part.part_number}' from jig type '{jig.jig_type}' - UPJ: {upj}, JPL: {jpl}, MPJ: {mpj}")
         else:
             logger.warning(f"No jig found, using default values for part '{part.part_number}' - UPJ: {upj}, JPL: {jpl}, MPJ: {mpj}")
 
         return upj, jpl, mpj
 
+    @staticmethod
+    def plan_loads(part, jig, quantity):
+        """
+        The load plan for `quantity` of `part` on `jig`: jig, buzzbar and load counts and the operations
+        with their durations, keyed like the ComponentJob columns. Pure arithmetic, no database access,
+        so quotes (see quoting.py) price exactly what generate_component_jobs would schedule.
+        """
+        # Determine UPJ, JPL, and MPJ values with fallback
+        upj, jpl, mpj = ComponentJob.determine_jig_values(part, jig)
+
+        # Calculate required jigs, buzzbars, and loads
+        required_jigs = math.ceil(quantity / upj)
+        buzzbars_required = required_jigs / jpl
+        loads_required = math.ceil(required_jigs / jpl)
+        # Calculate units per load (UPJ * JPL)
+        units_per_load = upj * jpl
+
+        # Determine the quantity of the final load
+        if loads_required > 1:
+            # Multi-load job: Calculate the remaining quantity for the final load
+            quantity_of_final_load = quantity - (units_per_load * (loads_required - 1))
+        else:
+            # Single load job: The final load is the total quantity
+            quantity_of_final_load = quantity
+
+        # Calculate durations and operations
+        jigging_duration_per_load = math.ceil(mpj * required_jigs / loads_required)
+        total_jigging_duration = jigging_duration_per_load * loads_required
+        packing_duration = math.ceil(mpj / 3 * required_jigs / loads_required)
+
+        # List to hold load-independent operations
+        load_independent_operations = []
+
+        # Parse polishing details
+        try:
+            polishing_details = json.loads(part.polishing) if part.polishing else []
+        except json.JSONDecodeError:
+            polishing_details = []  # Default to an empty list if parsing fails
+
+        # Polishing Operations
+        if part.polishing_selection_status == 1:
+            for step in polishing_details:
+                load_independent_operations.append(Operation(
+                    f"Polishing; Step {step['step_number']}, Equipment: {step['equipment']}, Grit: {step['grit']}, Compound: {step['compound']}",
+                    4 * total_jigging_duration,  # Ensure this reflects polishing-specific logic
+                    f"DD/MM & Initial(s) & Quantity: {quantity}"  # Placeholder for operator notes
+                ))
+
+        # Blasting Operations
+        if part.blasting_selection_status == 1:
+            calculated_blasting_duration = 2 * total_jigging_duration  # Replace with actual logic if necessary
+            load_independent_operations.append(Operation(
+                f"Blasting ({part.blasting})",
+                calculated_blasting_duration,
+                f"DD/MM & Initial(s) & Quantity: {quantity}"  # Placeholder for operator notes
+            ))
+
+        # List to hold operations
+        operations = []
+
+        operations.append(ComponentJob.add_operation("Jigging", jigging_duration_per_load))
+
+        # Check for Strip Etch operation
+        if part.strip_etch_selection_status == 1:
+            operations.append(ComponentJob.add_operation("Strip Etch", part.strip_etch))
+
+        # Determine next steps based on anodising selection status
+        if part.anodising_selection_status == 1:
+            # Continue with the anodic process
+            operations.append(ComponentJob.add_operation("Loading", 1))
+            operations.append(ComponentJob.add_operation("Degrease", 10))
+            operations.append(ComponentJob.add_operation("Water Rinse (1 or 2)", 1))
+
+            # Anodising and etching operations
+            if part.double_and_etch_selection_status == 1:
+                operations.append(ComponentJob.add_operation("Caustic Etch", 0.25))
+                operations.append(ComponentJob.add_operation("Water Rinse (1 or 2)", 1))
+                operations.append(ComponentJob.add_operation("Flash Anodise", 5, additional_info="16V"))
+                operations.append(ComponentJob.add_operation("Water Rinse (3 or 4)", 1))
+                operations.append(ComponentJob.add_operation("Caustic Etch", 3))
+
+            if part.etch_selection_status == 1:
+                operations.append(ComponentJob.add_operation("Caustic Etch", part.etch))
+                operations.append(ComponentJob.add_operation("Water Rinse (2 or 1)", 1))
+                operations.append(ComponentJob.add_operation("Desmut", 1))
+                operations.append(ComponentJob.add_operation("Water Rinse (3 or 4)", 1))
+
+            # Anodising process
+            anodise_duration = part.anodising_duration or 0
+            voltage = part.voltage or "N/A"
+            operations.append(ComponentJob.add_operation("Anodising", anodise_duration, additional_info=f"{voltage}V"))
+            operations.append(ComponentJob.add_operation("Water Rinse (5 or 6)", 1))
+
+        else:
+            # Skip anodising and proceed with drying, unjigging, and packing
+            operations.append(ComponentJob.add_operation("Drying", 15))
+            operations.append(ComponentJob.add_operation("Unjigging", math.ceil(2.5 * required_jigs / loads_required)))
+            operations.append(ComponentJob.add_operation("Packing", packing_duration))
+
+        # Dye category (undyed or in-line/off-line  dyed)
+        dye = part.dye.capitalize() if part.dye else "Default (un-dyed)"
+        dye_category = categorize_dye(dye)
+
+        # Initialize unloading tracking
+        unloading_done = False
+
+        # Handle off-line dyeing (includes hot seal)
+        if part.dye_selection_status == 1 and dye_category == "off-line":      
+            operations.append(ComponentJob.add_operation("Unloading", 1))
+            unloading_done = True
+
+            # Off-line dye, rinse, and hot seal
+            operations.append(ComponentJob.add_operation(f"{dye}", 20))
+            operations.append(ComponentJob.add_operation("Off-line rinse", 1))
+            operations.append(ComponentJob.add_operation("Hot Seal", 30))
+            operations.append(ComponentJob.add_operation("Off-line rinse", 1))
+
+        # Handle in-line dyeing
+        elif part.dye_selection_status == 1 and dye_category == "in-line":
+            # In-line dye, rinse, seal, and rinse
+            operations.append(ComponentJob.add_operation(f"{dye}", 20))
+            operations.append(ComponentJob.add_operation("Water Rinse (7)", 1))
+            operations.append(ComponentJob.add_operation(part.sealing, 30 if "30 min" in part.sealing or "Boiling" in part.sealing else 15))
+            operations.append(ComponentJob.add_operation("Water Rinse (8)", 1))
+
+        # Handle undyed parts (dye_selection_status = 0)
+        elif part.dye_selection_status == 0:
+            # Check if the part requires unloading and then hot sealing
+            if part.sealing == "Hot Seal":
+                operations.append(ComponentJob.add_operation("Unloading", "1"))
+                unloading_done = True
+                operations.append(ComponentJob.add_operation("Hot Seal", 30))
+                operations.append(ComponentJob.add_operation("Off-line rinse", 1))
+            else:
+                # Seal and rinse without unloading
+                operations.append(ComponentJob.add_operation(part.sealing, 30 if "30 min" in part.sealing or "Boiling" in part.sealing else 15))
+                operations.append(ComponentJob.add_operation("Water Rinse (8)", 1))
+
+        # Final unloading (only if it hasn’t already happened)
+        if not unloading_done:
+            operations.append(ComponentJob.add_operation("Unloading", 1))
+
+        # Final post-processing steps
+        operations.append(ComponentJob.add_operation("Drying", 15))
+        operations.append(ComponentJob.add_operation("Unjigging", math.ceil(2.5 * required_jigs / loads_required)))
+        operations.append(ComponentJob.add_operation("Packing", packing_duration))
+
+        return {
+            "required_jigs": required_jigs,
+            "buzzbars_required": buzzbars_required,
+            "loads_required": loads_required,
+            "units_per_load": units_per_load,
+            "quantity_of_final_load": quantity_of_final_load,
+            "jigging_duration_per_load": jigging_duration_per_load,
+            "operations": operations,
+            "load_independent_operations": load_independent_operations,
+        }
+
     @staticmethod
     def generate_component_jobs(order):
         """Generates component jobs from an Order object, and its related OrderLine and Part objects."""
@@ -438,148 +1330,7 @@ class ComponentJob(db.Model):
                 logger.warning(f"Jig type '{part.jig_type}' not found in database.")
                 continue
 
-            # Determine UPJ, JPL, and MPJ values with fallback
-            upj, jpl, mpj = ComponentJob.determine_jig_values(part, jig)
-
-            # Calculate required jigs, buzzbars, and loads
-            quantity = order_line.quantity
-            required_jigs = math.ceil(quantity / upj)
-            buzzbars_required = required_jigs / jpl
-            loads_required = math.ceil(required_jigs / jpl)
-            # Calculate units per load (UPJ * JPL)
-            units_per_load = upj * jpl
-
-            # Determine the quantity of the final load
-            if loads_required > 1:
-                # Multi-load job: Calculate the remaining quantity for the final load
-                quantity_of_final_load = quantity - (units_per_load * (loads_required - 1))
-            else:
-                # Single load job: The final load is the total quantity
-                quantity_of_final_load = quantity
-
-            # Calculate durations and operations
-            jigging_duration_per_load = math.ceil(mpj * required_jigs / loads_required)
-            total_jigging_duration = jigging_duration_per_load * loads_required
-            packing_duration = math.ceil(mpj / 3 * required_jigs / loads_required)
-
-            # List to hold load-independent operations
-            load_independent_operations = []
-
-            # Parse polishing details
-            try:
-                polishing_details = json.loads(part.polishing) if part.polishing else []
-            except json.JSONDecodeError:
-                polishing_details = []  # Default to an empty list if parsing fails
-
-            # Polishing Operations
-            if part.polishing_selection_status == 1:
-                for step in polishing_details:
-                    load_independent_operations.append({
-                        "operation": f"Polishing; Step {step['step_number']}, Equipment: {step['equipment']}, Grit: {step['grit']}, Compound: {step['compound']}",
-                        "duration": 4 * total_jigging_duration,  # Ensure this reflects polishing-specific logic
-                        "notes": f"DD/MM & Initial(s) & Quantity: {quantity}"  # Placeholder for operator notes
-                    })
-
-            # Blasting Operations
-            if part.blasting_selection_status == 1:
-                calculated_blasting_duration = 2 * total_jigging_duration  # Replace with actual logic if necessary
-                load_independent_operations.append({
-                    "operation": f"Blasting ({part.blasting})",
-                    "duration": calculated_blasting_duration,
-                    "notes": f"DD/MM & Initial(s) & Quantity: {quantity}"  # Placeholder for operator notes
-                })
-
-            # List to hold operations
-            operations = []
-
-            operations.append(ComponentJob.add_operation("Jigging", jigging_duration_per_load, loads_required))
-
-            # Check for Strip Etch operation
-            if part.strip_etch_selection_status == 1:
-                operations.append(ComponentJob.add_operation("Strip Etch", part.strip_etch, loads_required))
-
-            # Determine next steps based on anodising selection status
-            if part.anodising_selection_status == 1:
-                # Continue with the anodic process
-                operations.append(ComponentJob.add_operation("Loading", 1, loads_required))
-                operations.append(ComponentJob.add_operation("Degrease", 10, loads_required))
-                operations.append(ComponentJob.add_operation("Water Rinse (1 or 2)", 1, loads_required))
-
-                # Anodising and etching operations
-                if part.double_and_etch_selection_status == 1:
-                    operations.append(ComponentJob.add_operation("Caustic Etch", 0.25, loads_required))
-                    operations.append(ComponentJob.add_operation("Water Rinse (1 or 2)", 1, loads_required))
-                    operations.append(ComponentJob.add_operation("Flash Anodise", 5, loads_required, additional_info="16V"))
-                    operations.append(ComponentJob.add_operation("Water Rinse (3 or 4)", 1, loads_required))
-                    operations.append(ComponentJob.add_operation("Caustic Etch", 3, loads_required))
-
-                if part.etch_selection_status == 1:
-                    operations.append(ComponentJob.add_operation("Caustic Etch", part.etch, loads_required))
-                    operations.append(ComponentJob.add_operation("Water Rinse (2 or 1)", 1, loads_required))
-                    operations.append(ComponentJob.add_operation("Desmut", 1, loads_required))
-                    operations.append(ComponentJob.add_operation("Water Rinse (3 or 4)", 1, loads_required))
-
-                # Anodising process
-                anodise_duration = part.anodising_duration or 0
-                voltage = part.voltage or "N/A"
-                operations.append(ComponentJob.add_operation("Anodising", anodise_duration, loads_required, additional_info=f"{voltage}V"))
-                operations.append(ComponentJob.add_operation("Water Rinse (5 or 6)", 1, loads_required))
-
-            else:
-                # Skip anodising and proceed with drying, unjigging, and packing
-                operations.append(ComponentJob.add_operation("Drying", 15, loads_required))
-                operations.append(ComponentJob.add_operation("Unjigging", math.ceil(2.5 * required_jigs / loads_required), loads_required))
-                operations.append(ComponentJob.add_operation("Packing", packing_duration, loads_required))
-
-            # Dye category (undyed or in-line/off-line  dyed)
-            dye = part.dye.capitalize() if part.dye else "Default (un-dyed)"
-            dye_category = categorize_dye(dye)
-
-            # Initialize unloading tracking
-            unloading_done = False
-
-            # Handle off-line dyeing (includes hot seal)
-            if part.dye_selection_status == 1 and dye_category == "off-line":      
-                operations.append(ComponentJob.add_operation("Unloading", 1, loads_required))
-                unloading_done = True
-
-                # Off-line dye, rinse, and hot seal
-                operations.append(ComponentJob.add_operation(f"{dye}", 20, loads_required))
-                operations.append(ComponentJob.add_operation("Off-line rinse", 1, loads_required))
-                operations.append(ComponentJob.add_operation("Hot Seal", 30, loads_required))
-                operations.append(ComponentJob.add_operation("Off-line rinse", 1, loads_required))
-
-            # Handle in-line dyeing
-            elif part.dye_selection_status == 1 and dye_category == "in-line":
-                # In-line dye, rinse, seal, and rinse
-                operations.append(ComponentJob.add_operation(f"{dye}", 20, loads_required))
-                operations.append(ComponentJob.add_operation("Water Rinse (7)", 1, loads_required))
-                operations.append(ComponentJob.add_operation(part.sealing, 30 if "30 min" in part.sealing or "Boiling" in part.sealing else 15, loads_required))
-                operations.append(ComponentJob.add_operation("Water Rinse (8)", 1, loads_required))
-
-            # Handle undyed parts (dye_selection_status = 0)
-            elif part.dye_selection_status == 0:
-                # Check if the part requires unloading and then hot sealing
-                if part.sealing == "Hot Seal":
-                    operations.append(ComponentJob.add_operation("Unloading", "1", loads_required))
-                    unloading_done = True
-                    operations.append(ComponentJob.add_operation("Hot Seal", 30, loads_required))
-                    operations.append(ComponentJob.add_operation("Off-line rinse", 1, loads_required))
-                else:
-                    # Seal and rinse without unloading
-                    operations.append(ComponentJob.add_operation(part.sealing, 30 if "30 min" in part.sealing or "Boiling" in part.sealing else 15, loads_required))
-                    operations.append(ComponentJob.add_operation("Water Rinse (8)", 1, loads_required))
-
-            # Final unloading (only if it hasn’t already happened)
-            if not unloading_done:
-                operations.append(ComponentJob.add_operation("Unloading", 1, loads_required))
-
-            # Final post-processing steps
-            operations.append(ComponentJob.add_operation("Drying", 15, loads_required))
-            operations.append(ComponentJob.add_operation("Unjigging", math.ceil(2.5 * required_jigs / loads_required), loads_required))
-            operations.append(ComponentJob.add_operation("Packing", packing_duration, loads_required))
-
-
+            plan = ComponentJob.plan_loads(part, jig, order_line.quantity)
 
             # Create and store component job
             component_job = ComponentJob(
@@ -587,14 +1338,7 @@ class ComponentJob(db.Model):
                 order_line_id=order_line.OrderLine_id,
                 customer_name=order.customer.customer_name,
                 customer_id=order.customer.customer_id,
-                required_jigs=required_jigs,
-                buzzbars_required=buzzbars_required,
-                loads_required=loads_required,
-                units_per_load=units_per_load,  
-                quantity_of_final_load=quantity_of_final_load, 
-                operations=operations,
-                load_independent_operations=load_independent_operations, 
-                jigging_duration_per_load=jigging_duration_per_load
+                **plan
             )
 
             db.session.add(component_job)
@@ -605,3 +1349,15 @@ class ComponentJob(db.Model):
         return component_jobs
 
 
+class JobTraveller(db.Model):
+    """
+    A component job's rendered traveller (operation sheets), rendered as of `part_revision` of its
+    part. Rows for jobs whose order line, order or jig changed are deleted (see travellers.py).
+    """
+    __tablename__ = 'job_travellers'
+
+    component_job_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    part_revision = db.Column(db.Integer, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    pdf = db.Column(db.LargeBinary, nullable=True)  # Rendered on first PDF request
+    rendered_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
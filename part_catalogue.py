@@ -0,0 +1,102 @@
+import os
+import bisect
+import threading
+from collections import OrderedDict
+from models import logger, TableRevision
+from shared_cache import cached_customer_parts
+
+# Customers whose part lists are kept in each worker; least recently used ones are dropped first
+CATALOGUE_CACHE_CUSTOMERS = int(os.getenv('CATALOGUE_CACHE_CUSTOMERS', 256))
+
+TYPEAHEAD_DEFAULT_LIMIT = 20
+TYPEAHEAD_MAX_LIMIT = 100
+
+
+class CustomerCatalogue:
+    """One customer's parts, sorted by lower-cased part number for prefix lookups with bisect."""
+
+    def __init__(self, revision, parts):
+        self.revision = revision
+        self.parts = sorted(parts, key=lambda part: part[0].lower())
+        self.keys = [part_number.lower() for part_number, _ in self.parts]
+        self.descriptions = [(description or "").lower() for _, description in self.parts]
+
+    def as_dicts(self):
+        return [{"part_number": number, "part_description": description} for number, description in self.parts]
+
+    def typeahead(self, prefix, limit):
+        """
+        Parts whose number starts with `prefix`, in part number order, then parts whose description
+        (or any word of it) starts with it. An empty prefix lists the first `limit` parts.
+        """
+        prefix = prefix.strip().lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        matches = []
+        for i in range(start, len(self.keys)):
+            if len(matches) >= limit or not self.keys[i].startswith(prefix):
+                break
+            matches.append(i)
+
+        if prefix and len(matches) < limit:
+            seen = set(matches)
+            for i, description in enumerate(self.descriptions):
+                if len(matches) >= limit:
+                    break
+                if i not in seen and (description.startswith(prefix) or f" {prefix}" in description):
+                    matches.append(i)
+
+        return [
+            {"part_number": self.parts[i][0], "part_description": self.parts[i][1]}
+            for i in matches
+        ]
+
+
+class PartCatalogueCache:
+    """
+    Worker-local cache of each customer's part list. Entries are tagged with the 'parts' table
+    revision they were loaded at and reloaded once any worker has written a Part since.
+    """
+
+    def __init__(self, max_customers=CATALOGUE_CACHE_CUSTOMERS):
+        self.max_customers = max_customers
+        self._lock = threading.Lock()
+        self._catalogues = OrderedDict()
+
+    def get(self, customer_id, revision=None):
+        """The customer's catalogue, reloaded if stale. Pass `revision` if it was already read this request."""
+        if revision is None:
+            revision = TableRevision.current('parts')
+
+        catalogue = self.cached(customer_id, revision)
+        if catalogue is not None:
+            return catalogue
+
+        parts = cached_customer_parts(customer_id, revision)  # Another worker has usually loaded it already
+        return self.store(customer_id, CustomerCatalogue(revision, [tuple(part) for part in parts]))
+
+    def cached(self, customer_id, revision):
+        """The customer's catalogue if it is held at `revision`, else None."""
+        with self._lock:
+            catalogue = self._catalogues.get(customer_id)
+            if catalogue is not None and catalogue.revision == revision:
+                self._catalogues.move_to_end(customer_id)
+                return catalogue
+        return None
+
+    def store(self, customer_id, catalogue):
+        """Keeps a freshly loaded catalogue (see asgi.py, which loads them without the Flask session)."""
+        logger.debug(f"Loaded part catalogue for customer {customer_id} at revision {catalogue.revision}: "
+                     f"{len(catalogue.parts)} parts")
+        with self._lock:
+            self._catalogues[customer_id] = catalogue
+            self._catalogues.move_to_end(customer_id)
+            while len(self._catalogues) > self.max_customers:
+                self._catalogues.popitem(last=False)
+        return catalogue
+
+    def clear(self):
+        with self._lock:
+            self._catalogues.clear()
+
+
+PART_CATALOGUE = PartCatalogueCache()
@@ -0,0 +1,99 @@
+import os
+import random
+import tempfile
+import cProfile
+from datetime import datetime
+from flask import g, request
+from models import logger
+
+# Where .prof files are written. They are standard pstats dumps: open with `python -m pstats`,
+# snakeviz, or turn into a flame graph with flameprof / gprof2dot.
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'anodising_profiles'))
+
+# Fraction (0.0 - 1.0) of ordinary requests profiled continuously; 0 disables sampling
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+
+# Oldest profiles are pruned beyond this many files so sampling cannot fill the disk
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 500))
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_FLAG = '_profile'
+
+# Endpoints never worth profiling
+PROFILE_SKIP_ENDPOINTS = {'static', 'favicon', 'metrics'}
+
+
+def profile_requested():
+    """True if the request explicitly asks to be profiled (header or query flag)."""
+    return request.headers.get(PROFILE_HEADER) == '1' or request.args.get(PROFILE_QUERY_FLAG) == '1'
+
+
+def should_profile(is_admin):
+    """
+    Decides whether to profile this request: on demand for admins, otherwise by random sampling.
+    `is_admin` is a callable so the admin check only runs when profiling was asked for.
+    Returns the reason ('on_demand' or 'sampled'), or None to skip profiling.
+    """
+    if request.endpoint in PROFILE_SKIP_ENDPOINTS:
+        return None
+    if profile_requested() and is_admin():
+        return 'on_demand'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def start_profiling(reason):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:  # Another profiler is already active on this thread
+        logger.warning(f"Could not start request profiler: {e}")
+        return
+    g.profiler = profiler
+    g.profile_reason = reason
+
+
+def finish_profiling():
+    """
+    Stops the profiler for this request (if any) and writes the .prof file.
+    Returns (filename, reason), or (None, None) if the request was not profiled.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None, None
+    profiler.disable()
+
+    reason = g.pop('profile_reason', 'sampled')
+    endpoint = request.endpoint or 'unmatched'
+    timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    filename = f"{timestamp}_{endpoint}_{reason}_{os.getpid()}.prof"
+
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+        prune_profiles()
+    except OSError as e:
+        logger.error(f"Failed to write request profile {filename}: {e}")
+        return None, None
+
+    logger.info(f"Request profile written: {filename}")
+    return filename, reason
+
+
+def prune_profiles(max_files=PROFILE_MAX_FILES):
+    """Deletes the oldest profiles so that at most `max_files` remain."""
+    profiles = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof'))
+    for name in profiles[:max(len(profiles) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except OSError:
+            pass  # Another worker got there first
+
+
+def list_profiles():
+    """Newest-first list of profiles with their sizes."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = sorted((name for name in os.listdir(PROFILE_DIR) if name.endswith('.prof')), reverse=True)
+    return [{"name": name, "bytes": os.path.getsize(os.path.join(PROFILE_DIR, name))} for name in profiles]
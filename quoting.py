@@ -0,0 +1,140 @@
+import os
+from types import SimpleNamespace
+from models import logger, Part, ComponentJob
+from shared_cache import cached_jigs
+
+# Costing rates (GBP). Minutes are line time per load, so multi-load lines pay for every load.
+QUOTE_RATES = {
+    "line_per_minute": float(os.getenv('QUOTE_LINE_RATE_PER_MINUTE', 1.00)),
+    "anodising_per_minute": float(os.getenv('QUOTE_ANODISING_RATE_PER_MINUTE', 1.50)),
+    "dye_seal_per_minute": float(os.getenv('QUOTE_DYE_SEAL_RATE_PER_MINUTE', 0.80)),
+    "finishing_per_minute": float(os.getenv('QUOTE_FINISHING_RATE_PER_MINUTE', 0.75)),  # Polishing, blasting
+    "per_jig": float(os.getenv('QUOTE_RATE_PER_JIG', 0.50)),
+    "per_buzzbar": float(os.getenv('QUOTE_RATE_PER_BUZZBAR', 2.00)),
+    "minimum_lot": float(os.getenv('QUOTE_MINIMUM_LOT_CHARGE', 50.00)),
+}
+
+VAT_RATE = 0.2  # As charged on order lines
+
+QUOTE_MAX_LINES = int(os.getenv('QUOTE_MAX_LINES', 1000))
+
+# Parts fetched per query (SQL Server allows 2100 parameters)
+PART_CHUNK_SIZE = 1000
+
+
+def operation_kind(operation_name, dye_name):
+    name = (operation_name or "").lower()
+    if name.startswith("anodising") or name.startswith("flash anodise"):
+        return "anodising"
+    if name == dye_name or "seal" in name:
+        return "dye_seal"
+    return "line"
+
+
+def price_plan(part, quantity, plan, rates=QUOTE_RATES):
+    """Cost breakdown of one load plan from ComponentJob.plan_loads."""
+    loads = plan["loads_required"]
+    dye_name = part.dye.lower() if part.dye else None
+
+    line_minutes = {"line": 0.0, "anodising": 0.0, "dye_seal": 0.0}
+    for operation in plan["operations"]:
+        line_minutes[operation_kind(operation.name, dye_name)] += operation.minutes * loads
+    finishing_minutes = sum((operation.minutes for operation in plan["load_independent_operations"]), 0.0)
+
+    costs = {
+        "line": line_minutes["line"] * rates["line_per_minute"],
+        "anodising": line_minutes["anodising"] * rates["anodising_per_minute"],
+        "dye_seal": line_minutes["dye_seal"] * rates["dye_seal_per_minute"],
+        "finishing": finishing_minutes * rates["finishing_per_minute"],
+        "jigs": plan["required_jigs"] * rates["per_jig"],
+        "buzzbars": plan["buzzbars_required"] * rates["per_buzzbar"],
+    }
+    net_price = round(max(sum(costs.values()), rates["minimum_lot"]), 2)
+    vat = round(net_price * VAT_RATE, 2)
+
+    return {
+        "part_number": part.part_number,
+        "quantity": quantity,
+        "loads_required": loads,
+        "required_jigs": plan["required_jigs"],
+        "buzzbars_required": round(plan["buzzbars_required"], 2),
+        "units_per_load": plan["units_per_load"],
+        "minutes": {**{kind: round(value, 2) for kind, value in line_minutes.items()},
+                    "finishing": round(finishing_minutes, 2)},
+        "costs": {kind: round(value, 2) for kind, value in costs.items()},
+        "net_price": net_price,
+        "unit_price": round(net_price / quantity, 4),
+        "vat": vat,
+        "total_price": round(net_price + vat, 2),
+    }
+
+
+def fetch_parts(part_numbers, customer_id=None):
+    part_numbers = list(part_numbers)
+    parts = {}
+    for i in range(0, len(part_numbers), PART_CHUNK_SIZE):
+        query = Part.query.filter(Part.part_number.in_(part_numbers[i:i + PART_CHUNK_SIZE]))
+        if customer_id is not None:
+            query = query.filter(Part.customer_id == customer_id)
+        parts.update((part.part_number, part) for part in query)
+    return parts
+
+
+def quote_lines(lines, customer_id=None):
+    """
+    Quotes many (part_number, quantity) lines at once: one query for the parts, jigs from the
+    shared cache, then the same load planning as generate_component_jobs per line. Nothing is
+    written. Lines that cannot be planned carry an "error" instead of prices.
+    """
+    jigs = {(jig["jig_type"] or "").strip(): SimpleNamespace(**jig) for jig in cached_jigs()}
+    parts = fetch_parts({line["part_number"] for line in lines}, customer_id)
+
+    quoted = []
+    for line in lines:
+        part_number, quantity = line["part_number"], line["quantity"]
+        part = parts.get(part_number)
+        if part is None:
+            quoted.append({"part_number": part_number, "quantity": quantity, "error": "Part not found"})
+            continue
+        jig = jigs.get((part.jig_type or "").strip())
+        if jig is None:
+            quoted.append({"part_number": part_number, "quantity": quantity,
+                           "error": f"Jig type '{part.jig_type}' not found"})
+            continue
+        try:
+            quoted.append(price_plan(part, quantity, ComponentJob.plan_loads(part, jig, quantity)))
+        except Exception as e:  # Incomplete part specifications (e.g. no sealing) fail only their own line
+            logger.warning(f"Could not quote part {part_number} x {quantity}: {e}")
+            quoted.append({"part_number": part_number, "quantity": quantity, "error": f"Cannot plan part: {e}"})
+
+    priced = [line for line in quoted if "error" not in line]
+    net = round(sum(line["net_price"] for line in priced), 2)
+    vat = round(sum(line["vat"] for line in priced), 2)
+    return {
+        "lines": quoted,
+        "totals": {"net_price": net, "vat": vat, "total_price": round(net + vat, 2),
+                   "loads": sum(line["loads_required"] for line in priced)},
+        "rates": QUOTE_RATES,
+    }
+
+
+def parse_quote_request(data):
+    """Validates a quote request body; returns (customer_id, lines) or raises ValueError."""
+    if not isinstance(data, dict) or not isinstance(data.get("lines"), list) or not data["lines"]:
+        raise ValueError("Expected a JSON object with a non-empty 'lines' list")
+    if len(data["lines"]) > QUOTE_MAX_LINES:
+        raise ValueError(f"At most {QUOTE_MAX_LINES} lines per quote")
+
+    lines = []
+    for i, line in enumerate(data["lines"]):
+        try:
+            part_number = str(line["part_number"]).strip()
+            quantity = int(line["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Line {i + 1}: expected 'part_number' and an integer 'quantity'")
+        if not part_number or quantity < 1:
+            raise ValueError(f"Line {i + 1}: part_number is required and quantity must be at least 1")
+        lines.append({"part_number": part_number, "quantity": quantity})
+
+    customer_id = data.get("customer_id")
+    return (int(customer_id) if customer_id not in (None, "") else None), lines
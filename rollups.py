@@ -0,0 +1,218 @@
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from models import (db, logger, GanttJob, GanttJobArchive, Order, DailyTankRollup, WeeklyLeadTimeRollup,
+                    RollupWatermark, RollupStaleDay, days_on_line)
+
+WATERMARK_NAME = 'production'
+
+# Every process step on the line, as the prefix of its <step>_start / <step>_end columns
+PROCESS_STEPS = [column.name[:-len('_start')] for column in GanttJob.__table__.columns
+                 if column.name.endswith('_start')]
+
+# Step whose end marks a load as finished; its loads per day are the line's throughput
+FINISHING_STEP = 'packing'
+
+# Orders, days or stale-day rows per IN (...) list (SQL Server allows 2100 parameters)
+ORDER_CHUNK_SIZE = 1000
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def split_by_day(start, end):
+    """Yields (day, minutes) for the part of [start, end) that falls on each calendar day."""
+    while start < end:
+        next_midnight = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+        chunk_end = min(end, next_midnight)
+        yield start.date(), (chunk_end - start).total_seconds() / 60
+        start = chunk_end
+
+
+def finished_loads(through, since=None):
+    """Loads packed in [since, through], live and archived, each once."""
+    loads = {}
+    for table in (GanttJobArchive.__table__, GanttJob.__table__):  # Live rows win if a load is in both
+        columns = [table.c.gantt_job_id, table.c.order_id, table.c.customer_id] + [
+            table.c[f'{step}_{edge}'] for step in PROCESS_STEPS for edge in ('start', 'end')
+        ]
+        query = db.select(*columns).where(table.c.packing_end <= through)
+        if since is not None:
+            query = query.where(table.c.packing_end >= since)
+        for row in db.session.execute(query.execution_options(yield_per=2000)).mappings():
+            loads[row['gantt_job_id']] = row
+    return list(loads.values())
+
+
+def chunks(values):
+    values = list(values)
+    for i in range(0, len(values), ORDER_CHUNK_SIZE):
+        yield values[i:i + ORDER_CHUNK_SIZE]
+
+
+def arrival_dates(order_ids):
+    arrivals = {}
+    for chunk in chunks(order_ids):
+        arrivals.update(db.session.query(Order.order_id, Order.date_of_arrival).filter(Order.order_id.in_(chunk)))
+    return arrivals
+
+
+def aggregate(loads):
+    """Per (day, tank) [loads, busy_minutes] and per (customer_id, week_start) [loads, total, max] lead minutes."""
+    tanks = defaultdict(lambda: [0, 0.0])
+    lead_times = defaultdict(lambda: [0, 0.0, 0.0])
+    arrivals = arrival_dates({load['order_id'] for load in loads})
+
+    for load in loads:
+        for step in PROCESS_STEPS:
+            start, end = load[f'{step}_start'], load[f'{step}_end']
+            if start is None or end is None:
+                continue
+            tanks[(start.date(), step)][0] += 1
+            for day, minutes in split_by_day(start, end):
+                tanks[(day, step)][1] += minutes
+
+        arrival = arrivals.get(load['order_id'])
+        if arrival is not None:
+            packed = load[f'{FINISHING_STEP}_end']
+            lead_minutes = max(0.0, (packed - datetime.combine(arrival, datetime.min.time())).total_seconds() / 60)
+            totals = lead_times[(load['customer_id'], week_start(packed.date()))]
+            totals[0] += 1
+            totals[1] += lead_minutes
+            totals[2] = max(totals[2], lead_minutes)
+    return tanks, lead_times
+
+
+def replace_rollups(tanks, lead_times, days=None, weeks=None):
+    """
+    Replaces the rollups of `days` and `weeks` (every day and week if None) with those aggregated
+    from all the finished loads on them.
+    """
+    if days is None:
+        db.session.query(DailyTankRollup).delete(synchronize_session=False)
+        db.session.query(WeeklyLeadTimeRollup).delete(synchronize_session=False)
+    else:
+        for chunk in chunks(days):
+            db.session.query(DailyTankRollup).filter(DailyTankRollup.day.in_(chunk)).delete(synchronize_session=False)
+        for chunk in chunks(weeks):
+            db.session.query(WeeklyLeadTimeRollup).filter(WeeklyLeadTimeRollup.week_start.in_(chunk)) \
+                .delete(synchronize_session=False)
+
+    db.session.add_all(
+        DailyTankRollup(day=day, tank=tank, loads=loads, busy_minutes=minutes)
+        for (day, tank), (loads, minutes) in tanks.items() if days is None or day in days
+    )
+    db.session.add_all(
+        WeeklyLeadTimeRollup(customer_id=customer_id, week_start=week, loads=loads,
+                             total_lead_minutes=total, max_lead_minutes=longest)
+        for (customer_id, week), (loads, total, longest) in lead_times.items() if weeks is None or week in weeks
+    )
+
+
+def refresh_rollups(now=None, rebuild=False):
+    """
+    Brings the daily tank and weekly lead-time rollups up to date. Recomputes, from every finished
+    load, the days of loads packed since the last refresh and the days marked stale in
+    rollup_stale_days when a load on them was created, moved or deleted (and the weeks holding
+    those days). Runs in one transaction with the watermark and the stale-day rows it consumed, so
+    a failed or repeated run leaves the rollups as they were. `rebuild` recomputes everything from
+    gantt_jobs and gantt_jobs_archive (e.g. after correcting orders' arrival dates).
+    `now` is local time, like the Gantt columns. Returns {"loads", "days", "finished_through", "duration_seconds"}.
+    """
+    started = time.perf_counter()
+    through = now or datetime.now()
+    try:
+        # Locks the watermark row (UPDLOCK on SQL Server) so concurrent refreshes run one at a time
+        watermark = db.session.query(RollupWatermark).filter_by(name=WATERMARK_NAME).with_for_update().first()
+        if watermark is None:
+            watermark = RollupWatermark(name=WATERMARK_NAME, finished_through=through)
+            db.session.add(watermark)
+            rebuild = True
+
+        # Only the rows read here are consumed: days marked by transactions committing meanwhile stay queued
+        stale = db.session.query(RollupStaleDay.id, RollupStaleDay.day).all()
+
+        if rebuild:
+            loads = finished_loads(through)
+            days = weeks = None
+            replace_rollups(*aggregate(loads))
+        else:
+            newly_finished = finished_loads(through, since=watermark.finished_through) \
+                if watermark.finished_through < through else []
+            days = {day for _, day in stale if day <= through.date()}
+            for load in newly_finished:
+                days.update(days_on_line(load))
+            weeks = {week_start(day) for day in days}
+
+            loads = []
+            if days:
+                # Every finished load on one of the days, or packed in one of the weeks
+                for load in finished_loads(through, since=datetime.combine(min(weeks), datetime.min.time())):
+                    if week_start(load[f'{FINISHING_STEP}_end'].date()) in weeks or days.intersection(days_on_line(load)):
+                        loads.append(load)
+                replace_rollups(*aggregate(loads), days=days, weeks=weeks)
+
+        for chunk in chunks(stale_id for stale_id, _ in stale):
+            db.session.query(RollupStaleDay).filter(RollupStaleDay.id.in_(chunk)).delete(synchronize_session=False)
+        watermark.finished_through = through if rebuild else max(watermark.finished_through, through)
+        watermark.updated_at = datetime.utcnow()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception("Refreshing production rollups failed; nothing was recorded.")
+        raise
+
+    report = {
+        "loads": len(loads),
+        "days": len(days) if days is not None else None,
+        "finished_through": watermark.finished_through.isoformat(timespec='seconds'),
+        "duration_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Rolled up {report['loads']} finished loads through {report['finished_through']} "
+                f"({report['duration_seconds']}s).")
+    return report
+
+
+def production_report(days=30, weeks=12, today=None):
+    """
+    Throughput and tank utilisation for the last `days` days and lead times for the last `weeks`
+    weeks, read from the rollup tables alone (bounded index range scans, independent of history).
+    """
+    today = today or datetime.now().date()
+    first_day = today - timedelta(days=days - 1)
+    first_week = week_start(today) - timedelta(weeks=weeks - 1)
+
+    by_day = defaultdict(dict)
+    for row in DailyTankRollup.query.filter(DailyTankRollup.day.between(first_day, today)):
+        by_day[row.day][row.tank] = {
+            "loads": row.loads,
+            "busy_minutes": round(row.busy_minutes, 1),
+            "utilisation": round(row.busy_minutes / (24 * 60), 4),
+        }
+
+    lead_times = [
+        {
+            "customer_id": row.customer_id,
+            "week_start": row.week_start.isoformat(),
+            "loads": row.loads,
+            "mean_lead_hours": round(row.total_lead_minutes / row.loads / 60, 1) if row.loads else None,
+            "max_lead_hours": round(row.max_lead_minutes / 60, 1),
+        }
+        for row in WeeklyLeadTimeRollup.query.filter(WeeklyLeadTimeRollup.week_start.between(first_week, today))
+        .order_by(WeeklyLeadTimeRollup.week_start, WeeklyLeadTimeRollup.customer_id)
+    ]
+
+    watermark = db.session.get(RollupWatermark, WATERMARK_NAME)
+    return {
+        "finished_through": watermark.finished_through.isoformat(timespec='seconds') if watermark else None,
+        "days": [
+            {
+                "day": day.isoformat(),
+                "loads_finished": tanks.get(FINISHING_STEP, {}).get("loads", 0),
+                "tanks": tanks,
+            }
+            for day, tanks in sorted(by_day.items())
+        ],
+        "lead_times": lead_times,
+    }
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import Counter
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, logger, Customer, Jig, Part
+from metrics import SHARED_CACHE_REQUESTS
+
+# One SQLite file per host, shared by every gunicorn worker on it. SQLite (WAL mode) needs no
+# extra process on App Service and reads from it are served from the OS page cache.
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'anodising_cache.sqlite'))
+
+# Upper bound on staleness for writes this host never sees (e.g. made by another instance)
+SHARED_CACHE_TTL = float(os.getenv('SHARED_CACHE_TTL', 300))
+
+SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', '1') != '0'
+
+# Tables the cached values below are read from; commits that touch none of them leave the cache alone
+CACHED_TABLES = {'customers', 'jigs_inventory', 'parts'}
+
+
+class SharedCache:
+    """
+    Read-through cache of JSON values in a host-local SQLite file.
+
+    Every entry is filed under the generation of each table it was read from. Invalidating a table
+    bumps its generation, which makes all entries built from it unreachable at once. A worker that
+    was loading from the database while the invalidation happened stores its result under the old
+    generation, where nobody looks for it.
+    """
+
+    def __init__(self, path=SHARED_CACHE_PATH, ttl=SHARED_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.stats = Counter()
+
+    def _connection(self):
+        # Connections must not cross a fork, so each process (and thread) opens its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, tables TEXT NOT NULL, "
+                "value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS generations (table_name TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _count(self, name, result):
+        SHARED_CACHE_REQUESTS.labels(cache=name, result=result).inc()
+        with self._stats_lock:
+            self.stats[f"{name}:{result}"] += 1
+
+    def _versioned_key(self, connection, name, tables):
+        generations = dict(connection.execute(
+            f"SELECT table_name, generation FROM generations WHERE table_name IN ({','.join('?' * len(tables))})",
+            tables,
+        ).fetchall())
+        return name + "@" + ",".join(f"{table}:{generations.get(table, 0)}" for table in sorted(tables))
+
+    def get_or_load(self, name, key, tables, loader):
+        """
+        The cached value for `key`, or `loader()`'s result, which is then stored. `tables` are the
+        tables the value is read from; `name` groups keys for the hit/miss counters.
+        """
+        if not SHARED_CACHE_ENABLED:
+            return loader()
+        if session_has_uncommitted_changes(tables):
+            return loader()  # What this session sees may yet be rolled back, so keep it out of the cache
+
+        try:
+            connection = self._connection()
+            versioned_key = self._versioned_key(connection, key, tables)
+            row = connection.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (versioned_key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache unavailable, reading {key} from the database: {e}")
+            self._count(name, 'error')
+            return loader()
+
+        if row is not None:
+            self._count(name, 'hit')
+            return json.loads(row[0])
+
+        self._count(name, 'miss')
+        value = loader()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, tables, value, expires_at) VALUES (?, ?, ?, ?)",
+                (versioned_key, ",".join(sorted(tables)), json.dumps(value), time.time() + self.ttl),
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store {key} in the shared cache: {e}")
+        return value
+
+    def invalidate(self, tables):
+        """Makes every entry read from any of `tables` unreachable, for all workers on this host."""
+        if not SHARED_CACHE_ENABLED or not tables:
+            return
+        try:
+            connection = self._connection()
+            with connection:
+                for table in tables:
+                    connection.execute(
+                        "INSERT INTO generations (table_name, generation) VALUES (?, 1) "
+                        "ON CONFLICT(table_name) DO UPDATE SET generation = generation + 1",
+                        (table,),
+                    )
+                # Drop the orphaned and expired rows so the file stays small
+                connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+                for table in tables:
+                    connection.execute("DELETE FROM entries WHERE ',' || tables || ',' LIKE ?", (f"%,{table},%",))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to invalidate shared cache for {sorted(tables)}: {e}")
+
+    def clear(self):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM entries")
+            connection.execute("UPDATE generations SET generation = generation + 1")
+
+    def summary(self):
+        connection = self._connection()
+        entries = connection.execute("SELECT count(*) FROM entries WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {"path": self.path, "ttl_seconds": self.ttl, "live_entries": entries, "this_worker": stats}
+
+
+SHARED_CACHE = SharedCache()
+
+
+def session_has_uncommitted_changes(tables):
+    changed = db.session.info.get('changed_tables', ())
+    return any(table in changed for table in tables) or any(
+        getattr(obj, '__tablename__', None) in tables for obj in db.session.new | db.session.dirty | db.session.deleted
+    )
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed_tables(session):
+    changed = session.info.pop('changed_tables', set()) & CACHED_TABLES
+    if changed:
+        SHARED_CACHE.invalidate(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_rolled_back_tables(session):
+    session.info.pop('changed_tables', None)
+
+
+# Reference data read on nearly every page
+
+def cached_customers():
+    """[{customer_id, customer_name}] for every customer."""
+    return SHARED_CACHE.get_or_load('customers', 'customers:all', ['customers'], lambda: [
+        {"customer_id": customer_id, "customer_name": customer_name}
+        for customer_id, customer_name in
+        db.session.query(Customer.customer_id, Customer.customer_name).order_by(Customer.customer_id)
+    ])
+
+
+def cached_jigs():
+    """Every jig as a dict of its columns (templates read them like Jig attributes)."""
+    columns = [column.name for column in Jig.__table__.columns]
+    return SHARED_CACHE.get_or_load('jigs', 'jigs:all', ['jigs_inventory'], lambda: [
+        dict(zip(columns, row)) for row in db.session.execute(db.select(Jig.__table__).order_by(Jig.jig_id))
+    ])
+
+
+def cached_customer_parts(customer_id, revision):
+    """
+    [[part_number, part_description]] for one customer, as of the 'parts' table revision the
+    caller has just read (see PartCatalogueCache), so the two can never disagree.
+    """
+    return SHARED_CACHE.get_or_load('parts', f'parts:customer:{customer_id}:{revision}', ['parts'], lambda: [
+        [part_number, part_description] for part_number, part_description in
+        db.session.query(Part.part_number, Part.part_description).filter(Part.customer_id == customer_id)
+    ])
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import threading
+from collections import Counter
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import logger
+
+# Thresholds for flagging a request as "too chatty" with the database
+SQL_QUERY_COUNT_THRESHOLD = int(os.getenv('SQL_QUERY_COUNT_THRESHOLD', 25))
+SQL_TIME_THRESHOLD_MS = float(os.getenv('SQL_TIME_THRESHOLD_MS', 500))
+SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', 5))
+
+# How many repeated statement shapes to keep per endpoint in the aggregates
+SQL_TOP_SHAPES = 5
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def statement_shape(statement):
+    """
+    Reduces a SQL statement to its "shape" so that the same query issued with
+    different parameters (the classic N+1 pattern) counts as one statement.
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)  # Collapse IN (?, ?, ?) lists
+    return " ".join(shape.split())
+
+
+class RequestSqlStats:
+    """Query count, DB time and statement shapes recorded for a single request."""
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed):
+        self.query_count += 1
+        self.total_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold=SQL_REPEAT_THRESHOLD):
+        """Statement shapes issued at least `threshold` times (likely N+1 loops)."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def exceeds_thresholds(self):
+        return (
+            self.query_count > SQL_QUERY_COUNT_THRESHOLD
+            or self.total_time * 1000 > SQL_TIME_THRESHOLD_MS
+            or bool(self.repeated_shapes())
+        )
+
+
+class SqlStatsRegistry:
+    """Per-endpoint aggregates of the per-request SQL stats, kept in the worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, endpoint, stats):
+        repeated = stats.repeated_shapes()
+        with self._lock:
+            entry = self._endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "queries": 0,
+                "db_time": 0.0,
+                "max_queries": 0,
+                "max_db_time": 0.0,
+                "flagged_requests": 0,
+                "repeated_shapes": Counter(),
+            })
+            entry["requests"] += 1
+            entry["queries"] += stats.query_count
+            entry["db_time"] += stats.total_time
+            entry["max_queries"] = max(entry["max_queries"], stats.query_count)
+            entry["max_db_time"] = max(entry["max_db_time"], stats.total_time)
+            if stats.exceeds_thresholds():
+                entry["flagged_requests"] += 1
+            for shape, count in repeated:
+                entry["repeated_shapes"][shape] += count
+
+    def snapshot(self):
+        """Returns the aggregates as plain dicts, slowest endpoints (by total DB time) first."""
+        with self._lock:
+            rows = []
+            for endpoint, entry in self._endpoints.items():
+                requests = entry["requests"] or 1
+                rows.append({
+                    "endpoint": endpoint,
+                    "requests": entry["requests"],
+                    "queries": entry["queries"],
+                    "avg_queries": round(entry["queries"] / requests, 2),
+                    "max_queries": entry["max_queries"],
+                    "db_time_ms": round(entry["db_time"] * 1000, 2),
+                    "avg_db_time_ms": round(entry["db_time"] * 1000 / requests, 2),
+                    "max_db_time_ms": round(entry["max_db_time"] * 1000, 2),
+                    "flagged_requests": entry["flagged_requests"],
+                    "repeated_shapes": [
+                        {"statement": shape, "count": count}
+                        for shape, count in entry["repeated_shapes"].most_common(SQL_TOP_SHAPES)
+                    ],
+                })
+        return sorted(rows, key=lambda row: row["db_time_ms"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+SQL_STATS = SqlStatsRegistry()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "sql_stats" in g:
+        conn.info.setdefault("query_start_time", {})[id(cursor)] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_start_time", {}).pop(id(cursor), None)
+    if started is None or not has_request_context() or "sql_stats" not in g:
+        return
+    g.sql_stats.record(statement, time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute: count it here and drop its start time
+    conn, context = exception_context.connection, exception_context.execution_context
+    if conn is None or context is None:
+        return
+    cursor = context.cursor
+    started = conn.info.get("query_start_time", {}).pop(id(cursor), None)
+    if started is None or not exception_context.statement or not has_request_context() or "sql_stats" not in g:
+        return
+    g.sql_stats.record(exception_context.statement, time.perf_counter() - started)
+
+
+def start_request_stats():
+    """Begins recording SQL for the current request."""
+    g.sql_stats = RequestSqlStats()
+
+
+def finish_request_stats(endpoint):
+    """Stops recording, warns about chatty requests and folds the stats into the aggregates."""
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return None
+
+    endpoint = endpoint or "unknown"
+    if stats.exceeds_thresholds():
+        repeated = "; ".join(f"{count}x {shape[:120]}" for shape, count in stats.repeated_shapes()[:3])
+        logger.warning(
+            f"⚠️ SQL thresholds exceeded on '{endpoint}': {stats.query_count} queries, "
+            f"{stats.total_time * 1000:.1f} ms in DB. Repeated statements: {repeated or 'none'}"
+        )
+
+    SQL_STATS.add(endpoint, stats)
+    return stats
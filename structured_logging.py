@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request
+from metrics import LOG_RECORDS_DROPPED
+
+# 'json' (one object per line, for Azure Monitor / Log Analytics) or 'text' for local runs
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Records waiting for the writer thread. When it is full (the sink has stalled) new records are
+# dropped and counted rather than blocking the request that logged them.
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+# INFO and DEBUG records let through per call site (file and line) per window; warnings and
+# errors are never limited. 0 turns the limit off.
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', 20))
+LOG_RATE_WINDOW = float(os.getenv('LOG_RATE_WINDOW', 60))
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, process, request and `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class CallSiteRateLimit(logging.Filter):
+    """
+    Lets through at most `limit` INFO/DEBUG records from each call site per `window` seconds.
+    The first record let through in a new window carries how many the previous one dropped.
+    """
+
+    def __init__(self, limit=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._sites = {}  # (pathname, lineno) -> [window start, records let through, records dropped]
+
+    def filter(self, record):
+        if not self.limit or record.levelno >= logging.WARNING:
+            return True
+        site_key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(site_key)
+            if site is None or record.created - site[0] >= self.window:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                self._sites[site_key] = [record.created, 1, 0]
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+        LOG_RECORDS_DROPPED.labels(reason='rate_limited').inc()
+        return False
+
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Queues records for the listener thread. Only what must be read on the logging thread is done
+    here (the message and the current request); formatting and I/O happen on the listener.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if has_request_context() and not hasattr(record, 'path'):
+            record.method = request.method
+            record.path = request.path
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason='queue_full').inc()
+
+
+def output_handler(stream=None, log_format=LOG_FORMAT):
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def start_logging(log_queue, stream=None, level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """
+    Replaces the root logger's handlers with one that puts records on `log_queue`, and starts a
+    listener thread writing them to `stream` (stderr). Returns the listener: call its stop() at
+    exit to write out whatever is still queued.
+    """
+    handler = RequestQueueHandler(log_queue)
+    handler.addFilter(CallSiteRateLimit())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, output_handler(stream, log_format), respect_handler_level=True)
+    listener.start()
+    return listener
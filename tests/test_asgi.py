@@ -0,0 +1,164 @@
+"""
+The async read tier (asgi.py) against the Flask views it stands in for, over a seeded SQLite
+database read through aiosqlite.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import json
+import asyncio
+import importlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCALE = 200
+
+
+@pytest.fixture(scope='module')
+def tier(tmp_path_factory):
+    """(flask_app, asgi module, a customer_id with parts) over a freshly generated database."""
+    data = tmp_path_factory.mktemp('asgi')
+    # azureapp reads these at import time
+    os.environ['DATABASE_URL'] = f"sqlite:///{data / 'asgi.db'}"
+    os.environ['SHARED_CACHE_PATH'] = str(data / 'cache.sqlite')
+    os.environ['ASYNC_READS'] = '1'
+
+    azureapp = importlib.import_module('azureapp')
+    from benchmarks.generate_data import generate
+    from models import db, Part
+    generate(azureapp.app, db, SCALE)
+    asgi = importlib.import_module('asgi')
+
+    with azureapp.app.app_context():
+        customer_id = db.session.query(Part.customer_id).first()[0]
+    return azureapp.app, asgi, customer_id
+
+
+async def asgi_request(app, method, path, headers=(), body=b''):
+    """(status, {header: value}, body) of one request to the ASGI `app`."""
+    path, _, query = path.partition('?')
+    if body:
+        headers = [*headers, ('Content-Length', str(len(body)))]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(), 'server': ('testserver', 80), 'client': ('127.0.0.1', 12345),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = next(message for message in sent if message['type'] == 'http.response.start')
+    response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+    content = b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+    return start['status'], response_headers, content
+
+
+def run(asgi, scenario):
+    """Runs `scenario(app)` on a new AsyncReads, disposing its engine on the same event loop."""
+    from models import db
+
+    with asgi.flask_app.app_context():
+        app = asgi.AsyncReads(asgi.WsgiBridge(asgi.flask_app), asgi.async_database_url(db.engine.url))
+
+    async def main():
+        try:
+            return await scenario(app)
+        finally:
+            if app.engine is not None:
+                await app.engine.dispose()
+
+    return asyncio.run(main())
+
+
+def read_paths(customer_id):
+    return ['/gantt_data', '/api/get_gantt_jobs', '/get_component_jobs', f'/get_parts/{customer_id}']
+
+
+def test_application_serves_reads_through_aiosqlite(tier):
+    _, asgi, _ = tier
+    assert isinstance(asgi.application, asgi.AsyncReads)
+    assert asgi.application.database_url.drivername == 'sqlite+aiosqlite'
+
+
+def test_async_reads_match_flask(tier):
+    flask_app, asgi, customer_id = tier
+    client = flask_app.test_client()
+
+    async def scenario(app):
+        return [await asgi_request(app, 'GET', path) for path in read_paths(customer_id)]
+
+    for path, (status, headers, body) in zip(read_paths(customer_id), run(asgi, scenario)):
+        expected = client.get(path)
+        assert status == expected.status_code == 200, path
+        assert body == expected.data, path
+        assert json.loads(body), path  # The seeded data leaves none of them empty
+        assert headers['content-type'] == expected.headers['Content-Type'], path
+        assert headers.get('etag') == expected.headers.get('ETag'), path
+
+
+def test_async_reads_answer_conditional_gets(tier):
+    flask_app, asgi, customer_id = tier
+    client = flask_app.test_client()
+    etags = {path: client.get(path).headers.get('ETag') for path in read_paths(customer_id)}
+    etags = {path: etag for path, etag in etags.items() if etag}  # Views wrapped in conditional_on
+    assert '/api/get_gantt_jobs' in etags
+
+    async def scenario(app):
+        return {path: await asgi_request(app, 'GET', path, [('If-None-Match', etag)]) for path, etag in etags.items()}
+
+    for path, (status, headers, body) in run(asgi, scenario).items():
+        assert status == 304, path
+        assert body == b'', path
+        assert headers['etag'] == etags[path], path
+
+
+def test_writes_through_flask_change_async_etags(tier):
+    flask_app, asgi, _ = tier
+    from models import GanttJob
+    with flask_app.app_context():
+        gantt_job_id = GanttJob.query.first().gantt_job_id
+
+    async def scenario(app):
+        before = await asgi_request(app, 'GET', '/api/get_gantt_jobs')
+        shifted = await asgi_request(app, 'POST', f'/api/shift_gantt_job/{gantt_job_id}',
+                                     [('Content-Type', 'application/json')], b'{"shift_minutes": 30}')
+        after = await asgi_request(app, 'GET', '/api/get_gantt_jobs')
+        return before, shifted, after
+
+    before, shifted, after = run(asgi, scenario)
+    assert shifted[0] == 200
+    assert after[1]['etag'] != before[1]['etag']
+    expected = flask_app.test_client().get('/api/get_gantt_jobs')
+    assert (after[1]['etag'], after[2]) == (expected.headers['ETag'], expected.data)
+
+
+def test_unmatched_requests_fall_through_to_flask(tier):
+    flask_app, asgi, customer_id = tier
+    client = flask_app.test_client()
+    requests = [
+        ('GET', f'/api/part_typeahead/{customer_id}?q=&limit=5'),  # Not an async route
+        ('GET', '/no/such/page'),  # Unknown to both tiers
+        ('POST', '/gantt_data'),  # An async route, but not a read
+        ('GET', f'/get_parts/{customer_id}/extra'),  # Beyond the prefix route
+    ]
+
+    async def scenario(app):
+        return [await asgi_request(app, method, path) for method, path in requests]
+
+    for (method, path), (status, headers, body) in zip(requests, run(asgi, scenario)):
+        expected = client.open(path, method=method)
+        assert status == expected.status_code, (method, path)
+        assert body == expected.data, (method, path)
+        assert headers['content-type'] == expected.headers['Content-Type'], (method, path)
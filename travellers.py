@@ -0,0 +1,364 @@
+import io
+import os
+import json
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from flask import render_template
+from sqlalchemy import bindparam, event, func
+from sqlalchemy.orm import joinedload
+from models import db, logger, ComponentJob, Part, OrderLine, Order, Jig, GanttJob, JobTraveller
+
+try:
+    from xhtml2pdf import pisa
+except ImportError:  # Optional: without it travellers are served as HTML only
+    pisa = None
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # Optional: without it batches are only offered as a zip
+    PdfWriter = None
+
+# Processes converting travellers to PDF in a batch. xhtml2pdf is pure Python, so threads would
+# share one core; each gunicorn worker starts its pool on the first batch and keeps it.
+TRAVELLER_PDF_WORKERS = int(os.getenv('TRAVELLER_PDF_WORKERS', os.cpu_count() or 2))
+
+# Most travellers in one batch (a day's schedule is typically 100-200 jobs)
+TRAVELLER_BATCH_MAX = int(os.getenv('TRAVELLER_BATCH_MAX', 1000))
+
+# SQL Server allows 2100 parameters per statement
+JOB_CHUNK_SIZE = 1000
+
+
+def pdf_available():
+    return pisa is not None
+
+
+def merge_available():
+    return pisa is not None and PdfWriter is not None
+
+
+def traveller_context(component_job):
+    """Everything printed on a job's traveller (also the /component_job_details JSON)."""
+    part = component_job.part
+    order_line = component_job.order_line
+    jig = part.jig
+    order = db.session.get(Order, order_line.order_id) if order_line else None
+
+    try:
+        polishing_details = json.loads(part.polishing) if part.polishing else []
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding polishing JSON for part {part.part_number}: {e}")
+        polishing_details = []
+
+    return {
+        "component_job_id": component_job.component_job_id,
+        "customer_name": component_job.customer_name,
+        "purchase_order_number": order.purchase_order_number if order else None,
+        "part_number": part.part_number,
+        "part_description": part.part_description,
+        "quantity": order_line.quantity if order_line else None,
+        "required_jigs": component_job.required_jigs,
+        "units_per_load": component_job.units_per_load,
+        "quantity_of_final_load": component_job.quantity_of_final_load,
+        "jig_type": jig.jig_type if jig else "No Jig",
+        "upj": part.custom_upj or (jig.maxUPJ if jig else 5),
+        "jpl": part.custom_jpl or (jig.maxJPL if jig else 10),
+        "loads_required": component_job.loads_required,
+        "buzzbars_required": component_job.buzzbars_required,
+        "load_independent_operations": [op.as_load_independent_dict() for op in component_job.load_independent_operations],
+        "operations": [op.as_dict(component_job.loads_required) for op in component_job.operations],
+        "voltage": part.voltage,
+        "etch": part.etch,
+        "anodising_duration": part.anodising_duration,
+        "strip_etch": part.strip_etch,
+        "blasting": part.blasting,
+        "brightening": part.brightening,
+        "polishing": polishing_details,
+        "part_image_url": part.image,
+        "jig_image_url": jig.image if jig else None,
+    }
+
+
+def load_component_job(component_job_id):
+    return (
+        db.session.query(ComponentJob)
+        .options(joinedload(ComponentJob.part).joinedload(Part.jig), joinedload(ComponentJob.order_line))
+        .filter_by(component_job_id=component_job_id)
+        .first()
+    )
+
+
+def render_traveller_html(component_job):
+    return render_template('traveller.html', **traveller_context(component_job))
+
+
+def store_html(traveller, component_job, part_revision):
+    # Rendered before the row is touched: rendering queries, which would autoflush a half-filled row
+    html = render_traveller_html(component_job)
+    traveller.part_revision = part_revision
+    traveller.html = html
+    traveller.pdf = None
+    traveller.rendered_at = datetime.utcnow()
+
+
+def html_to_pdf(html):
+    buffer = io.BytesIO()
+    status = pisa.CreatePDF(html, dest=buffer, encoding='utf-8')
+    if status.err:
+        raise RuntimeError(f"PDF rendering reported {status.err} errors")
+    return buffer.getvalue()
+
+
+def get_traveller(component_job_id, pdf=False):
+    """
+    The job's cached traveller, re-rendered only if the part has been edited since (or the cached
+    copy was dropped because its order line, order or jig changed). With `pdf`, the PDF is rendered
+    from the cached HTML on first request and cached too. Returns None for an unknown job.
+    """
+    part_revision = (
+        db.session.query(Part.revision)
+        .join(ComponentJob, ComponentJob.part_id == Part.part_number)
+        .filter(ComponentJob.component_job_id == component_job_id)
+        .scalar()
+    )
+    if part_revision is None:
+        return None
+
+    traveller = db.session.get(JobTraveller, component_job_id)
+    if traveller is None or traveller.part_revision != part_revision:
+        if traveller is None:
+            traveller = JobTraveller(component_job_id=component_job_id)
+        store_html(traveller, load_component_job(component_job_id), part_revision)
+        db.session.add(traveller)
+        logger.info(f"Rendered traveller for component job {component_job_id} at part revision {part_revision}")
+
+    if pdf and traveller.pdf is None:
+        traveller.pdf = html_to_pdf(traveller.html)
+
+    if db.session.new or db.session.dirty:
+        db.session.commit()
+    return traveller
+
+
+def parse_schedule_range(start, end, today=None):
+    """(start, end) dates from optional YYYY-MM-DD strings; both default to today. Raises ValueError."""
+    today = today or datetime.now().date()
+    try:
+        start = datetime.strptime(start, '%Y-%m-%d').date() if start else today
+        end = datetime.strptime(end, '%Y-%m-%d').date() if end else start
+    except ValueError:
+        raise ValueError("Dates must be given as YYYY-MM-DD")
+    if end < start:
+        raise ValueError("The end date is before the start date")
+    if (end - start).days > 31:
+        raise ValueError("Print at most 31 days of travellers at once")
+    return start, end
+
+
+def scheduled_component_jobs(start, end):
+    """Ids of the component jobs with a load jigged on the days `start` to `end` (inclusive), by first load."""
+    first_load = func.min(GanttJob.jigging_start)
+    rows = (
+        db.session.query(GanttJob.component_job_id, first_load)
+        .filter(GanttJob.jigging_start >= datetime.combine(start, datetime.min.time()),
+                GanttJob.jigging_start < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+                GanttJob.component_job_id.isnot(None))
+        .group_by(GanttJob.component_job_id)
+        .order_by(first_load, GanttJob.component_job_id)
+        .all()
+    )
+    return [component_job_id for component_job_id, _ in rows]
+
+
+def prepare_travellers(component_job_ids):
+    """
+    Brings the cached HTML of every job up to date (rendering only missing or stale ones) and
+    returns [(component_job_id, rendered_at, html, pdf or None)] in the given order, detached from
+    the session so they can be used after the request's context has gone.
+    """
+    revisions, cached = {}, {}
+    for i in range(0, len(component_job_ids), JOB_CHUNK_SIZE):
+        chunk = component_job_ids[i:i + JOB_CHUNK_SIZE]
+        revisions.update(
+            db.session.query(ComponentJob.component_job_id, Part.revision)
+            .join(Part, ComponentJob.part_id == Part.part_number)
+            .filter(ComponentJob.component_job_id.in_(chunk))
+        )
+        cached.update(
+            (traveller.component_job_id, traveller)
+            for traveller in JobTraveller.query.filter(JobTraveller.component_job_id.in_(chunk))
+        )
+
+    stale = [
+        component_job_id for component_job_id in component_job_ids
+        if component_job_id in revisions and getattr(cached.get(component_job_id), 'part_revision', None) != revisions[component_job_id]
+    ]
+    for i in range(0, len(stale), JOB_CHUNK_SIZE):
+        chunk = stale[i:i + JOB_CHUNK_SIZE]
+        component_jobs = (
+            db.session.query(ComponentJob)
+            .options(joinedload(ComponentJob.part).joinedload(Part.jig), joinedload(ComponentJob.order_line))
+            .filter(ComponentJob.component_job_id.in_(chunk))
+        )
+        for component_job in component_jobs:
+            traveller = cached.get(component_job.component_job_id)
+            if traveller is None:
+                traveller = cached[component_job.component_job_id] = JobTraveller(component_job_id=component_job.component_job_id)
+            store_html(traveller, component_job, revisions[component_job.component_job_id])
+            db.session.add(traveller)
+    if stale:
+        db.session.commit()
+        logger.info(f"Rendered {len(stale)} of {len(component_job_ids)} travellers for a batch")
+
+    return [
+        (traveller.component_job_id, traveller.rendered_at, traveller.html, traveller.pdf)
+        for traveller in (cached.get(component_job_id) for component_job_id in component_job_ids)
+        if traveller is not None
+    ]
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Spawned rather than forked: the parent has database connections and threads
+            _pdf_pool = ProcessPoolExecutor(max_workers=TRAVELLER_PDF_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _pdf_pool
+
+
+def discard_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+def traveller_pdfs(travellers):
+    """
+    Yields (component_job_id, pdf) for `prepare_travellers` output in order. Uncached PDFs are
+    converted in the process pool, all submitted up front, and written back to the cache at the end.
+    """
+    missing = [html for _, _, html, pdf in travellers if pdf is None]
+    converted = iter(())
+    if missing:
+        chunksize = max(1, len(missing) // (TRAVELLER_PDF_WORKERS * 4))
+        converted = pdf_pool().map(html_to_pdf, missing, chunksize=chunksize)
+
+    rendered = []
+    try:
+        for component_job_id, rendered_at, _, pdf in travellers:
+            if pdf is None:
+                pdf = next(converted)
+                rendered.append({"job_id": component_job_id, "rendered": rendered_at, "pdf_bytes": pdf})
+            yield component_job_id, pdf
+    except BrokenProcessPool:
+        discard_pdf_pool()
+        raise
+    finally:
+        if rendered:
+            store_pdfs(rendered)
+
+
+def store_pdfs(rendered):
+    # Only where the HTML they came from is still the cached one
+    table = JobTraveller.__table__
+    try:
+        db.session.execute(
+            table.update()
+            .where(table.c.component_job_id == bindparam('job_id'), table.c.rendered_at == bindparam('rendered'))
+            .values(pdf=bindparam('pdf_bytes')),
+            rendered,
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not cache {len(rendered)} batch-rendered traveller PDFs: {e}")
+
+
+class _ChunkWriter:
+    """Write-only file object that collects output until the streaming generator takes it."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_traveller_zip(travellers):
+    """The travellers as one PDF each in a zip, sent entry by entry as they are converted."""
+    output = _ChunkWriter()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for position, (component_job_id, pdf) in enumerate(traveller_pdfs(travellers), start=1):
+            archive.writestr(f"{position:03d}-traveller-{component_job_id}.pdf", pdf)
+            yield output.take()
+    yield output.take()
+
+
+def stream_merged_travellers(travellers, chunk_size=256 * 1024):
+    """
+    The travellers merged into one PDF, in schedule order. A PDF's cross-reference table comes
+    last, so this is written once every traveller is converted, then sent in chunks.
+    """
+    writer = PdfWriter()
+    for _, pdf in traveller_pdfs(travellers):
+        writer.append(io.BytesIO(pdf))
+    merged = io.BytesIO()
+    writer.write(merged)
+    view = merged.getbuffer()
+    for i in range(0, len(view), chunk_size):
+        yield bytes(view[i:i + chunk_size])
+
+
+def drop_travellers(connection, component_job_ids):
+    table = JobTraveller.__table__
+    connection.execute(table.delete().where(table.c.component_job_id.in_(component_job_ids)))
+
+
+# Travellers print the order line's quantity, the order's PO number and the jig's limits and image;
+# the part is covered by its revision. Runs on the flush connection, in the same transaction.
+
+@event.listens_for(ComponentJob, 'after_update')
+@event.listens_for(ComponentJob, 'after_delete')
+def drop_component_job_traveller(mapper, connection, target):
+    drop_travellers(connection, [target.component_job_id])
+
+
+@event.listens_for(OrderLine, 'after_update')
+@event.listens_for(OrderLine, 'after_delete')
+def drop_order_line_travellers(mapper, connection, target):
+    drop_travellers(connection, db.select(ComponentJob.component_job_id)
+                    .where(ComponentJob.order_line_id == target.OrderLine_id))
+
+
+@event.listens_for(Order, 'after_update')
+def drop_order_travellers(mapper, connection, target):
+    drop_travellers(connection, db.select(ComponentJob.component_job_id)
+                    .join(OrderLine, ComponentJob.order_line_id == OrderLine.OrderLine_id)
+                    .where(OrderLine.order_id == target.order_id))
+
+
+@event.listens_for(Jig, 'after_update')
+def drop_jig_travellers(mapper, connection, target):
+    drop_travellers(connection, db.select(ComponentJob.component_job_id)
+                    .join(Part, ComponentJob.part_id == Part.part_number)
+                    .where(Part.jig_type == target.jig_type))